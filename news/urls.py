@@ -21,4 +21,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('newsapp.urls')),
     path('api/v1/', include('newsapp.api_urls')),
+    path('async/', include('newsapp.async_urls')),
 ]
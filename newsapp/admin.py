@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 from django.contrib.auth.admin import GroupAdmin
+from django.db.models import Sum
+
+from .models import ArticleStat
 
 # Unregisters the default Group model from Django admin.
 # This step is necessary to replace the default Group admin interface.
@@ -32,3 +35,43 @@ class GroupAdminWithPermissions(GroupAdmin):
 # Registers the Group model with the customized GroupAdminWithPermissions.
 # This replaces the default admin interface for Group with the enhanced version.
 admin.site.register(Group, GroupAdminWithPermissions)
+
+
+@admin.register(ArticleStat)
+class ArticleStatAdmin(admin.ModelAdmin):
+    """
+    Read-only admin view of the article counts per day, category and source.
+
+    The rows are maintained by database triggers, see newsapp.stats, so they can be browsed and filtered but not
+    edited. The title shows the total number of articles of the rows currently filtered, e.g. of one day.
+
+    Attributes:
+        list_display (list): The columns of the change list.
+        list_filter (list): The fields offered as filters in the sidebar.
+        search_fields (list): The fields searched by the search box.
+        date_hierarchy (str): The date field used to drill down by year, month and day.
+        ordering (list): The latest days and largest counts first.
+    """
+    list_display = ['day', 'category', 'source', 'count']
+    list_filter = ['category']
+    search_fields = ['source']
+    date_hierarchy = 'day'
+    ordering = ['-day', '-count']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        # Redirects and error pages carry no change list
+        change_list = getattr(response, 'context_data', {}).get('cl')
+        if change_list is not None:
+            total = change_list.queryset.aggregate(total=Sum('count'))['total'] or 0
+            response.context_data['title'] = f'{change_list.title} ({total} articles)'
+        return response
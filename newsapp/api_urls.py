@@ -8,6 +8,23 @@ urlpatterns = [
     # Defines a URL path for fetching articles. The 'get_article' view handles requests at this endpoint.
     path('article', api_views.get_article, name='article'),
 
+    # Compact article cards, as listed by the home and news pages, handled by the 'article_cards' view.
+    path('article/cards', api_views.article_cards, name='article_cards'),
+
+    # Batch create, update and delete endpoints, taking a JSON array or an NDJSON stream of items.
+    path('article/bulk', api_views.bulk_article, name='article_bulk'),
+    path('source/bulk', api_views.bulk_source, name='source_bulk'),
+    path('message/bulk', api_views.bulk_message, name='message_bulk'),
+
+    # Streaming NDJSON or CSV export of every article, handled by the 'export_article' view.
+    path('article/export', api_views.export_article, name='article_export'),
+
+    # Full-text search over the articles, handled by the 'search_article' view.
+    path('search', api_views.search_article, name='api_search'),
+
+    # Number of articles per category and per source over a range of days, handled by the 'article_stats' view.
+    path('stats', api_views.article_stats, name='stats'),
+
     # URL path for fetching source data. Handled by the 'get_source' view.
     path('source', api_views.get_source, name='source'),
 
@@ -1,21 +1,50 @@
-from rest_framework.decorators import api_view
+from datetime import date
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from newsapp.models import Article, Source, ContactMessage
-from .serializers import ArticleSerializer, SourceSerializer, ContactMessageSerializer
+from .cards import CARD_FIELDS, ArticleCard
+from .conditional import article_api_etag, article_api_last_modified
+from .export import FORMATS, export_articles
+from .listing_cache import invalidate_article_listings
+from .parsers import NDJSONParser
+from .pagination import ArticleKeysetPagination
+from .search import search_articles
+from .serializers import ArticleSerializer, ArticleSearchResultSerializer, SourceSerializer, ContactMessageSerializer
+from .stats import article_counts
 from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
+
+# Longest range of days the stats endpoint counts over
+MAX_STATS_DAYS = 366
 
 
 @api_view(['GET', 'POST', 'PUT'])
+@condition(etag_func=article_api_etag, last_modified_func=article_api_last_modified)
 def get_article(request):
     """
     API view for handling requests related to the Article model.
 
     Supports GET, POST, and PUT HTTP methods.
 
-    GET: Fetches one or all articles based on the presence of an 'id' parameter.
+    GET: Fetches one article when an 'id' parameter is given. Otherwise returns one page of articles, newest
+         first, paginated with a keyset cursor ('cursor' and 'page_size' parameters, see
+         ArticleKeysetPagination). A 'site' parameter restricts the list to the articles of one Source. A comma
+         separated 'fields' parameter restricts the serialized fields, e.g. '?fields=id,title,description' to
+         leave out the body.
     POST: Creates a new article using the provided data.
     PUT: Updates an existing article identified by an 'id' parameter.
 
+    GET responses carry an ETag and a Last-Modified header, and requests whose If-None-Match matches the ETag, or
+    failing that whose If-Modified-Since is not older than the last change, are answered with 304 Not Modified
+    before anything is serialized.
+
     Args:
         request: The incoming HTTP request.
 
@@ -26,12 +55,28 @@ def get_article(request):
     # Handling GET requests to either fetch a specific article or all articles.
     if request.method == 'GET':
         article_id = request.query_params.get('id', False)
+        fields = request.query_params.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
         if not article_id:
             articles = Article.objects.all()
-            res = ArticleSerializer(articles, many=True)
+            site_id = request.query_params.get('site')
+            if site_id:
+                if not site_id.isdigit():
+                    return Response({'status': 'error', 'info': 'site must be a source id'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                # Served by the index on site and publication time
+                articles = articles.filter(site_id=site_id)
+            if fields is not None and 'body' not in fields:
+                # Not loading the large body column at all when the client does not want it
+                articles = articles.defer('body')
+            articles = ArticleSerializer.setup_eager_loading(articles, fields)
+            paginator = ArticleKeysetPagination()
+            page = paginator.paginate_queryset(articles, request)
+            res = ArticleSerializer(page, many=True, fields=fields)
+            return paginator.get_paginated_response(res.data)
         else:
-            article = Article.objects.get(pk=article_id)
-            res = ArticleSerializer(instance=article)
+            article = ArticleSerializer.setup_eager_loading(Article.objects.all(), fields).get(pk=article_id)
+            res = ArticleSerializer(instance=article, fields=fields)
         return Response(res.data)
 
     # Handling POST requests to create a new article.
@@ -55,17 +100,154 @@ def get_article(request):
             return Response({'error': article_ser.errors})
 
 
+@api_view(['GET'])
+def search_article(request):
+    """
+    API view searching the articles' title, description and body, best matches first.
+
+    GET: Returns one page of results for the 'q' parameter, optionally restricted by 'category' and 'source'.
+         Pages are selected with 'page' (starting at 1) and sized with 'page_size', capped like the article list.
+         Each result carries its relevance as 'rank' and an HTML excerpt with the matched terms wrapped in
+         <mark> tags as 'snippet'. 'truncated' is true when the query matched too many articles for all of them
+         to be ranked, in which case only the most recent matches are returned, see search.search_articles.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        Response: The page of results with the URL of the next page, or an error message.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'status': 'error', 'info': 'The q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page = int(request.query_params.get('page', 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        return Response({'status': 'error', 'info': 'page must be a positive integer'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Fetching one extra result tells whether another page follows
+    page_size = ArticleKeysetPagination().get_page_size(request)
+    results = search_articles(query, category=request.query_params.get('category'),
+                              source=request.query_params.get('source'),
+                              limit=page_size + 1, offset=(page - 1) * page_size)
+    next_url = None
+    if len(results) > page_size:
+        next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+    return Response({
+        'page': page,
+        'next': next_url,
+        'truncated': results.truncated,
+        'results': ArticleSearchResultSerializer(results[:page_size], many=True).data,
+    })
+
+
+@api_view(['GET'])
+def article_cards(request):
+    """
+    API view serving the article cards, the compact representation of the home and news pages, for feeds.
+
+    GET: Returns one page of cards, newest first, paginated like the article list ('cursor' and 'page_size'
+         parameters, see ArticleKeysetPagination). 'category' and 'site' restrict the cards to one category or
+         one Source. Only the columns of a card are read, see newsapp.cards.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        Response: The page of cards with the cursor of the next page, or an error message.
+    """
+    articles = Article.objects.all()
+    category = request.query_params.get('category')
+    if category:
+        if category not in dict(Article.CATEGORIES):
+            return Response({'status': 'error', 'info': f'Unknown category {category}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        articles = articles.filter(category=category)
+    site_id = request.query_params.get('site')
+    if site_id:
+        if not site_id.isdigit():
+            return Response({'status': 'error', 'info': 'site must be a source id'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        articles = articles.filter(site_id=site_id)
+
+    # Paginating the rows of the card columns, which become cards without any model instance
+    paginator = ArticleKeysetPagination()
+    rows = paginator.paginate_queryset(articles.values(*CARD_FIELDS), request)
+    return paginator.get_paginated_response([ArticleCard(**row).as_dict() for row in rows])
+
+
+@api_view(['GET'])
+def article_stats(request):
+    """
+    API view returning the number of articles published per category and per source.
+
+    GET: Counts the articles of the UTC day given as 'date' (YYYY-MM-DD, today by default), or of the 'days' days
+         ending with it. The counts are read from the stats table maintained by database triggers, so answering
+         does not scan the articles however many there are.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        Response: The counts, see newsapp.stats.article_counts, or an error message.
+    """
+    try:
+        day = request.query_params.get('date')
+        day = date.fromisoformat(day) if day else None
+        days = int(request.query_params.get('days', 1))
+    except ValueError:
+        return Response({'status': 'error', 'info': 'date must be YYYY-MM-DD and days an integer'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= MAX_STATS_DAYS:
+        return Response({'status': 'error', 'info': f'days must be between 1 and {MAX_STATS_DAYS}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response(article_counts(day, days))
+
+
+@api_view(['GET'])
+def export_article(request):
+    """
+    API view streaming every article as NDJSON or CSV, for dumping the archive.
+
+    GET: Streams the articles, archived ones included, oldest first. 'type' selects 'ndjson' (the default) or
+         'csv', 'category' restricts the export to one category and 'gzip=1' returns a gzip file rather than plain
+         text. Rows are read and written in chunks, so memory use stays constant whatever the size of the archive.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        StreamingHttpResponse: The export, as an attachment. A Response with an error message for unknown types.
+    """
+    export_format = request.query_params.get('type', 'ndjson')
+    if export_format not in FORMATS:
+        return Response({'status': 'error', 'info': f'type must be one of {", ".join(FORMATS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    compress = request.query_params.get('gzip') in ('1', 'true')
+
+    filename = f'articles.{export_format}'
+    response = StreamingHttpResponse(
+        export_articles(export_format, compress=compress, category=request.query_params.get('category')),
+        content_type='application/gzip' if compress else f'{FORMATS[export_format]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}{".gz" if compress else ""}"'
+    return response
+
+
 @api_view(['GET', 'POST', 'PUT', 'DELETE'])
-def get_message(request):
+def get_source(request):
     """
-    API view for handling requests related to the ContactMessage model.
+    API view for handling requests related to the Source model.
 
     Supports GET, POST, PUT, and DELETE HTTP methods.
 
-    GET: Fetches one or all contact messages based on the presence of an 'id' parameter.
-    POST: Creates a new contact message using the provided data.
-    PUT: Updates an existing contact message identified by an 'id' parameter.
-    DELETE: Deletes an existing contact message identified by an 'id' parameter.
+    GET: Fetches one source when an 'id' parameter is given, otherwise the five sources with the most articles.
+         Sources carry their number of articles as 'article_count'.
+    POST: Creates a new source using the provided data.
+    PUT: Updates an existing source identified by an 'id' parameter.
+    DELETE: Deletes an existing source identified by an 'id' parameter.
 
     Args:
         request: The incoming HTTP request.
@@ -74,15 +256,17 @@ def get_message(request):
         Response: Contains the serialized data or an error message.
     """
 
-    # Handling GET, POST, PUT, DELETE methods for ContactMessage model.
-    # Each method's implementation includes fetching, creating, updating, or deleting contact messages.
+    # Handling GET, POST, PUT, DELETE methods for Source model.
+    # Each method's implementation includes fetching, creating, updating, or deleting sources.
     if request.method == 'GET':
         source_id = request.query_params.get('id', False)
+        # Counting articles through the indexed site foreign key
+        sources = Source.objects.annotate(article_count=Count('article'))
         if not source_id:
-            articles = Source.objects.order_by('-time_published')[:5]
-            res = SourceSerializer(articles, many=True)
+            sources = sources.order_by('-article_count', 'name')[:5]
+            res = SourceSerializer(sources, many=True)
         else:
-            source = Source.objects.get(pk=source_id)
+            source = sources.get(pk=source_id)
             res = SourceSerializer(instance=source)
         return Response(res.data)
 
@@ -164,3 +348,118 @@ def get_message(request):
                 return Response({'status': 'OK', 'info': 'Message deleted'}, status=status.HTTP_200_OK)
             else:
                 return Response({'status': 'error', 'info': message.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _item_id(item):
+    # Items to update or delete are objects carrying an 'id', deletes also accept bare ids
+    value = item.get('id') if isinstance(item, dict) else item
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bulk_write(request, serializer_class):
+    """
+    Creates, updates or deletes a batch of objects of the serializer's model in a single transaction.
+
+    POST creates one object per item. PUT and PATCH update the objects identified by the 'id' of each item, with
+    only the given fields changed. DELETE removes the objects whose ids are listed, as bare ids or as objects with
+    an 'id'. Items are validated together with many=True, and the valid ones are written with one bulk_create,
+    bulk_update or delete. Invalid items are skipped and reported without failing the rest of the batch.
+
+    Args:
+        request: The incoming HTTP request, carrying a JSON array or an NDJSON stream.
+        serializer_class: The model serializer validating the items.
+
+    Returns:
+        Response: Counts per status and one result per item, in input order, with its 'index', 'status' and either
+                  the object 'id' or the validation 'errors'.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'status': 'error', 'info': 'Expected a JSON array or an NDJSON stream of items'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    max_items = getattr(settings, 'API_BULK_MAX_ITEMS', 10000)
+    if len(items) > max_items:
+        return Response({'status': 'error', 'info': f'At most {max_items} items per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    model = serializer_class.Meta.model
+    results = [None] * len(items)
+    try:
+        with transaction.atomic():
+            if request.method == 'POST':
+                serializer = serializer_class(data=items, many=True)
+                serializer.is_valid()
+                for index, instance in zip(serializer.valid_indexes, serializer.save()):
+                    results[index] = {'index': index, 'status': 'created', 'id': instance.pk}
+
+            elif request.method in ('PUT', 'PATCH'):
+                ids = [_item_id(item) for item in items]
+                instances = model.objects.in_bulk([pk for pk in ids if pk is not None])
+                known = [index for index, pk in enumerate(ids) if pk in instances]
+                for index, pk in enumerate(ids):
+                    if pk not in instances:
+                        results[index] = {'index': index, 'status': 'not_found', 'id': pk}
+                serializer = serializer_class(instance=[instances[ids[index]] for index in known],
+                                              data=[items[index] for index in known], many=True, partial=True)
+                serializer.is_valid()
+                for position, errors in serializer.item_errors.items():
+                    results[known[position]] = {'index': known[position], 'status': 'invalid', 'errors': errors}
+                # Keeping only the instances whose changes are valid, aligned with validated_data
+                serializer.instance = [serializer.instance[position] for position in serializer.valid_indexes]
+                serializer.valid_indexes = [known[position] for position in serializer.valid_indexes]
+                for index, instance in zip(serializer.valid_indexes, serializer.save()):
+                    results[index] = {'index': index, 'status': 'updated', 'id': instance.pk}
+
+            elif request.method == 'DELETE':
+                ids = [_item_id(item) for item in items]
+                existing = set(model.objects.filter(pk__in=[pk for pk in ids if pk is not None])
+                               .values_list('pk', flat=True))
+                model.objects.filter(pk__in=existing).delete()
+                for index, pk in enumerate(ids):
+                    results[index] = {'index': index, 'status': 'deleted' if pk in existing else 'not_found', 'id': pk}
+    except DatabaseError as error:
+        # The transaction was rolled back, so none of the items was written
+        return Response({'status': 'error', 'info': f'The batch was rolled back: {error}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == 'POST':
+        for index, errors in serializer.item_errors.items():
+            results[index] = {'index': index, 'status': 'invalid', 'errors': errors}
+    if model is Article:
+        # Bulk writes send no signals, so the cached listings are invalidated here
+        invalidate_article_listings()
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return Response({'status': 'OK', 'counts': counts, 'results': results})
+
+
+@api_view(['POST', 'PUT', 'PATCH', 'DELETE'])
+@parser_classes([JSONParser, NDJSONParser])
+def bulk_article(request):
+    """
+    API view creating, updating or deleting many articles at once, see _bulk_write.
+    """
+    return _bulk_write(request, ArticleSerializer)
+
+
+@api_view(['POST', 'PUT', 'PATCH', 'DELETE'])
+@parser_classes([JSONParser, NDJSONParser])
+def bulk_source(request):
+    """
+    API view creating, updating or deleting many sources at once, see _bulk_write.
+    """
+    return _bulk_write(request, SourceSerializer)
+
+
+@api_view(['POST', 'PUT', 'PATCH', 'DELETE'])
+@parser_classes([JSONParser, NDJSONParser])
+def bulk_message(request):
+    """
+    API view creating, updating or deleting many contact messages at once, see _bulk_write.
+    """
+    return _bulk_write(request, ContactMessageSerializer)
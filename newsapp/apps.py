@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NewsappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'newsapp'
+
+    def ready(self):
+        # Connecting the signal receivers
+        from . import signals  # noqa: F401
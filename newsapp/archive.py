@@ -0,0 +1,134 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.utils import timezone
+
+from .compression import compress_body, compression_method
+from .listing_cache import invalidate_article_listings
+from .models import ArchivedArticle, Article, ArticleFingerprint
+from .routers import archive_database
+from .stats import TRIGGER_VENDORS, add_article_counts, article_day
+
+# Columns copied as they are from the article table into the archive, the body being compressed on the way
+COPIED_FIELDS = ['id', 'title', 'description', 'image', 'source', 'category', 'time_published', 'updated_at',
+                 'site_id', 'image_renditions']
+
+
+def archive_cutoff(days=None):
+    """
+    Returns the publication time before which articles are archived.
+
+    Args:
+        days (int): The age of the oldest articles kept in the article table. Defaults to
+                    settings.ARCHIVE_AFTER_DAYS.
+
+    Returns:
+        datetime: The cutoff, 'days' days ago.
+    """
+    days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 365) if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+class ArticleArchiver:
+    """
+    Moves the articles published before a cutoff from the article table into the archive, oldest first, in batches.
+
+    Listing queries, the search index and the indexes of the article table then only cover recent articles, while
+    archived articles stay readable at their URL, see ArticleManager.get_or_archived, and stay counted in the
+    stats. Each batch is copied into the archive and deleted from the article table in one transaction when the
+    archive is in the default database. Otherwise the archive commits first: an interrupted batch is at worst left
+    in both tables, and running the archiver again skips its copies and deletes the originals.
+
+    Attributes:
+        cutoff (datetime): Articles published before it are archived.
+        batch_size (int): Number of articles per batch, see settings.ARCHIVE_BATCH_SIZE.
+        compression (str): The method compressing the bodies, see newsapp.compression.
+        progress (callable): Called with the archiver after every batch.
+        archived (int): Number of articles archived.
+        body_bytes (int): Size of the archived bodies, in UTF-8 bytes.
+        compressed_bytes (int): Size of the archived bodies once compressed.
+    """
+
+    def __init__(self, cutoff=None, batch_size=None, progress=None):
+        self.cutoff = cutoff or archive_cutoff()
+        self.batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 1000)
+        self.compression = compression_method()
+        self.progress = progress
+        self.archived = self.body_bytes = self.compressed_bytes = 0
+        self.started = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    @property
+    def rate(self):
+        """
+        Returns the number of articles archived per second.
+        """
+        return round(self.archived / self.elapsed, 1) if self.elapsed else 0.0
+
+    @property
+    def ratio(self):
+        """
+        Returns the size of the compressed bodies relative to the original ones, e.g. 0.4.
+        """
+        return round(self.compressed_bytes / self.body_bytes, 3) if self.body_bytes else 0.0
+
+    def pending(self):
+        """
+        Returns the number of articles left to archive.
+        """
+        return Article.objects.filter(time_published__lt=self.cutoff).count()
+
+    def run(self):
+        """
+        Archives every article published before the cutoff.
+
+        Returns:
+            ArticleArchiver: The archiver, holding the counters.
+        """
+        self.started = time.perf_counter()
+        # Walking the (-time_published, -id) index backwards, each batch starts where the previous one was deleted
+        articles = Article.objects.filter(time_published__lt=self.cutoff).order_by('time_published', 'id')
+        while rows := list(articles.values(*COPIED_FIELDS, 'body')[:self.batch_size]):
+            self.archive_batch(rows)
+            if self.progress:
+                self.progress(self)
+        return self
+
+    def archive_batch(self, rows):
+        """
+        Moves one batch of articles into the archive.
+
+        Args:
+            rows (list): The articles as dicts of their COPIED_FIELDS and body.
+        """
+        archived = []
+        for row in rows:
+            body = row.pop('body')
+            compressed = compress_body(body, self.compression)
+            self.body_bytes += len(body.encode('utf-8'))
+            self.compressed_bytes += len(compressed)
+            archived.append(ArchivedArticle(**row, compressed_body=compressed, compression=self.compression))
+        ids = [row['id'] for row in rows]
+
+        # The nested archive transaction commits first when it is a separate database, see the class docstring
+        with transaction.atomic(using=DEFAULT_DB_ALIAS), transaction.atomic(using=archive_database()):
+            ArchivedArticle.objects.bulk_create(archived, ignore_conflicts=True)
+            ArticleFingerprint.objects.filter(article_id__in=ids).update(article=None)
+            # A plain DELETE, since Article's delete signals would be sent once per article
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(Article._meta.db_table)} '
+                               f'WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+            if connection.vendor in TRIGGER_VENDORS:
+                # The delete triggers took the articles out of the stats, which keep counting them
+                counts = {}
+                for row in rows:
+                    key = (article_day(row['time_published']), row['category'], row['source'])
+                    counts[key] = counts.get(key, 0) + 1
+                add_article_counts(counts)
+        invalidate_article_listings()
+        self.archived += len(rows)
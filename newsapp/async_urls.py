@@ -0,0 +1,22 @@
+from django.urls import path
+
+from . import async_views
+
+# Async-native variants of the listing, detail and article API views, mounted under /async/ by news/urls.py.
+# Every route mirrors the path of its synchronous counterpart, so a load test can compare them URL for URL.
+urlpatterns = [
+    # Home page, the latest articles of every category.
+    path('', async_views.home, name='async_home'),
+
+    # News page of one category.
+    path('news/<str:category>', async_views.category_news, name='async_category_news'),
+
+    # Article page.
+    path('article/<int:pk>/', async_views.article_detail, name='async_article_view'),
+
+    # Generates a new image for an article, awaiting OpenAI and the download on the event loop.
+    path('article/<int:pk>/regenerate_image', async_views.regenerate_image, name='async_regenerate_image'),
+
+    # Article API, one article with '?id=' or one page of the keyset paginated list.
+    path('api/v1/article', async_views.article_api, name='async_article'),
+]
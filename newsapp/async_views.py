@@ -0,0 +1,256 @@
+"""
+Async-native variants of the listing, detail and article API views, served under /async/.
+
+Under an ASGI server (e.g. 'uvicorn news.asgi:application') these views run on the event loop: queries go through
+Django's asynchronous ORM (aget, async for) and outbound calls through the aiohttp session of http_client, so a
+worker keeps serving other requests while one waits on the database, OpenAI or an image download. Under WSGI
+they still work, each request then running its own event loop.
+
+Django 4.2 has no asynchronous login_required, condition or request.auser, so the session user is loaded and
+conditional requests are answered by the helpers below. Session and group lookups, like template rendering with
+the request context, run in the thread of the synchronous ORM.
+"""
+import asyncio
+import functools
+
+import aiohttp
+import openai
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from rest_framework.exceptions import ValidationError
+
+from . import http_client
+from .cards import aiter_cards
+from .conditional import article_page_etag, article_row_etag
+from .export import ARTICLE_FIELDS
+from .groups import EDITING_GROUPS, in_any_group
+from .images import ImageTooLarge
+from .listing_cache import listing_cache
+from .models import Article
+from .pagination import ArticleKeysetPagination
+from .utils import aregenerate_article_image
+
+# Outbound failures reported as 502 Bad Gateway by regenerate_image
+UPSTREAM_ERRORS = (openai.error.OpenAIError, aiohttp.ClientError, asyncio.TimeoutError, ImageTooLarge)
+
+
+def _is_authenticated(request):
+    # Loads the session user, which needs the synchronous ORM, and tells whether they are logged in
+    return request.user.is_authenticated
+
+
+def async_login_required(view):
+    """
+    Asynchronous counterpart of django.contrib.auth.decorators.login_required.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(_is_authenticated)(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def _article_json(row):
+    # Turning the stored image name into its URL, like the serializer of the synchronous API does
+    if 'image' in row:
+        row['image'] = default_storage.url(row['image']) if row['image'] else None
+    return row
+
+
+@async_login_required
+async def home(request):
+    # Rendering the cards of the latest 5 articles, or taking them from the listing cache
+    cards = await listing_cache.arender('home', 'article_cards.html',
+                                        lambda: aiter_cards(Article.objects.order_by('-time_published')[:5]))
+
+    # The page template reads the session user, so it is rendered in the thread of the synchronous ORM
+    return await sync_to_async(render)(request, template_name='home.html',
+                                       context={'title': 'Home', 'cards': cards})
+
+
+@async_login_required
+async def category_news(request, category):
+    # Any category missing from Article.CATEGORIES is a 404, like in views.category_news
+    label = dict(Article.CATEGORIES).get(category)
+    if label is None:
+        raise Http404(f'Unknown news category "{category}"')
+
+    cards = await listing_cache.arender(
+        f'category:{category}', 'article_cards.html',
+        lambda: aiter_cards(Article.objects.filter(category=category).order_by('-time_published')[:5]))
+
+    return await sync_to_async(render)(request, template_name='newspage.html',
+                                       context={'title': f'{label} News', 'cards': cards, 'header': f'{label} News'})
+
+
+async def article_detail(request, pk):
+    """
+    Asynchronous views.ArticleDetailView, answering 304 Not Modified when the client has the current page.
+    """
+    etag = await sync_to_async(article_page_etag)(request, pk)
+    if etag is None:
+        raise Http404('No article found matching the query')
+    response = get_conditional_response(request, etag=f'"{etag}"')
+    if response is not None:
+        return response
+
+    try:
+        article = await Article.objects.aget_or_archived(pk)
+    except Article.DoesNotExist:
+        # Deleted since the ETag was computed
+        raise Http404('No article found matching the query')
+    response = await sync_to_async(render)(request, template_name='newsapp/article.html',
+                                           context={'article': article, 'object': article})
+    response['ETag'] = f'"{etag}"'
+    return response
+
+
+def _api_fields(request):
+    # The sparse fieldset of the 'fields' parameter, every exported column when it is missing
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(ARTICLE_FIELDS)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = set(fields) - set(ARTICLE_FIELDS)
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}.'})
+    return fields
+
+
+async def article_api(request):
+    """
+    Asynchronous GET /api/v1/article, serving articles as plain JSON.
+
+    Fetches one article when an 'id' parameter is given. Otherwise returns one page of articles, newest first,
+    paginated with the keyset cursor of ArticleKeysetPagination ('cursor' and 'page_size' parameters). A 'site'
+    parameter restricts the list to the articles of one Source.
+
+    Articles are flat rows of ARTICLE_FIELDS, with the Source as 'site_id' instead of the nested object of the
+    synchronous API, and a comma separated 'fields' parameter restricts them further. Rows come straight from
+    .values(), so no Article instance is built. A single article carries an ETag, and requests whose
+    If-None-Match matches it are answered with 304 Not Modified.
+
+    Args:
+        request: The incoming HTTP request.
+
+    Returns:
+        JsonResponse: The article, or 'next_cursor', 'next' and 'results' for a page. Errors have status 400
+                      and an unknown article status 404.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        fields = _api_fields(request)
+    except ValidationError as error:
+        return _json(error.detail, status=400)
+
+    article_id = request.GET.get('id')
+    if article_id:
+        if not article_id.isdigit():
+            return _json({'status': 'error', 'info': 'id must be an article id'}, status=400)
+        return await _article_row(request, int(article_id), fields)
+    return await _article_page(request, fields)
+
+
+async def _article_page(request, fields):
+    paginator = ArticleKeysetPagination()
+    try:
+        page_size = paginator.get_page_size(request)
+        cursor = request.GET.get(paginator.cursor_query_param)
+        position = paginator.decode_cursor(cursor) if cursor else None
+    except ValidationError as error:
+        return _json(error.detail, status=400)
+
+    articles = Article.objects.order_by(*paginator.ordering)
+    site_id = request.GET.get('site')
+    if site_id:
+        if not site_id.isdigit():
+            return _json({'status': 'error', 'info': 'site must be a source id'}, status=400)
+        articles = articles.filter(site_id=site_id)
+    if position:
+        published, pk = position
+        articles = articles.filter(Q(time_published__lt=published) | Q(time_published=published, pk__lt=pk))
+
+    # The cursor needs the position columns of the last row, whatever the requested fields
+    columns = list(dict.fromkeys([*fields, 'id', 'time_published']))
+    # Fetching one extra row tells whether another page follows
+    rows = [row async for row in articles.values(*columns)[:page_size + 1]]
+    next_cursor = next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = paginator.encode_position(rows[-1]['time_published'], rows[-1]['id'])
+        query = request.GET.copy()
+        query[paginator.cursor_query_param] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    results = [_article_json({field: row[field] for field in fields}) for row in rows]
+    return _json({'next_cursor': next_cursor, 'next': next_url, 'results': results})
+
+
+async def _article_row(request, pk, fields):
+    try:
+        row = await Article.objects.values(*dict.fromkeys([*fields, 'updated_at'])).aget(pk=pk)
+    except Article.DoesNotExist:
+        return _json({'status': 'error', 'info': 'Article not found'}, status=404)
+
+    etag = f'"{article_row_etag(request, pk, row["updated_at"])}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _json(_article_json({field: row[field] for field in fields}))
+    response['ETag'] = etag
+    return response
+
+
+def _may_edit(request):
+    return request.user.is_authenticated and in_any_group(request.user, EDITING_GROUPS)
+
+
+@async_login_required
+async def regenerate_image(request, pk):
+    """
+    Generates a new image for an article, POST only.
+
+    The OpenAI calls and the download are awaited, see utils.aregenerate_article_image, so the worker serves
+    other requests for the seconds they take. Cached prompts and images are reused unless 'refresh=1' is posted.
+
+    Args:
+        request: The incoming HTTP request, from a member of one of the editing groups.
+        pk (int): The primary key of the article.
+
+    Returns:
+        JsonResponse: The article with its new image, 403 or 404 on a bad request and 502 when OpenAI or the
+                      image host failed.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not await sync_to_async(_may_edit)(request):
+        return _json({'status': 'error', 'info': 'Editing articles requires an editing group'}, status=403)
+    try:
+        article = await Article.objects.aget_or_archived(pk)
+    except Article.DoesNotExist:
+        return _json({'status': 'error', 'info': 'Article not found'}, status=404)
+
+    try:
+        await aregenerate_article_image(article, use_cache=request.POST.get('refresh') != '1')
+    except UPSTREAM_ERRORS as error:
+        return _json({'status': 'error', 'info': f'Image generation failed: {error}'}, status=502)
+    finally:
+        if not isinstance(request, ASGIRequest):
+            # Under WSGI every request runs in an event loop of its own, which never reuses the session
+            await http_client.close_async_session()
+    return _json(_article_json({'id': article.pk, 'image': article.image.name,
+                                'image_renditions': article.image_renditions,
+                                'updated_at': article.updated_at}))
@@ -0,0 +1,32 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend, with the 'transaction_mode' option Django 5.1 adds to it.
+
+    Django starts transactions with a plain BEGIN, which only takes the write lock at the first write. A transaction
+    that read before writing then fails right away with "database is locked" whenever another connection wrote in
+    the meantime, since waiting for the lock could not give it a consistent snapshot. With
+    OPTIONS = {'transaction_mode': 'IMMEDIATE'}, transactions take the write lock as they begin, so concurrent
+    writers wait up to the busy timeout for their turn instead. Readers outside transactions are unaffected.
+    """
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Not a sqlite3.connect argument
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, got {mode!r}")
+        self.transaction_mode = mode.upper() if mode else None
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
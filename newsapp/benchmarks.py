@@ -0,0 +1,1006 @@
+import itertools
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from .stubs import make_news_item, start_stub_server
+
+# Registry of the available benchmarks, filled by the register decorator
+BENCHMARKS = {}
+
+
+def register(name):
+    """
+    Decorator registering a benchmark function under the given name.
+
+    A benchmark receives the command line options as keyword arguments and returns a list of rows,
+    each row being a dict mapping column names to values. The benchmark command also passes 'progress', a callable
+    writing a progress message to its standard error, see report_progress.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def report_progress(options, message):
+    """
+    Reports the progress of a benchmark through the 'progress' callable of its options, if it was given one.
+    """
+    progress = options.get('progress')
+    if progress is not None:
+        progress(message)
+
+
+@contextmanager
+def scratch_database():
+    """
+    Runs the enclosed code against a freshly migrated throwaway database and media directory.
+
+    SQLite databases are created as files rather than in memory so timings include real disk writes.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix='newsapp-bench-')
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    original_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        test_settings['NAME'] = os.path.join(scratch_dir, 'bench.sqlite3')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(MEDIA_ROOT=os.path.join(scratch_dir, 'media')):
+            yield scratch_dir
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = original_test_name
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def synthetic_items(count, category='business'):
+    """
+    Returns 'count' synthetic news items shaped like GNews articles, with bodies of realistic length.
+    """
+    items = []
+    for index in range(count):
+        item = make_news_item(index)
+        item['content'] = f'{item["content"]} ' + 'lorem ipsum dolor sit amet ' * 80
+        item['category'] = category
+        items.append(item)
+    return items
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds else float('inf')
+
+
+# Script run in a fresh interpreter to measure how long a worker takes before it can serve requests.
+# Socket connections are counted to show which startup paths talk to the network.
+STARTUP_SCRIPT = '''
+import json, os, socket, time
+connections = []
+original_connect = socket.socket.connect
+def counting_connect(sock, address):
+    connections.append(address)
+    return original_connect(sock, address)
+socket.socket.connect = counting_connect
+
+start = time.perf_counter()
+import django
+from importlib import import_module
+django.setup()
+from django.conf import settings
+import_module(settings.ROOT_URLCONF)
+if os.environ.get('NEWSAPP_LEGACY_STARTUP'):
+    # Replaying the network calls that importing newsapp.utils used to make for every new process
+    from newsapp import utils
+    for item in utils.get_news_items(category='business', max_items='2'):
+        prompt = utils.chat_with_gpt3(title=item['title'], content=item['content'])
+        utils.download_image(utils.generate_image(prompt))
+print(json.dumps({'seconds': time.perf_counter() - start, 'connections': len(connections)}))
+'''
+
+
+@register('startup')
+def startup_benchmark(repeat=5, latency=0.2, **options):
+    """
+    Compares worker startup with and without ingestion on import.
+
+    The 'legacy' mode replays the GNews and OpenAI calls that used to run when newsapp.utils was imported,
+    against a local stub server adding 'latency' seconds to every OpenAI call.
+
+    Args:
+        repeat (int): Number of fresh interpreters started per mode.
+        latency (float): Simulated OpenAI round-trip time in seconds.
+
+    Returns:
+        list: One row per mode with the median startup time and the number of socket connections.
+    """
+    server, base_url = start_stub_server([make_news_item(index) for index in range(2)], latency=latency)
+    try:
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'news.settings'),
+                   GNEWS_API_URL=f'{base_url}/top-headlines', OPENAI_API_BASE=f'{base_url}/v1',
+                   OPENAI_API_KEY='benchmark')
+        rows = []
+        for mode in ('current', 'legacy'):
+            mode_env = dict(env, NEWSAPP_LEGACY_STARTUP='1' if mode == 'legacy' else '')
+            samples = []
+            for _ in range(repeat):
+                output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=mode_env, cwd=settings.BASE_DIR,
+                                        capture_output=True, text=True, check=True).stdout
+                samples.append(json.loads(output.strip().splitlines()[-1]))
+            rows.append({
+                'mode': mode,
+                'median_ms': round(statistics.median(sample['seconds'] for sample in samples) * 1000, 1),
+                'connections': samples[-1]['connections'],
+            })
+        return rows
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@register('bulk_insert')
+def bulk_insert_benchmark(rows=1000, **options):
+    """
+    Compares the per-article persistence path with the bulk path of the ingestion pipeline.
+
+    The legacy path replays what generate_articles used to do for each item: Article.objects.create, then
+    image.save(save=True) and refresh_from_db. The bulk path runs persist_results, which inserts the articles
+    and their fingerprints with bulk_create in a single transaction, images included.
+
+    Args:
+        rows (int): Number of synthetic GNews items to persist with each path.
+
+    Returns:
+        list: One row per path with the elapsed time and rows per second.
+    """
+    from .images import render_renditions, store_renditions
+    from .models import Article
+    from .pipeline import IngestionResult
+    from .utils import persist_results
+
+    image_io = BytesIO()
+    Image.new('RGB', (64, 64), color=(30, 120, 200)).save(image_io, format='JPEG')
+    items = synthetic_items(rows)
+
+    results = []
+    with scratch_database():
+        start = time.perf_counter()
+        for item in items:
+            article = Article.objects.create(title=item['title'], description=item['description'],
+                                             body=item['content'], source=item['source']['name'],
+                                             category=item['category'])
+            article.image.save(f'{article.id}.jpg', ContentFile(image_io.getvalue()), save=True)
+            article.refresh_from_db()
+        elapsed = time.perf_counter() - start
+        results.append({'path': 'per-article', 'rows': rows, 'seconds': round(elapsed, 3),
+                        'rows_per_sec': _rate(rows, elapsed)})
+
+    with scratch_database():
+        # Images are stored by the download stage, before persistence starts
+        stored_image = store_renditions(render_renditions(image_io.getvalue(), formats=['jpeg']))
+        pending = [IngestionResult(index, item, {'stored_image': stored_image}) for index, item in enumerate(items)]
+        start = time.perf_counter()
+        persist_results(pending)
+        elapsed = time.perf_counter() - start
+        results.append({'path': 'bulk', 'rows': rows, 'seconds': round(elapsed, 3),
+                        'rows_per_sec': _rate(rows, elapsed)})
+    return results
+
+
+def synthetic_vocabulary(size=20000):
+    """
+    Returns 'size' distinct pronounceable pseudo-words, the most frequent first when drawn with zipf_weights.
+    """
+    syllables = [consonant + vowel for consonant in 'bcdfghklmnprstvz' for vowel in 'aeiou']
+    picker = random.Random(1)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(picker.choice(syllables) for _ in range(picker.randint(2, 4))))
+    return sorted(words, key=lambda word: (len(word), word))
+
+
+def zipf_weights(size):
+    # Word frequencies in natural text roughly follow Zipf's law: the n-th most common word appears 1/n as often
+    return list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def insert_synthetic_articles(rows, batch_size=10000, text=False):
+    """
+    Inserts 'rows' bare synthetic articles, one every 31 seconds going back in time, over a skewed category mix.
+
+    Rows are written with executemany rather than bulk_create: it is several times faster at this scale, and
+    time_published has auto_now_add, which bulk_create would overwrite with a single timestamp.
+
+    Args:
+        rows (int): Number of articles to insert.
+        batch_size (int): Number of rows per executemany call.
+        text (bool): Whether to fill title, description and body with words drawn from synthetic_vocabulary,
+                     for search benchmarks. Otherwise they hold fixed placeholders.
+    """
+    from django.utils import timezone
+
+    from .models import Article
+
+    # Percentage of articles per category, health being the rarest
+    weights = {'general': 40, 'business': 20, 'world': 10, 'nation': 10, 'technology': 8, 'entertainment': 5,
+               'sports': 4, 'science': 2, 'health': 1}
+    picker = random.Random(0)
+    vocabulary = synthetic_vocabulary() if text else None
+    cumulative = zipf_weights(len(vocabulary)) if text else None
+    sources = [word.title() for word in vocabulary[-50:]] if text else ['Benchmark']
+
+    def words(count):
+        return ' '.join(picker.choices(vocabulary, cum_weights=cumulative, k=count))
+
+    now = timezone.now()
+    columns = ['title', 'description', 'body', 'source', 'category', 'time_published', 'updated_at',
+               'image_renditions']
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(Article._meta.db_table),
+        ', '.join(connection.ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns)))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, batch_size):
+            cursor.executemany(sql, [
+                (words(8) if text else f'Synthetic article {index}', words(20) if text else 'Description',
+                 words(60) if text else 'Body', sources[index % len(sources)],
+                 picker.choices(list(weights), list(weights.values()))[0],
+                 now - timedelta(seconds=index * 31), now - timedelta(seconds=index * 31), '{}')
+                for index in range(start, min(start + batch_size, rows))])
+
+
+@register('category_listing')
+def category_listing_benchmark(rows=1000000, repeat=5, **options):
+    """
+    Times the "latest 5 articles in a category" query of the news pages, for the rarest category.
+
+    The query runs with the (category, -time_published) index, then with only the (-time_published, -id) index
+    of the API pagination, which the database walks until it finds 5 matching rows, and finally with no index at
+    all, which sorts the whole table as the former per-category views did.
+
+    Args:
+        rows (int): Number of synthetic articles, spread evenly over the categories.
+        repeat (int): Number of timed queries per mode.
+
+    Returns:
+        list: One row per mode with the median query time and the query plan chosen by the database.
+    """
+    from .models import Article
+
+    indexes = {index.name: index for index in Article._meta.indexes}
+    results = []
+    with scratch_database():
+        start = time.perf_counter()
+        insert_synthetic_articles(rows)
+        report_progress(options, f'Inserted {rows} articles in {time.perf_counter() - start:.1f}s')
+        if connection.vendor == 'sqlite':
+            connection.cursor().execute('ANALYZE')
+
+        for mode, dropped_index in (('category index', None), ('published index', 'article_category_published_idx'),
+                                    ('no index', 'article_published_id_idx')):
+            if dropped_index:
+                with connection.schema_editor() as schema_editor:
+                    schema_editor.remove_index(Article, indexes[dropped_index])
+
+            queryset = Article.objects.filter(category='health').order_by('-time_published')[:5]
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                samples.append(time.perf_counter() - start)
+            results.append({
+                'mode': mode,
+                'rows': rows,
+                'median_ms': round(statistics.median(samples) * 1000, 2),
+                'plan': ' / '.join(line.strip() for line in queryset.explain().splitlines()),
+            })
+    return results
+
+
+@register('search')
+def search_benchmark(rows=1000000, repeat=5, **options):
+    """
+    Times full-text searches of a page of 20 results over a synthetic corpus with Zipf distributed words.
+
+    Queries cover terms of decreasing frequency (the common term appears in about a third of the articles), a
+    two-term query and category and source filters.
+
+    Args:
+        rows (int): Number of synthetic articles.
+        repeat (int): Number of timed searches per query.
+
+    Returns:
+        list: One row per query with the median search time.
+    """
+    from .search import search_articles
+
+    vocabulary = synthetic_vocabulary()
+    queries = [
+        ('common term', vocabulary[20], {}),
+        ('frequent term', vocabulary[200], {}),
+        ('rare term', vocabulary[5000], {}),
+        ('two terms', f'{vocabulary[200]} {vocabulary[300]}', {}),
+        ('category filter', vocabulary[200], {'category': 'health'}),
+        ('source filter', vocabulary[200], {'source': vocabulary[-7].title()}),
+    ]
+    results = []
+    with scratch_database():
+        start = time.perf_counter()
+        insert_synthetic_articles(rows, text=True)
+        report_progress(options, f'Inserted and indexed {rows} articles in {time.perf_counter() - start:.1f}s')
+
+        for label, query, filters in queries:
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                found = search_articles(query, limit=20, **filters)
+                samples.append(time.perf_counter() - start)
+            results.append({
+                'query': label,
+                'terms': query,
+                'median_ms': round(statistics.median(samples) * 1000, 2),
+                'truncated': found.truncated,
+            })
+    return results
+
+
+@register('bulk_api')
+def bulk_api_benchmark(rows=1000, **options):
+    """
+    Compares writing articles through the API one request at a time with one bulk request, in JSON and NDJSON.
+
+    Args:
+        rows (int): Number of articles written by each method.
+
+    Returns:
+        list: One row per method with the elapsed time, the throughput and the number of queries.
+    """
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    from .models import Article, Source
+
+    results = []
+    with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        site = Source.objects.create(name='Benchmark', url='https://example.com')
+        items = [{'title': f'Title {index}', 'description': 'Description', 'body': 'Body ' * 100,
+                  'source': 'Benchmark', 'category': 'business', 'site_id': site.pk} for index in range(rows)]
+
+        def single():
+            for item in items:
+                client.post('/api/v1/article', item, content_type='application/json')
+
+        def bulk_json():
+            client.post('/api/v1/article/bulk', items, content_type='application/json')
+
+        def bulk_ndjson():
+            payload = '\n'.join(json.dumps(item) for item in items)
+            client.post('/api/v1/article/bulk', payload, content_type='application/x-ndjson')
+
+        for method, write in (('single requests', single), ('bulk JSON', bulk_json), ('bulk NDJSON', bulk_ndjson)):
+            Article.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                write()
+                elapsed = time.perf_counter() - start
+            assert Article.objects.count() == rows, f'{method} wrote {Article.objects.count()} articles'
+            results.append({
+                'method': method,
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_sec': _rate(rows, elapsed),
+                'queries': len(queries),
+            })
+    return results
+
+
+@register('export')
+def export_benchmark(rows=100000, **options):
+    """
+    Compares the time and peak memory of dumping the archive by serializing every Article instance at once, as the
+    article list endpoint did before pagination, with the streaming exports.
+
+    Args:
+        rows (int): Number of synthetic articles.
+
+    Returns:
+        list: One row per method with the elapsed time, the throughput, the output size and the peak memory.
+    """
+    import tracemalloc
+
+    from .export import export_articles
+    from .models import Article
+    from .serializers import ArticleSerializer
+
+    def serialize_everything():
+        yield json.dumps(ArticleSerializer(Article.objects.all(), many=True,
+                                           fields=['id', 'title', 'description', 'body', 'source', 'category',
+                                                   'time_published', 'image']).data).encode()
+
+    methods = [
+        ('serialize all', serialize_everything),
+        ('stream ndjson', lambda: export_articles('ndjson')),
+        ('stream csv', lambda: export_articles('csv')),
+        ('stream ndjson gzip', lambda: export_articles('ndjson', compress=True)),
+    ]
+    results = []
+    with scratch_database():
+        insert_synthetic_articles(rows, text=True)
+        for method, export in methods:
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in export())
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({
+                'method': method,
+                'rows': rows,
+                'seconds': round(elapsed, 2),
+                'rows_per_sec': _rate(rows, elapsed),
+                'output_mb': round(size / 2 ** 20, 1),
+                'peak_mb': round(peak / 2 ** 20, 1),
+            })
+    return results
+
+
+@register('import')
+def import_benchmark(rows=5000, **options):
+    """
+    Times importing a gzipped JSON lines dump of GNews items with the import_articles machinery at several batch
+    sizes, against creating one article and fingerprint per row as the live ingestion used to.
+
+    Args:
+        rows (int): Number of items in the dump.
+
+    Returns:
+        list: One row per method with the elapsed time and the throughput.
+    """
+    import gzip
+
+    from .dedup import fingerprint_fields
+    from .importer import ArticleImporter, map_item, read_items
+    from .models import Article, ArticleFingerprint, Source
+    from .utils import build_article
+
+    vocabulary = synthetic_vocabulary()
+    picker = random.Random(0)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'dump.jsonl.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as dump:
+        for index in range(rows):
+            dump.write(json.dumps({
+                'title': ' '.join(picker.choices(vocabulary, k=8)),
+                'description': ' '.join(picker.choices(vocabulary, k=20)),
+                'content': ' '.join(picker.choices(vocabulary, k=60)),
+                'url': f'https://example.com/story/{index}',
+                'publishedAt': '2024-03-01T10:00:00Z',
+                'source': {'name': vocabulary[index % 50].title(), 'url': 'https://example.com'},
+            }) + '\n')
+
+    def per_row():
+        for raw in read_items(path):
+            item = map_item(raw)
+            article = build_article(item)
+            article.site, _ = Source.objects.get_or_create(name=item['source']['name'])
+            article.save()
+            ArticleFingerprint.objects.create(article=article, **fingerprint_fields(item))
+
+    methods = [('per row', per_row)] + [
+        (f'batches of {size}', lambda size=size: ArticleImporter(batch_size=size).run(read_items(path)))
+        for size in (100, 1000, 10000)]
+    results = []
+    try:
+        with scratch_database():
+            for method, run in methods:
+                Article.objects.all().delete()
+                ArticleFingerprint.objects.all().delete()
+                Source.objects.all().delete()
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                assert Article.objects.count() == rows, f'{method} imported {Article.objects.count()} articles'
+                results.append({
+                    'method': method,
+                    'rows': rows,
+                    'seconds': round(elapsed, 2),
+                    'rows_per_sec': _rate(rows, elapsed),
+                })
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+@register('source_listing')
+def source_listing_benchmark(rows=1000000, repeat=5, **options):
+    """
+    Times the backfill linking articles to their Source, then compares per-source counts and listings filtering on
+    the source string with the same queries on the indexed site foreign key.
+
+    Args:
+        rows (int): Number of synthetic articles, spread over 50 sources.
+        repeat (int): Number of timed runs per query.
+
+    Returns:
+        list: One row per query and filter with the median time.
+    """
+    from importlib import import_module
+
+    from django.apps import apps
+
+    from .models import Article, Source
+
+    backfill = import_module('newsapp.migrations.0029_article_site_backfill').link_articles_to_sources
+    results = []
+    with scratch_database():
+        insert_synthetic_articles(rows, text=True)
+        Article.objects.update(site=None)
+        start = time.perf_counter()
+        backfill(apps, None)
+        report_progress(options, f'Linked {rows} articles to their source in {time.perf_counter() - start:.1f}s')
+
+        source = Source.objects.order_by('name').first()
+        queries = {
+            'count': lambda articles: articles.count(),
+            'latest 20': lambda articles: list(articles.order_by('-time_published')[:20]),
+        }
+        filters = {
+            'source string': lambda: Article.objects.filter(source=source.name),
+            'site foreign key': lambda: Article.objects.filter(site_id=source.pk),
+        }
+        for query, run in queries.items():
+            for label, articles in filters.items():
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run(articles())
+                    samples.append(time.perf_counter() - start)
+                results.append({
+                    'query': query,
+                    'filter': label,
+                    'median_ms': round(statistics.median(samples) * 1000, 2),
+                })
+    return results
+
+
+@register('asgi')
+def asgi_benchmark(rows=10000, requests=400, concurrency=8, latency=0.1, **options):
+    """
+    Compares the synchronous views served like a threaded WSGI worker with their async variants served on one
+    event loop, in process and without any network between client and server.
+
+    WSGI requests go through django.test.Client from a pool of 'concurrency' threads and ASGI requests through
+    django.test.AsyncClient with as many requests in flight. Image regeneration, which mostly waits on OpenAI and
+    the image host, is also run with 8 times more requests in flight on the event loop, which costs no extra
+    thread, like the OpenAI calls alone. Those run 32 times per WSGI thread. OpenAI and the image host are a local
+    stub server adding 'latency' seconds to every OpenAI call.
+
+    Use the loadtest command to compare real WSGI and ASGI deployments over the network.
+
+    Args:
+        rows (int): Number of synthetic articles.
+        requests (int): Number of requests per page and API scenario.
+        concurrency (int): Number of WSGI threads, and of requests in flight on the event loop.
+        latency (float): Simulated OpenAI round-trip time in seconds.
+
+    Returns:
+        list: One row per scenario and server with the throughput and the latency percentiles.
+    """
+    import asyncio
+    import threading
+    from unittest import mock
+
+    import openai
+    from django.contrib.auth.models import User
+    from django.test import AsyncClient, Client
+
+    from . import http_client
+    from .loadtest import run_async, run_threaded
+    from .models import Article
+    from .utils import (achat_with_gpt3, agenerate_image, aregenerate_article_image, chat_with_gpt3,
+                        generate_image, regenerate_article_image)
+
+    fields = 'id,title,description,source,category,time_published'
+    scenarios = [
+        ('article API', f'/api/v1/article?page_size=20&fields={fields}',
+         f'/async/api/v1/article?page_size=20&fields={fields}'),
+        ('category page', '/news/general', '/async/news/general'),
+        ('article page', '/article/{pk}/', '/async/article/{pk}/'),
+    ]
+    results = []
+    server, base_url = start_stub_server([make_news_item(index) for index in range(concurrency * 8)],
+                                         latency=latency)
+    try:
+        with scratch_database(), override_settings(ALLOWED_HOSTS=['testserver']), \
+                mock.patch.object(openai, 'api_base', f'{base_url}/v1'), \
+                mock.patch.object(openai, 'api_key', 'benchmark'):
+            insert_synthetic_articles(rows, text=True)
+            user = User.objects.create_user('benchmark')
+            pks = list(Article.objects.order_by('-id').values_list('id', flat=True)[:100])
+
+            # One client per WSGI thread, sharing the session of the logged in user
+            local = threading.local()
+            login = Client()
+            login.force_login(user)
+
+            def wsgi_client():
+                if not hasattr(local, 'client'):
+                    local.client = Client()
+                    local.client.cookies = login.cookies
+                return local.client
+
+            async_client = AsyncClient()
+            async_client.cookies = login.cookies
+
+            def record(scenario, server_name, in_flight, summary):
+                results.append({'scenario': scenario, 'server': server_name, 'in_flight': in_flight, **summary})
+
+            for scenario, wsgi_path, asgi_path in scenarios:
+                def wsgi_call(index, path=wsgi_path):
+                    return wsgi_client().get(path.format(pk=pks[index % len(pks)])).status_code == 200
+
+                async def asgi_call(index, path=asgi_path):
+                    return (await async_client.get(path.format(pk=pks[index % len(pks)]))).status_code == 200
+
+                # Warming the listing cache and the connections before timing
+                wsgi_call(0)
+                asyncio.run(asgi_call(0))
+                record(scenario, 'WSGI', concurrency, run_threaded(wsgi_call, requests, concurrency))
+                record(scenario, 'ASGI', concurrency, asyncio.run(run_async(asgi_call, requests, concurrency)))
+
+            # Articles titled after the stub items, which the stub chat endpoint requires
+            articles = [Article.objects.create(title=item['title'], body=item['content'], source='Benchmark',
+                                               category='general')
+                        for item in server.stub['items']]
+            regenerations = concurrency * 32
+
+            def wsgi_prompt(index):
+                article = articles[index % len(articles)]
+                return bool(generate_image(chat_with_gpt3(article.title, article.body, use_cache=False),
+                                           use_cache=False))
+
+            async def asgi_prompt(index):
+                article = articles[index % len(articles)]
+                return bool(await agenerate_image(await achat_with_gpt3(article.title, article.body,
+                                                                        use_cache=False), use_cache=False))
+
+            def wsgi_regenerate(index):
+                regenerate_article_image(articles[index % len(articles)], use_cache=False)
+                return True
+
+            async def asgi_regenerate(index):
+                await aregenerate_article_image(articles[index % len(articles)], use_cache=False)
+                return True
+
+            async def run_on_loop(call, in_flight):
+                try:
+                    return await run_async(call, regenerations, in_flight)
+                finally:
+                    await http_client.close_async_session()
+
+            # The OpenAI round trips alone only wait on the network, while a full regeneration also spends tens of
+            # milliseconds encoding renditions, CPU work that no server model overlaps under the GIL
+            for scenario, wsgi_call, asgi_call in (('OpenAI calls', wsgi_prompt, asgi_prompt),
+                                                   ('image regeneration', wsgi_regenerate, asgi_regenerate)):
+                record(scenario, 'WSGI', concurrency, run_threaded(wsgi_call, regenerations, concurrency))
+                for in_flight in (concurrency, concurrency * 8):
+                    record(scenario, 'ASGI', in_flight, asyncio.run(run_on_loop(asgi_call, in_flight)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+@register('sqlite_concurrency')
+def sqlite_concurrency_benchmark(rows=100000, seconds=5.0, readers=8, writers=2, **options):
+    """
+    Runs a mixed read and write workload against SQLite with Django's default connection setup, with the pragmas
+    of newsapp.db, and with the pragmas and persistent connections.
+
+    Readers load the latest 20 articles of a category, like the news pages, and writers create an article and
+    edit another one in a transaction, like ingestion and editors do. The transactions start with a plain BEGIN
+    except with the IMMEDIATE transaction mode of newsapp.backends.sqlite3. Without persistent connections every
+    operation opens a new connection, as every request does with CONN_MAX_AGE = 0.
+
+    Args:
+        rows (int): Number of synthetic articles.
+        seconds (float): Duration of the workload per configuration.
+        readers (int): Number of reading threads.
+        writers (int): Number of writing threads.
+
+    Returns:
+        list: One row per configuration and operation with the number of successful operations, their throughput,
+              the latency percentiles and the number of "database is locked" errors.
+    """
+    import threading
+
+    from django.db import OperationalError, connections
+    from django.utils import timezone
+
+    from .loadtest import summarize
+    from .models import Article
+
+    # Django's own setup: rollback journal, full syncing and the 5 s timeout of the sqlite3 module
+    default_pragmas = {'journal_mode': 'delete', 'synchronous': 'full', 'busy_timeout': 5000, 'cache_size': -2000,
+                       'mmap_size': 0}
+    # Journal modes persist in the database file, so the rollback journal configuration runs first
+    configurations = [
+        ('Django defaults', default_pragmas, None, False),
+        ('WAL pragmas', {}, None, False),
+        ('WAL + immediate transactions', {}, 'IMMEDIATE', False),
+        ('WAL + immediate + persistent', {}, 'IMMEDIATE', True),
+    ]
+    categories = [code for code, _ in Article.CATEGORIES]
+    results = []
+    with scratch_database():
+        insert_synthetic_articles(rows)
+        max_id = Article.objects.order_by('-id').values_list('id', flat=True).first()
+
+        options = connections.settings[connection.alias].setdefault('OPTIONS', {})
+        original_mode = options.pop('transaction_mode', None)
+        for label, pragmas, transaction_mode, persistent in configurations:
+            connections.close_all()
+            # New connections read the transaction mode from the shared settings of the alias
+            options['transaction_mode'] = transaction_mode
+            stats = {'read': ([], [0]), 'write': ([], [0])}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + seconds
+
+            def read(picker):
+                category = picker.choice(categories)
+                list(Article.objects.filter(category=category).order_by('-time_published')
+                     .values('id', 'title', 'time_published')[:20])
+
+            def write(picker):
+                with transaction.atomic():
+                    Article.objects.create(title='Benchmark write', description='Description', body='Body',
+                                           source='Benchmark', category=picker.choice(categories))
+                    Article.objects.filter(pk=picker.randint(1, max_id)).update(
+                        description=f'Edited {picker.random()}', updated_at=timezone.now())
+
+            def worker(operation, seed):
+                picker = random.Random(seed)
+                latencies, errors = [], 0
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        (read if operation == 'read' else write)(picker)
+                    except OperationalError:
+                        # "database is locked", after waiting busy_timeout for the lock
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+                    if not persistent:
+                        connection.close()
+                connection.close()
+                with lock:
+                    stats[operation][0].extend(latencies)
+                    stats[operation][1][0] += errors
+
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                threads = [threading.Thread(target=worker, args=('read', index)) for index in range(readers)]
+                threads += [threading.Thread(target=worker, args=('write', readers + index))
+                            for index in range(writers)]
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+
+            for operation, (latencies, errors) in stats.items():
+                summary = summarize(latencies, elapsed, errors[0])
+                # Failed operations are left out of the throughput
+                done = summary['requests'] - errors[0]
+                results.append({'configuration': label, 'journal': journal_mode, 'operation': operation,
+                                'done': done, 'per_sec': _rate(done, elapsed), 'p50_ms': summary['p50_ms'],
+                                'p99_ms': summary['p99_ms'], 'locked': errors[0]})
+        connections.close_all()
+        options['transaction_mode'] = original_mode
+    return results
+
+
+@register('stats')
+def stats_benchmark(rows=1000000, repeat=5, **options):
+    """
+    Compares the per-category and per-source counts of the stats endpoint read from the stats table with the same
+    counts computed by grouping the articles, over one day, 30 days and a year, then times inserts with and without
+    the triggers maintaining the stats table.
+
+    Args:
+        rows (int): Number of synthetic articles, one every 31 seconds over 50 sources, about a year for 1M rows.
+        repeat (int): Number of timed runs per query.
+
+    Returns:
+        list: One row per range and counting method with the median time, and one row per insert mode.
+    """
+    from unittest import mock
+
+    from django.utils import timezone
+
+    from . import stats
+    from .models import ArticleStat
+
+    results = []
+    with scratch_database():
+        start = time.perf_counter()
+        insert_synthetic_articles(rows, text=True)
+        report_progress(options, f'Inserted {rows} articles in {time.perf_counter() - start:.1f}s')
+        if connection.vendor == 'sqlite':
+            connection.cursor().execute('ANALYZE')
+        report_progress(options, f'{ArticleStat.objects.count()} stats rows')
+
+        today = timezone.now().date()
+        for days in (1, 30, 366):
+            counts = {}
+            for method, vendors in (('stats table', stats.TRIGGER_VENDORS), ('group by articles', ())):
+                samples = []
+                with mock.patch.object(stats, 'TRIGGER_VENDORS', vendors):
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        counts[method] = stats.article_counts(today, days)
+                        samples.append(time.perf_counter() - start)
+                results.append({
+                    'measure': f'counts of {days} days',
+                    'method': method,
+                    'articles': counts[method]['total'],
+                    'median_ms': round(statistics.median(samples) * 1000, 2),
+                })
+            # Both methods must agree, or the timings compare different work
+            assert counts['stats table'] == counts['group by articles'], f'Counts of {days} days differ'
+
+        # Timing the same inserts with the triggers, then without them
+        inserts = max(rows // 10, 1)
+        for mode in ('with stats triggers', 'without stats triggers'):
+            if mode.startswith('without') and connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    for name in stats.SQLITE_TRIGGERS:
+                        cursor.execute(f'DROP TRIGGER {name}')
+            start = time.perf_counter()
+            insert_synthetic_articles(inserts, text=True)
+            elapsed = time.perf_counter() - start
+            results.append({'measure': f'insert {inserts} articles', 'method': mode, 'articles': inserts,
+                            'median_ms': round(elapsed * 1000, 2)})
+    return results
+
+
+@register('archive')
+def archive_benchmark(rows=200000, repeat=5, days=30, **options):
+    """
+    Times the listing queries and the article lookups on a year of articles, then archives the articles older than
+    'days' days and times them again, along with the archiving itself.
+
+    Args:
+        rows (int): Number of synthetic articles, one every 31 seconds, about 70 days for 200k rows.
+        repeat (int): Number of timed runs per query.
+        days (int): Age of the oldest articles kept in the article table.
+
+    Returns:
+        list: One row per query before and after archiving with the median time, then one row on the archiving.
+    """
+    from .archive import ArticleArchiver, archive_cutoff
+    from .models import ArchivedArticle, Article
+
+    def hot_table_size():
+        # Pages of the article table and of its indexes, through SQLite's dbstat table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                           "(SELECT name FROM sqlite_master WHERE tbl_name = 'newsapp_article')")
+            return round(cursor.fetchone()[0] / 2 ** 20, 1)
+
+    results = []
+    with scratch_database():
+        insert_synthetic_articles(rows, text=True)
+        cutoff = archive_cutoff(days)
+        recent_pk = Article.objects.filter(time_published__gte=cutoff).order_by('time_published').first().pk
+        old_pk = Article.objects.order_by('time_published').first().pk
+        queries = {
+            'latest 20 in a category': lambda: list(Article.objects.filter(category='health')
+                                                    .order_by('-time_published')[:20]),
+            'count of a category': lambda: Article.objects.filter(category='general').count(),
+            'recent article page': lambda: Article.objects.get_or_archived(recent_pk).body,
+            'old article page': lambda: Article.objects.get_or_archived(old_pk).body,
+        }
+
+        for stage in ('before archiving', 'after archiving'):
+            if stage == 'after archiving':
+                archiver = ArticleArchiver(cutoff=cutoff, batch_size=5000).run()
+                if connection.vendor == 'sqlite':
+                    connection.cursor().execute('VACUUM')
+            connection.cursor().execute('ANALYZE')
+            size = hot_table_size() if connection.vendor == 'sqlite' else None
+            for query, run in queries.items():
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    samples.append(time.perf_counter() - start)
+                results.append({'stage': stage, 'query': query, 'articles': Article.objects.count(),
+                                'article_table_mb': size, 'median_ms': round(statistics.median(samples) * 1000, 2)})
+
+        results.append({'stage': 'archiving', 'query': f'{archiver.compression}, ratio {archiver.ratio}',
+                        'articles': ArchivedArticle.objects.count(), 'article_table_mb': size,
+                        'median_ms': round(archiver.elapsed * 1000, 2)})
+    return results
+
+
+@register('cards')
+def cards_benchmark(rows=20000, repeat=5, **options):
+    """
+    Compares loading and rendering listings of 5, 50 and 500 articles as full model instances, as instances with
+    a deferred body, and as ArticleCard objects built from values() rows.
+
+    Bodies are set to 3000 characters, the length of a typical generated article, so full instances carry what
+    the listings of the site would load.
+
+    Args:
+        rows (int): Number of synthetic articles.
+        repeat (int): Number of timed runs per page size and method.
+
+    Returns:
+        list: One row per page size and method with the median time to load the page and to render its cards,
+              and the memory allocated by loading it.
+    """
+    import tracemalloc
+
+    from django.template.loader import render_to_string
+
+    from .cards import load_cards
+    from .models import Article
+
+    methods = {
+        'model instances': lambda articles: list(articles),
+        'deferred body': lambda articles: list(articles.defer('body')),
+        'cards': load_cards,
+    }
+    results = []
+    with scratch_database():
+        insert_synthetic_articles(rows, text=True)
+        Article.objects.update(body='x' * 3000)
+
+        for page_size in (5, 50, 500):
+            articles = Article.objects.order_by('-time_published', '-id')[:page_size]
+            for method, load in methods.items():
+                load_samples, render_samples = [], []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    page = load(articles.all())
+                    load_samples.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    render_to_string('article_cards.html', {'articles': page})
+                    render_samples.append(time.perf_counter() - start)
+
+                # Measuring allocations in a run of their own, tracing slows every allocation down
+                tracemalloc.start()
+                page = load(articles.all())
+                allocated, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del page
+                results.append({
+                    'page_size': page_size,
+                    'method': method,
+                    'load_ms': round(statistics.median(load_samples) * 1000, 2),
+                    'render_ms': round(statistics.median(render_samples) * 1000, 2),
+                    'kept_kib': round(allocated / 1024, 1),
+                    'peak_kib': round(peak / 1024, 1),
+                })
+    return results
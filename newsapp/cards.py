@@ -0,0 +1,77 @@
+from django.urls import reverse
+
+from .images import picture_sources
+
+# Columns an article card shows, the only ones loaded for listings
+CARD_FIELDS = ('id', 'title', 'description', 'source', 'time_published', 'image', 'image_renditions')
+
+
+class ArticleCard:
+    """
+    Read-only card of an article, as listed by the home and news pages and by the card feed of the API.
+
+    Cards are built from values() rows of CARD_FIELDS, so listings never load the body nor build model instances,
+    and their slots spare them the per-instance dict. They read like articles in the card template.
+
+    Attributes:
+        id (int): The primary key of the article.
+        title, description, source, time_published: As on Article.
+        image (str): Stored file name of the original image, empty or None when there is none.
+        image_renditions (dict): As on Article.
+    """
+    __slots__ = CARD_FIELDS
+
+    def __init__(self, id, title, description, source, time_published, image, image_renditions):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.source = source
+        self.time_published = time_published
+        self.image = image
+        self.image_renditions = image_renditions
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_absolute_url(self):
+        return reverse('article_view', args=[self.id])
+
+    @property
+    def card_image(self):
+        return picture_sources(self.image_renditions, 'card', self.image)
+
+    def as_dict(self):
+        """
+        Returns the card as JSON-ready data, with the URL of the article page and the card sized image.
+        """
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'source': self.source,
+            'time_published': self.time_published.isoformat(),
+            'url': self.get_absolute_url(),
+            'image': self.card_image,
+        }
+
+
+def load_cards(articles):
+    """
+    Returns the cards of the articles of a queryset, loading only CARD_FIELDS.
+
+    Args:
+        articles (QuerySet): The articles, filtered, ordered and sliced.
+
+    Returns:
+        list: The ArticleCard of every article.
+    """
+    return [ArticleCard(**row) for row in articles.values(*CARD_FIELDS)]
+
+
+async def aiter_cards(articles):
+    """
+    Asynchronous load_cards, yielding the cards as the asynchronous ORM fetches their rows.
+    """
+    async for row in articles.values(*CARD_FIELDS):
+        yield ArticleCard(**row)
@@ -0,0 +1,61 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, archived bodies are then compressed with zlib only
+    zstandard = None
+
+# Compression methods of archived article bodies, see settings.ARCHIVE_COMPRESSION
+METHODS = ('zlib', 'zstd')
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+def compression_method():
+    """
+    Returns the method compressing newly archived bodies, see settings.ARCHIVE_COMPRESSION.
+
+    Raises:
+        ImproperlyConfigured: If the method is unknown, or is zstd and the zstandard package is not installed.
+    """
+    method = getattr(settings, 'ARCHIVE_COMPRESSION', 'zlib')
+    if method not in METHODS:
+        raise ImproperlyConfigured(f'ARCHIVE_COMPRESSION must be one of {", ".join(METHODS)}, not {method!r}')
+    if method == 'zstd' and zstandard is None:
+        raise ImproperlyConfigured('ARCHIVE_COMPRESSION is zstd but the zstandard package is not installed')
+    return method
+
+
+def compress_body(text, method):
+    """
+    Compresses an article body.
+
+    Bodies are compressed one by one so any of them can be read alone, at the cost of a lower ratio than whole
+    batches would get, hence the high compression levels: bodies are compressed once and read rarely.
+
+    Args:
+        text (str): The body.
+        method (str): 'zlib' or 'zstd'.
+
+    Returns:
+        bytes: The compressed UTF-8 body.
+    """
+    data = text.encode('utf-8')
+    if method == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_body(data, method):
+    """
+    Returns the body compressed by compress_body with the given method.
+    """
+    data = bytes(data)
+    if method == 'zstd':
+        if zstandard is None:
+            raise ImproperlyConfigured('Reading bodies archived with zstd requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
@@ -0,0 +1,127 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from .groups import user_group_names
+from .models import ArchivedArticle, Article, Source
+
+
+# Attribute under which the versions loaded for a conditional request are memoized on the request, so that the ETag
+# and the Last-Modified functions of the condition decorator share one lookup
+REQUEST_ATTRIBUTE = '_newsapp_article_versions'
+
+
+def _digest(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _memoized(request, load):
+    if not hasattr(request, REQUEST_ATTRIBUTE):
+        setattr(request, REQUEST_ATTRIBUTE, load())
+    return getattr(request, REQUEST_ATTRIBUTE)
+
+
+def article_updated_at(pk, archived=False):
+    """
+    Returns when the article with the given primary key last changed, or None when it does not exist.
+
+    With 'archived', articles moved to the archive are looked up as well, for the article page that displays them.
+    """
+    try:
+        updated_at = Article.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None and archived:
+            updated_at = ArchivedArticle.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        return updated_at
+    except (TypeError, ValueError):
+        # Not a valid primary key, the view itself reports the error
+        return None
+
+
+def article_page_etag(request, pk=None, **kwargs):
+    """
+    Returns the ETag of an article page, or None when the article does not exist.
+
+    Serves as the etag_func of django.views.decorators.http.condition, at the cost of one indexed lookup shared
+    with article_page_last_modified.
+
+    Besides the article version, the page depends on whether the visitor is logged in and on their groups, which
+    decide the navigation entries and the edit and delete buttons. Group names come from the per-request cache
+    the templates use, so computing the ETag adds no query.
+    """
+    updated_at = _memoized(request, lambda: article_updated_at(pk, archived=True))
+    if updated_at is None:
+        return None
+    return _digest('page', pk, updated_at.isoformat(), request.user.is_authenticated,
+                   ','.join(sorted(user_group_names(request.user))))
+
+
+def article_page_last_modified(request, pk=None, **kwargs):
+    """
+    Returns the Last-Modified time of an article page, its updated_at, or None when the article does not exist.
+
+    Serves as the last_modified_func of django.views.decorators.http.condition, next to article_page_etag. Clients
+    sending If-None-Match are answered from the ETag alone, which also covers the visitor's groups.
+    """
+    return _memoized(request, lambda: article_updated_at(pk, archived=True))
+
+
+def _article_api_versions(request):
+    # The version and last change of the requested article or list, or None
+    article_id = request.GET.get('id')
+    if article_id:
+        try:
+            row = Article.objects.filter(pk=article_id).values_list('updated_at', 'site__updated_at').first()
+        except (TypeError, ValueError):
+            # Not a valid primary key, the view itself reports the error
+            return None
+        if row is None:
+            return None
+        version = ':'.join(value.isoformat() if value else '' for value in row)
+        return version, max(value for value in row if value)
+
+    latest = Article.objects.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+    sources = Source.objects.aggregate(updated_at=Max('updated_at'))['updated_at']
+    version = (f"{latest['updated_at'].isoformat() if latest['updated_at'] else ''}:{latest['count']}:"
+               f"{sources.isoformat() if sources else ''}")
+    return version, max((value for value in (latest['updated_at'], sources) if value), default=None)
+
+
+def article_api_etag(request):
+    """
+    Returns the ETag of a GET /api/v1/article response, or None for other requests.
+
+    Articles nest the name of their Source, so a response is versioned by the sources as well. A single article is
+    versioned by its updated_at and its source's updated_at, read in one query. A page of the list is versioned by
+    the latest updated_at and the number of articles, which together change with every save and delete, and by the
+    latest updated_at of the sources. The query string and the Accept header are included since the same URL also
+    serves the browsable API.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    versions = _memoized(request, lambda: _article_api_versions(request))
+    if versions is None:
+        return None
+    return _digest('api', request.GET.urlencode(), request.META.get('HTTP_ACCEPT', ''), versions[0])
+
+
+def article_api_last_modified(request):
+    """
+    Returns the Last-Modified time of a GET /api/v1/article response, or None for other requests.
+
+    A single article was last modified when it or its source last changed, a page of the list when any article or
+    source last did. Deleting an article changes no updated_at, so only the ETag, which counts the articles,
+    notices it: clients should prefer If-None-Match. The lookup is shared with article_api_etag.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    versions = _memoized(request, lambda: _article_api_versions(request))
+    return versions[1] if versions else None
+
+
+def article_row_etag(request, pk, updated_at):
+    """
+    Returns the ETag of an article served by the async API, see async_views.article_api.
+
+    The article version was loaded along with the article itself, so computing the ETag costs no query.
+    """
+    return _digest('async-api', request.GET.urlencode(), pk, updated_at.isoformat())
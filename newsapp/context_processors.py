@@ -0,0 +1,11 @@
+from .models import Article
+
+
+def news_categories(request):
+    """
+    Context processor exposing the news categories as 'news_categories', a list of (code, label) pairs.
+
+    The navigation bar builds its news menu from it, so a category added to Article.CATEGORIES gets its page
+    without touching any template.
+    """
+    return {'news_categories': Article.CATEGORIES}
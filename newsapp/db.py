@@ -0,0 +1,81 @@
+import re
+
+from django.conf import settings
+
+# Pragmas applied to every new SQLite connection, unless settings.SQLITE_PRAGMAS overrides them.
+#   journal_mode: WAL lets readers proceed while a writer commits, instead of waiting on the rollback journal lock.
+#   synchronous: NORMAL syncs the WAL at checkpoints rather than on every commit, which stays durable against
+#                application crashes and only risks the last commits on power loss.
+#   busy_timeout: Milliseconds a connection waits for the write lock before failing with "database is locked".
+#   cache_size: Page cache per connection, in KiB when negative.
+#   mmap_size: Bytes of the database file read through memory mapping instead of read calls.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# Pragma values are written into the statement, so only plain words and integers are accepted
+PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE_RE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+
+def sqlite_pragmas():
+    """
+    Returns the pragmas to apply to new SQLite connections.
+
+    settings.SQLITE_PRAGMAS overrides DEFAULT_SQLITE_PRAGMAS key by key. A pragma set to None is left at the SQLite
+    default, and SQLITE_PRAGMAS = None disables the tuning altogether.
+
+    Returns:
+        dict: The pragma values, keyed by pragma name.
+    """
+    overrides = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if overrides is None:
+        return {}
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS, **overrides)
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def apply_sqlite_pragmas(cursor, pragmas=None):
+    """
+    Sets pragmas on a SQLite connection.
+
+    journal_mode is stored in the database file, so switching to WAL holds for every later connection too, while
+    the other pragmas only last as long as the connection. Memory databases, like the ones of the test suite,
+    keep their 'memory' journal.
+
+    Args:
+        cursor: A cursor of the connection, from Django or from the sqlite3 module.
+        pragmas (dict): The pragma values keyed by name. Defaults to sqlite_pragmas().
+
+    Raises:
+        ValueError: If a pragma name or value is not a plain word or integer.
+    """
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME_RE.match(name) or not PRAGMA_VALUE_RE.match(str(value)):
+            raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def read_sqlite_pragmas(cursor, names=None):
+    """
+    Returns the current values of SQLite pragmas, by default of the ones sqlite_pragmas() sets.
+
+    Args:
+        cursor: A cursor of the connection.
+        names (iterable): The pragma names.
+
+    Returns:
+        dict: The value of every pragma, keyed by name.
+    """
+    values = {}
+    for name in names or DEFAULT_SQLITE_PRAGMAS:
+        if not PRAGMA_NAME_RE.match(name):
+            raise ValueError(f'Invalid SQLite pragma {name}')
+        cursor.execute(f'PRAGMA {name}')
+        values[name] = cursor.fetchone()[0]
+    return values
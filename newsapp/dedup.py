@@ -0,0 +1,173 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import ArticleFingerprint
+
+# Query parameters that only track the visit and never change the story behind a URL
+TRACKING_PARAMETERS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ocid', 'cmpid'}
+# Number of words per shingle and bits per SimHash band
+SHINGLE_SIZE = 3
+SIMHASH_BANDS = 4
+BAND_BITS = 64 // SIMHASH_BANDS
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that different spellings of the same link compare equal.
+
+    The scheme and host are lowercased, a leading 'www.' is dropped, tracking parameters, the fragment and
+    a trailing slash are removed and the remaining query parameters are sorted.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL, or an empty string when no URL is given.
+    """
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key.lower() not in TRACKING_PARAMETERS and not key.lower().startswith('utm_'))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https' if parts.scheme in ('http', 'https') else parts.scheme.lower(),
+                       host, path, urlencode(query), ''))
+
+
+def _words(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+def url_hash(url):
+    """
+    Returns the SHA-256 hex digest of the normalized URL, or an empty string when no URL is given.
+    """
+    normalized = normalize_url(url)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest() if normalized else ''
+
+
+def content_hash(title, body):
+    """
+    Returns the SHA-256 hex digest of the title and body, ignoring case, punctuation and whitespace.
+    """
+    text = ' '.join(_words(title)) + '\n' + ' '.join(_words(body))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def simhash(text):
+    """
+    Computes the 64-bit SimHash of a text over word shingles.
+
+    Texts sharing most of their shingles get hashes differing in only a few bits, which makes the
+    Hamming distance between two hashes a cheap near-duplicate measure.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        int: The hash as a signed 64-bit integer, so it fits a BigIntegerField.
+    """
+    words = _words(text)
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    # A bit is set when more shingle hashes have it set than not. Counting the ones column by column over the
+    # binary strings of the hashes does the per-bit loop in C rather than 64 Python steps per shingle.
+    bits = [format(int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'), '064b')
+            for shingle in shingles]
+    majority = len(bits) / 2
+    value = sum(1 << (63 - column) for column, ones in enumerate(zip(*bits)) if ones.count('1') > majority)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def simhash_bands(value):
+    """
+    Splits a SimHash into SIMHASH_BANDS bands. Two hashes within SIMHASH_BANDS - 1 bits share at least one band.
+    """
+    value &= (1 << 64) - 1
+    return [value >> (band * BAND_BITS) & ((1 << BAND_BITS) - 1) for band in range(SIMHASH_BANDS)]
+
+
+def hamming_distance(first, second):
+    return bin((first ^ second) & ((1 << 64) - 1)).count('1')
+
+
+def fingerprint_fields(item):
+    """
+    Computes the fingerprint of a GNews item.
+
+    Args:
+        item (dict): A news item with 'url', 'title' and 'content' keys.
+
+    Returns:
+        dict: Field values for an ArticleFingerprint.
+    """
+    fingerprint = simhash(f"{item.get('title', '')} {item.get('content', '')}")
+    fields = {
+        'url_hash': url_hash(item.get('url')),
+        'content_hash': content_hash(item.get('title'), item.get('content')),
+        'simhash': fingerprint,
+    }
+    fields.update({f'band{band}': value for band, value in enumerate(simhash_bands(fingerprint))})
+    return fields
+
+
+def filter_new_items(items, near_duplicates=None, max_distance=SIMHASH_BANDS - 1, fingerprints=None):
+    """
+    Drops the items that were already ingested, before any LLM work is paid for.
+
+    Known URLs and contents are looked up with one indexed query each for the whole batch. Duplicates inside
+    the batch itself are dropped as well. In near-duplicate mode, items whose SimHash is within max_distance
+    bits of a stored article are also dropped, which catches the same story syndicated by different sources.
+
+    Args:
+        items (list): News items as returned by the news API.
+        near_duplicates (bool): Whether to drop near duplicates. Defaults to settings.INGESTION_NEAR_DUPLICATES.
+        max_distance (int): Maximum Hamming distance between two SimHashes considered duplicates.
+        fingerprints (list): The fingerprint_fields of the items, when the caller computed them already.
+
+    Returns:
+        list: The new items, in their original order.
+    """
+    if near_duplicates is None:
+        near_duplicates = getattr(settings, 'INGESTION_NEAR_DUPLICATES', False)
+    if fingerprints is None:
+        fingerprints = [fingerprint_fields(item) for item in items]
+
+    # Loading the known hashes of the whole batch in bulk
+    url_hashes = {fields['url_hash'] for fields in fingerprints if fields['url_hash']}
+    content_hashes = {fields['content_hash'] for fields in fingerprints}
+    known_urls = set(ArticleFingerprint.objects.filter(url_hash__in=url_hashes).values_list('url_hash', flat=True))
+    known_contents = set(ArticleFingerprint.objects.filter(content_hash__in=content_hashes)
+                         .values_list('content_hash', flat=True))
+
+    known_simhashes = []
+    if near_duplicates and fingerprints:
+        # Any hash within max_distance bits shares a band with the candidate, so the band indexes find them all
+        band_filter = Q()
+        for band in range(SIMHASH_BANDS):
+            band_filter |= Q(**{f'band{band}__in': {fields[f'band{band}'] for fields in fingerprints}})
+        known_simhashes = list(ArticleFingerprint.objects.filter(band_filter).values_list('simhash', flat=True))
+
+    new_items = []
+    for item, fields in zip(items, fingerprints):
+        if fields['url_hash'] in known_urls or fields['content_hash'] in known_contents:
+            continue
+        if near_duplicates and any(hamming_distance(fields['simhash'], known) <= max_distance
+                                   for known in known_simhashes):
+            continue
+        new_items.append(item)
+
+        # Remembering the item so later duplicates in the same batch are skipped too
+        if fields['url_hash']:
+            known_urls.add(fields['url_hash'])
+        known_contents.add(fields['content_hash'])
+        known_simhashes.append(fields['simhash'])
+    return new_items
@@ -0,0 +1,171 @@
+import csv
+import itertools
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .compression import decompress_body
+from .models import ArchivedArticle, Article
+
+# Article columns written by an export
+ARTICLE_FIELDS = ('id', 'title', 'description', 'body', 'source', 'category', 'time_published', 'updated_at',
+                  'site_id', 'image')
+
+# Columns of an export, in CSV column order. 'archived' tells apart the articles moved into the archive by the
+# archive_articles command
+EXPORT_FIELDS = (*ARTICLE_FIELDS, 'archived')
+
+# Columns read as they are from both the article and the archive table
+STORED_FIELDS = tuple(field for field in ARTICLE_FIELDS if field != 'body')
+
+# Export formats and their media types
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Number of encoded rows joined into each chunk of output
+ROWS_PER_CHUNK = 100
+
+
+class _Echo:
+    """
+    File-like object returning what is written to it, so csv.writer can format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def chunk_size():
+    """
+    Returns the number of rows fetched from the database at a time, see settings.EXPORT_CHUNK_SIZE.
+    """
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _archived_rows(category=None):
+    # Archived articles are older than the ones left in the article table, so they come first
+    articles = ArchivedArticle.objects.all()
+    if category:
+        articles = articles.filter(category=category)
+    rows = articles.order_by('id').values(*STORED_FIELDS, 'compressed_body', 'compression')
+    for row in rows.iterator(chunk_size=chunk_size()):
+        row['body'] = decompress_body(row.pop('compressed_body'), row.pop('compression'))
+        row['archived'] = True
+        yield {field: row[field] for field in EXPORT_FIELDS}
+
+
+def _article_rows(category=None):
+    articles = Article.objects.all()
+    if category:
+        articles = articles.filter(category=category)
+    for row in articles.order_by('id').values(*STORED_FIELDS, 'body').iterator(chunk_size=chunk_size()):
+        row['archived'] = False
+        yield {field: row[field] for field in EXPORT_FIELDS}
+
+
+def export_rows(category=None):
+    """
+    Yields the articles to export as plain dictionaries, the archived ones first, each oldest first.
+
+    Rows come from .values() and .iterator(), so no model instance is built and only one chunk of rows is held
+    in memory at a time, however large the archive. Archived bodies are decompressed one row at a time.
+
+    Args:
+        category (str): Restricts the export to one of Article.CATEGORIES.
+
+    Returns:
+        iterator: One dictionary per article, keyed by EXPORT_FIELDS.
+    """
+    return itertools.chain(_archived_rows(category), _article_rows(category))
+
+
+def _batched(lines, size):
+    # Joining lines into larger chunks keeps the number of writes, and of response chunks, low
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
+
+
+def ndjson_chunks(rows):
+    """
+    Encodes rows as newline delimited JSON, one object per line.
+
+    Args:
+        rows (iterable): The rows, as dictionaries.
+
+    Returns:
+        iterator: UTF-8 encoded chunks of several lines each.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return _batched((encoder.encode(row) + '\n' for row in rows), ROWS_PER_CHUNK)
+
+
+def csv_chunks(rows):
+    """
+    Encodes rows as CSV, with a header line naming EXPORT_FIELDS.
+
+    Args:
+        rows (iterable): The rows, as dictionaries.
+
+    Returns:
+        iterator: UTF-8 encoded chunks of several lines each.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+    return _batched(lines(), ROWS_PER_CHUNK)
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresses a sequence of chunks into a single gzip stream, without holding more than one chunk.
+
+    Args:
+        chunks (iterable): The uncompressed chunks, as bytes.
+        level (int): The zlib compression level, from 1 to 9.
+
+    Returns:
+        iterator: The gzip compressed chunks.
+    """
+    # wbits=31 makes zlib write a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_articles(export_format='ndjson', compress=False, category=None):
+    """
+    Streams the articles in the given format, optionally gzip compressed.
+
+    Args:
+        export_format (str): One of FORMATS.
+        compress (bool): Whether to gzip the output.
+        category (str): Restricts the export to one of Article.CATEGORIES.
+
+    Returns:
+        iterator: The exported chunks, as bytes.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f'Unknown export format {export_format!r}, expected one of {", ".join(FORMATS)}')
+
+    encode = ndjson_chunks if export_format == 'ndjson' else csv_chunks
+    chunks = encode(export_rows(category))
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,66 @@
+from django.utils.functional import SimpleLazyObject
+
+# Attribute under which a user's group names are memoized on the user object
+CACHE_ATTRIBUTE = '_newsapp_group_names'
+
+# Groups allowed to edit and to delete articles
+EDITING_GROUPS = ('Writers', 'Editors', 'Senior editors')
+DELETING_GROUPS = ('Editors', 'Senior editors')
+
+
+def user_group_names(user):
+    """
+    Returns the names of the groups a user belongs to, loading them with a single query.
+
+    The result is memoized on the user object. Since request.user is loaded anew for every request, membership is
+    resolved at most once per request however many checks the views and templates make.
+
+    Args:
+        user (User): The user, possibly anonymous.
+
+    Returns:
+        frozenset: The names of the user's groups. Empty for anonymous users, without any query.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return frozenset()
+
+    group_names = getattr(user, CACHE_ATTRIBUTE, None)
+    if group_names is None:
+        group_names = frozenset(user.groups.values_list('name', flat=True))
+        setattr(user, CACHE_ATTRIBUTE, group_names)
+    return group_names
+
+
+def invalidate_group_names(user):
+    """
+    Drops the memoized group names of a user so that the next check queries them again.
+    """
+    user.__dict__.pop(CACHE_ATTRIBUTE, None)
+
+
+def in_any_group(user, group_names):
+    """
+    Tells whether a user belongs to at least one of the given groups.
+
+    Args:
+        user (User): The user, possibly anonymous.
+        group_names (iterable): The names of the groups.
+
+    Returns:
+        bool: True if the user is a member of any of the groups.
+    """
+    return not user_group_names(user).isdisjoint(group_names)
+
+
+def user_groups(request):
+    """
+    Context processor exposing the current user's group names as 'user_groups'.
+
+    The names are loaded lazily, so pages that never check membership make no query.
+
+    Example Usage in Template:
+        {% if 'Editors' in user_groups %}
+            <!-- HTML to render if user is in the 'Editors' group -->
+        {% endif %}
+    """
+    return {'user_groups': SimpleLazyObject(lambda: user_group_names(request.user))}
@@ -0,0 +1,312 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+import weakref
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Other requests, such as paid OpenAI calls, may have been acted upon by the server before failing, so they are
+# only retried when they provably never reached it
+RETRY_ANY_FAILURE_METHODS = {'GET', 'HEAD'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_timeout():
+    """
+    Returns the (connect, read) timeout tuple applied to every outbound request.
+    """
+    return _setting('HTTP_CONNECT_TIMEOUT', 5), _setting('HTTP_READ_TIMEOUT', 60)
+
+
+def parse_retry_after(value):
+    """
+    Parses the value of a Retry-After header.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+
+    Returns:
+        float: The number of seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def should_retry_status(method, status, retry_after=None):
+    """
+    Tells whether a response status is worth retrying for the given request method.
+
+    GET and HEAD requests are retried on any transient error status. Other methods are only retried on a 429
+    carrying a Retry-After header, by which the server states that it refused the request.
+
+    Args:
+        method (str): The HTTP method of the request.
+        status (int): The status of the response.
+        retry_after (float): The parsed Retry-After header of the response, or None if it had none.
+
+    Returns:
+        bool: True if the request should be sent again.
+    """
+    if method in RETRY_ANY_FAILURE_METHODS:
+        return status in RETRY_STATUSES
+    return status == 429 and retry_after is not None
+
+
+def is_connect_failure(error):
+    """
+    Tells whether a requests exception was raised before a connection was established, i.e. before any byte of
+    the request was sent.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # requests wraps the urllib3 MaxRetryError, whose reason is the original error
+    reason = error.args[0] if error.args else None
+    return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+
+
+class RetryingHTTPAdapter(HTTPAdapter):
+    """
+    Connection-pooling transport adapter with default timeouts and retries.
+
+    Failed requests are retried with exponential backoff and full jitter, honoring the Retry-After header of
+    the response when the server sends one. GET and HEAD requests are retried on any connection error, timeout
+    or transient error status. Other methods are only retried when the connection could not be established
+    or on a 429 with Retry-After, so that a request the server may have acted upon is never sent twice.
+
+    Attributes:
+        timeout (tuple): Default (connect, read) timeout used when the caller does not pass one.
+        retries (int): Maximum number of retries per request.
+        backoff_factor (float): Base delay in seconds of the exponential backoff.
+        backoff_max (float): Upper bound in seconds of any single wait, including Retry-After.
+        retry_count (int): Number of retries performed so far, across all requests.
+    """
+
+    def __init__(self, pool_size=10, timeout=None, retries=3, backoff_factor=0.5, backoff_max=30.0):
+        # urllib3's own retry logic is disabled in favour of the loop in send()
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_count = 0
+        self._lock = threading.Lock()
+
+    def count_retry(self):
+        with self._lock:
+            self.retry_count += 1
+
+    def backoff(self, attempt):
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    def _should_retry(self, method, response, retry_after):
+        return should_retry_status(method, response.status_code, retry_after)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+
+        attempt = 0
+        while True:
+            try:
+                response = super().send(request, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+                retryable = request.method in RETRY_ANY_FAILURE_METHODS or is_connect_failure(error)
+                if not retryable or attempt >= self.retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning('%s %s failed (%s), retrying in %.2fs', request.method, request.url, error, delay)
+            else:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if attempt >= self.retries or not self._should_retry(request.method, response, retry_after):
+                    return response
+                delay = min(self.backoff_max, retry_after) if retry_after is not None else self.backoff(attempt)
+                logger.warning('%s %s returned %s, retrying in %.2fs', request.method, request.url,
+                               response.status_code, delay)
+                # Releasing the connection back to the pool before waiting
+                response.close()
+
+            self.count_retry()
+            attempt += 1
+            time.sleep(delay)
+
+    def pool_metrics(self):
+        """
+        Reports how well connections are reused by each pool of the adapter.
+
+        Returns:
+            list: One dict per host with the number of requests sent, connections opened and requests
+                  that reused an already open connection.
+        """
+        metrics = []
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            metrics.append({
+                'host': f'{pool.scheme}://{pool.host}:{pool.port}',
+                'requests': pool.num_requests,
+                'connections': pool.num_connections,
+                'reused': max(0, pool.num_requests - pool.num_connections),
+            })
+        return metrics
+
+
+class PooledSession(requests.Session):
+    """
+    Process wide requests session shared by every outbound call.
+
+    Third-party clients such as openai periodically close the session they were handed. Closing would drop
+    the connection pools of every other user, so close() is ignored unless force=True is passed.
+    """
+
+    def close(self, force=False):
+        if force:
+            super().close()
+
+
+_session = None
+_adapter = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared connection-pooled session, creating it on first use.
+
+    The pool size, timeouts and retry policy come from the HTTP_* settings.
+    """
+    global _session, _adapter
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                adapter = RetryingHTTPAdapter(
+                    pool_size=_setting('HTTP_POOL_SIZE', 10),
+                    timeout=get_timeout(),
+                    retries=_setting('HTTP_MAX_RETRIES', 3),
+                    backoff_factor=_setting('HTTP_BACKOFF_FACTOR', 0.5),
+                    backoff_max=_setting('HTTP_BACKOFF_MAX', 30.0),
+                )
+                session = PooledSession()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _adapter, _session = adapter, session
+    return _session
+
+
+def reset_session():
+    """
+    Closes the shared session so the next call to get_session() builds a new one from the current settings.
+    """
+    global _session, _adapter
+    with _session_lock:
+        if _session is not None:
+            _session.close(force=True)
+        _session = _adapter = None
+
+
+def pool_metrics():
+    """
+    Returns the connection reuse metrics of the shared session along with the total number of retries.
+    """
+    get_session()
+    return {'pools': _adapter.pool_metrics(), 'retries': _adapter.retry_count}
+
+
+# aiohttp sessions are bound to the event loop they were created in, so there is one per running loop
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_async_session():
+    """
+    Returns the aiohttp session of the running event loop, creating it on first use.
+
+    An ASGI server runs a single event loop, so all async outbound calls of a worker share one connection pool
+    of up to settings.HTTP_ASYNC_POOL_SIZE connections, with the timeouts of get_timeout().
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connect_timeout, read_timeout = get_timeout()
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=_setting('HTTP_ASYNC_POOL_SIZE', 100)),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout))
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_session():
+    """
+    Closes the aiohttp session of the running event loop, if any.
+    """
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def arequest(method, url, **kwargs):
+    """
+    Sends a request through the session of the running event loop, with the retry policy of the shared session.
+
+    Failures are retried like RetryingHTTPAdapter does, waiting with asyncio.sleep so that the event loop keeps
+    serving other requests meanwhile. Retries are counted in pool_metrics().
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL.
+        **kwargs: Passed to aiohttp.ClientSession.request.
+
+    Returns:
+        aiohttp.ClientResponse: The response, whose body is not read yet. The caller must release it, e.g. with
+                                'async with response'.
+    """
+    # The synchronous adapter holds the retry settings and counters
+    get_session()
+    adapter = _adapter
+    attempt = 0
+    while True:
+        try:
+            response = await get_async_session().request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+            # Only errors raised while connecting guarantee that the server never received the request
+            retryable = (method in RETRY_ANY_FAILURE_METHODS
+                         or isinstance(error, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)))
+            if not retryable or attempt >= adapter.retries:
+                raise
+            delay = adapter.backoff(attempt)
+            logger.warning('%s %s failed (%s), retrying in %.2fs', method, url, error, delay)
+        else:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if attempt >= adapter.retries or not should_retry_status(method, response.status, retry_after):
+                return response
+            delay = min(adapter.backoff_max, retry_after) if retry_after is not None else adapter.backoff(attempt)
+            logger.warning('%s %s returned %s, retrying in %.2fs', method, url, response.status, delay)
+            # Releasing the connection back to the pool before waiting
+            response.release()
+
+        adapter.count_retry()
+        attempt += 1
+        await asyncio.sleep(delay)
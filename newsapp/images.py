@@ -0,0 +1,206 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from . import http_client
+
+# Encoders per rendition format, in the order browsers should prefer them
+FORMATS = {
+    'avif': {'pil_format': 'AVIF', 'extension': 'avif', 'mime': 'image/avif', 'options': {'quality': 55}},
+    'webp': {'pil_format': 'WEBP', 'extension': 'webp', 'mime': 'image/webp', 'options': {'quality': 80}},
+    'jpeg': {'pil_format': 'JPEG', 'extension': 'jpg', 'mime': 'image/jpeg',
+             'options': {'quality': 85, 'optimize': True, 'progressive': True}},
+}
+
+# Default renditions: (width, height, mode). 'crop' fills the exact size, 'fit' keeps the aspect ratio.
+DEFAULT_RENDITIONS = {
+    'card': (500, 300, 'crop'),
+    'detail': (1024, 1024, 'fit'),
+}
+
+
+class ImageTooLarge(ValueError):
+    """
+    Raised when a downloaded image exceeds settings.IMAGE_MAX_BYTES.
+    """
+
+
+def supported_formats():
+    """
+    Returns the rendition formats the installed Pillow can encode, in order of preference.
+    """
+    return [name for name in FORMATS if name == 'jpeg' or features.check(name)]
+
+
+def fetch_image(url, max_bytes=None):
+    """
+    Streams an image download into memory, refusing anything larger than max_bytes.
+
+    Args:
+        url (str): The URL of the image.
+        max_bytes (int): Maximum accepted size. Defaults to settings.IMAGE_MAX_BYTES.
+
+    Returns:
+        bytes: The raw image file.
+    """
+    max_bytes = max_bytes or getattr(settings, 'IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+    with http_client.get_session().get(url, stream=True) as response:
+        response.raise_for_status()
+        # Rejecting oversized images up front when the server announces their size
+        if int(response.headers.get('Content-Length') or 0) > max_bytes:
+            raise ImageTooLarge(f'Image at {url} is larger than {max_bytes} bytes')
+
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer.extend(chunk)
+            if len(buffer) > max_bytes:
+                raise ImageTooLarge(f'Image at {url} is larger than {max_bytes} bytes')
+        return bytes(buffer)
+
+
+async def afetch_image(url, max_bytes=None):
+    """
+    Asynchronous fetch_image, streaming the download through the aiohttp session of the running event loop.
+
+    Args:
+        url (str): The URL of the image.
+        max_bytes (int): Maximum accepted size. Defaults to settings.IMAGE_MAX_BYTES.
+
+    Returns:
+        bytes: The raw image file.
+    """
+    max_bytes = max_bytes or getattr(settings, 'IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+    async with await http_client.arequest('GET', url) as response:
+        response.raise_for_status()
+        if (response.content_length or 0) > max_bytes:
+            raise ImageTooLarge(f'Image at {url} is larger than {max_bytes} bytes')
+
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            buffer.extend(chunk)
+            if len(buffer) > max_bytes:
+                raise ImageTooLarge(f'Image at {url} is larger than {max_bytes} bytes')
+        return bytes(buffer)
+
+
+def render_renditions(data, renditions=None, formats=None):
+    """
+    Decodes an image once and encodes every rendition from it.
+
+    Args:
+        data (bytes): The raw image file.
+        renditions (dict): Rendition specs keyed by name, see DEFAULT_RENDITIONS. Defaults to
+                           settings.IMAGE_RENDITIONS.
+        formats (list): Formats to encode each rendition in. Defaults to every supported format.
+
+    Returns:
+        dict: Mapping of rendition name to a mapping of format to encoded bytes.
+    """
+    renditions = renditions or getattr(settings, 'IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+    formats = formats or supported_formats()
+
+    image = Image.open(BytesIO(data))
+    # Letting the JPEG decoder downscale while decoding when the source is much larger than needed
+    largest = max((width, height) for width, height, _ in renditions.values())
+    image.draft('RGB', largest)
+    image = ImageOps.exif_transpose(image).convert('RGB')
+
+    encoded = {}
+    for name, (width, height, mode) in renditions.items():
+        if mode == 'crop':
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+
+        encoded[name] = {}
+        for format_name in formats:
+            spec = FORMATS[format_name]
+            output = BytesIO()
+            resized.save(output, format=spec['pil_format'], **spec['options'])
+            encoded[name][format_name] = output.getvalue()
+    return encoded
+
+
+def store_content_addressed(data, extension):
+    """
+    Writes a file to the default storage under a name derived from its content.
+
+    Identical files map to the same name and are written once. Concurrent writers of the same content are safe:
+    whichever loses the race removes its copy and uses the existing file.
+
+    Args:
+        data (bytes): The file content.
+        extension (str): The file extension, without the dot.
+
+    Returns:
+        str: The stored file name, e.g. 'images/ab/abcdef....jpg'.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'images/{digest[:2]}/{digest}.{extension}'
+    if default_storage.exists(name):
+        return name
+
+    stored_name = default_storage.save(name, ContentFile(data))
+    if stored_name != name:
+        # Another worker wrote the same content in the meantime and the storage picked an alternative name
+        default_storage.delete(stored_name)
+    return name
+
+
+def store_renditions(renditions):
+    """
+    Writes renditions to the default storage, content addressed.
+
+    Args:
+        renditions (dict): Encoded renditions as returned by render_renditions.
+
+    Returns:
+        dict: Mapping of rendition name to a mapping of format to the stored file name.
+    """
+    return {name: {format_name: store_content_addressed(data, FORMATS[format_name]['extension'])
+                   for format_name, data in encoded_formats.items()}
+            for name, encoded_formats in renditions.items()}
+
+
+def rendition_sources(stored, name):
+    """
+    Lists the stored formats of a rendition as <source> entries, in the browser preference order.
+
+    Args:
+        stored (dict): Stored renditions, as kept on Article.image_renditions.
+        name (str): The rendition name.
+
+    Returns:
+        list: Dicts with the 'type' and 'url' of every stored format of the rendition.
+    """
+    formats = stored.get(name, {})
+    return [{'type': FORMATS[format_name]['mime'], 'url': default_storage.url(formats[format_name])}
+            for format_name in FORMATS if format_name in formats]
+
+
+def picture_sources(stored, name, original=None):
+    """
+    Returns what a <picture> element of a rendition needs: the <source> entries of its formats other than JPEG,
+    which every browser supports, and the URL of the JPEG for its <img>.
+
+    Args:
+        stored (dict): Stored renditions, as kept on Article.image_renditions.
+        name (str): The rendition name.
+        original (str): Stored file name of the original image, used instead of the JPEG for articles stored
+                        before renditions existed.
+
+    Returns:
+        dict: The 'sources' list and the 'src' URL, or None when there is no image at all.
+    """
+    sources = rendition_sources(stored or {}, name)
+    fallback = next((source['url'] for source in sources if source['type'] == 'image/jpeg'), None)
+    if fallback is None:
+        if not original:
+            return None
+        fallback = default_storage.url(original)
+    return {'sources': [source for source in sources if source['type'] != 'image/jpeg'], 'src': fallback}
@@ -0,0 +1,347 @@
+import gzip
+import itertools
+import json
+import logging
+import re
+import time
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .dedup import filter_new_items, fingerprint_fields
+from .listing_cache import invalidate_article_listings
+from .models import Article, ArticleFingerprint
+from .utils import build_article, link_sources
+
+logger = logging.getLogger(__name__)
+
+# Number of characters read from the input at a time
+READ_SIZE = 64 * 1024
+# Input formats, 'auto' telling them apart from the file name and its first line
+FORMATS = ('auto', 'json', 'jsonl')
+
+# Start of the article array of a GNews response ({"totalArticles": ..., "articles": [...]})
+ARTICLES_RE = re.compile(r'"articles"\s*:\s*\[')
+WHITESPACE = ' \t\r\n'
+
+CATEGORY_CODES = {code for code, _ in Article.CATEGORIES}
+
+
+def open_input(path):
+    """
+    Opens an input file as text, decompressing it on the fly when it is gzipped.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        file: The text stream.
+    """
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def detect_format(path):
+    """
+    Tells whether a file holds a JSON document or JSON lines.
+
+    Files named *.jsonl or *.ndjson, optionally gzipped, are JSON lines. Otherwise a file is JSON lines when its
+    first line is a complete JSON object, and a JSON document when it starts with an array or spans lines.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        str: 'json' or 'jsonl'.
+    """
+    name = path.lower().removesuffix('.gz')
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+
+    with open_input(path) as stream:
+        # Reading a bounded first line, a compact JSON document may be a single huge line
+        line = stream.readline(READ_SIZE).strip()
+    if not line.startswith('{'):
+        return 'json'
+    try:
+        json.loads(line)
+    except ValueError:
+        return 'json'
+    return 'jsonl'
+
+
+def iter_json_array(stream):
+    """
+    Yields the elements of a JSON array one at a time, holding only one element and one read in memory.
+
+    The array is either the whole document or the 'articles' array of a GNews response.
+
+    Args:
+        stream (file): The text stream.
+
+    Returns:
+        iterator: The decoded elements.
+
+    Raises:
+        ValueError: If the document is not such an array or is malformed.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        # Dropping what was decoded already
+        buffer, position = buffer[position:] + chunk, 0
+
+    def next_char(skipped):
+        # Returns the next character that is not in 'skipped', or '' at the end of the input
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in skipped:
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            read_more()
+
+    first = next_char(WHITESPACE)
+    if first == '{':
+        # Looking for the article array of a GNews response, which follows a few small keys
+        match = ARTICLES_RE.search(buffer, position)
+        while match is None and not eof:
+            read_more()
+            match = ARTICLES_RE.search(buffer, position)
+        if match is None:
+            raise ValueError('The JSON object has no "articles" array')
+        position = match.end()
+    elif first == '[':
+        position += 1
+    else:
+        raise ValueError('Expected a JSON array or a GNews response')
+
+    while True:
+        char = next_char(WHITESPACE + ',')
+        if char == ']':
+            return
+        if not char:
+            raise ValueError('Unexpected end of the JSON array')
+        while True:
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                # The element may continue in the next read
+                if eof:
+                    raise
+                read_more()
+        yield value
+
+
+def iter_json_lines(stream):
+    """
+    Yields the JSON values of a JSON lines stream, expanding GNews responses into their articles.
+
+    Malformed lines are logged and yielded as None, so they are counted as invalid without stopping the import.
+
+    Args:
+        stream (file): The text stream.
+
+    Returns:
+        iterator: The decoded values.
+    """
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as error:
+            logger.warning('Skipping malformed line %s: %s', number, error)
+            yield None
+            continue
+        if isinstance(value, dict) and isinstance(value.get('articles'), list):
+            yield from value['articles']
+        else:
+            yield value
+
+
+def read_items(path, input_format='auto'):
+    """
+    Streams the raw items of a JSON, JSON lines or gzipped dump.
+
+    Args:
+        path (str): Path of the dump.
+        input_format (str): One of FORMATS.
+
+    Returns:
+        iterator: The raw items, None for malformed lines.
+    """
+    if input_format == 'auto':
+        input_format = detect_format(path)
+    with open_input(path) as stream:
+        yield from (iter_json_lines(stream) if input_format == 'jsonl' else iter_json_array(stream))
+
+
+def _truncate(value, field):
+    return (value or '').strip()[:Article._meta.get_field(field).max_length]
+
+
+def map_item(raw, default_category='general'):
+    """
+    Maps a raw GNews item onto the news item format of the ingestion pipeline.
+
+    Text is cut to the length of the Article fields. A missing or unknown category falls back to the default
+    one, as GNews only includes the category when it was added to the dump.
+
+    Args:
+        raw (dict): The GNews item, with 'title', 'description', 'content', 'url', 'publishedAt', 'category'
+                    and a 'source' object holding 'name' and 'url'.
+        default_category (str): Category of the items without a valid one.
+
+    Returns:
+        dict: The news item, or None if the item has no title or content.
+    """
+    if not isinstance(raw, dict):
+        return None
+    title, content = _truncate(raw.get('title'), 'title'), _truncate(raw.get('content'), 'body')
+    if not title or not content:
+        return None
+
+    source = raw.get('source') or {}
+    if isinstance(source, str):
+        source = {'name': source}
+    category = raw.get('category')
+    try:
+        published = parse_datetime(raw['publishedAt']) if isinstance(raw.get('publishedAt'), str) else None
+    except ValueError:
+        # Well formatted but impossible dates are dropped like unparseable ones
+        published = None
+    if published is not None and timezone.is_naive(published):
+        published = timezone.make_aware(published, dt_timezone.utc)
+    return {
+        'title': title,
+        'description': _truncate(raw.get('description'), 'description'),
+        'content': content,
+        'url': raw.get('url') or '',
+        'source': {'name': _truncate(source.get('name'), 'source') or 'Unknown', 'url': source.get('url') or ''},
+        'category': category if category in CATEGORY_CODES else default_category,
+        'publishedAt': published,
+    }
+
+
+class ArticleImporter:
+    """
+    Imports news items in batches, skipping the ones already stored.
+
+    Every batch is deduplicated with dedup.filter_new_items and written in its own transaction with a few bulk
+    queries: the sources it names that are not in the source cache, the articles and their fingerprints. An
+    interrupted import can be run again, the batches committed already are then skipped as duplicates.
+
+    Attributes:
+        batch_size (int): Number of items per batch, see settings.IMPORT_BATCH_SIZE.
+        category (str): Category of the items without a valid one.
+        near_duplicates (bool): Whether to also skip near duplicates, see dedup.filter_new_items.
+        progress (callable): Called with the importer after every batch.
+        read (int): Number of items read.
+        imported (int): Number of articles created.
+        duplicates (int): Number of items skipped as already stored.
+        invalid (int): Number of items skipped as malformed or lacking a title or content.
+        failed (int): Number of items of batches whose transaction failed.
+    """
+
+    def __init__(self, batch_size=None, category='general', near_duplicates=None, progress=None):
+        self.batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 1000)
+        self.category = category
+        self.near_duplicates = near_duplicates
+        self.progress = progress
+        self.read = self.imported = self.duplicates = self.invalid = self.failed = 0
+        self.started = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started else 0.0
+
+    @property
+    def rate(self):
+        """
+        Returns the number of items read per second.
+        """
+        return round(self.read / self.elapsed, 1) if self.elapsed else 0.0
+
+    def run(self, raw_items):
+        """
+        Imports raw GNews items.
+
+        Args:
+            raw_items (iterable): The raw items, e.g. as returned by read_items. Consumed one batch at a time.
+
+        Returns:
+            ArticleImporter: The importer, holding the counters.
+        """
+        self.started = time.perf_counter()
+        raw_items = iter(raw_items)
+        while batch := list(itertools.islice(raw_items, self.batch_size)):
+            self.import_batch(batch)
+            if self.progress:
+                self.progress(self)
+        return self
+
+    def _restore_publication_times(self, items, articles):
+        # One prepared UPDATE run for every row, which costs far less than the CASE expression of bulk_update
+        dated = []
+        for item, article in zip(items, articles):
+            if item['publishedAt']:
+                article.time_published = article.updated_at = item['publishedAt']
+                value = connection.ops.adapt_datetimefield_value(item['publishedAt'])
+                dated.append((value, value, article.pk))
+        if dated:
+            table = connection.ops.quote_name(Article._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(f'UPDATE {table} SET time_published = %s, updated_at = %s WHERE id = %s', dated)
+
+    def import_batch(self, raw_items):
+        """
+        Imports one batch of raw items in a single transaction.
+
+        Args:
+            raw_items (list): The raw items.
+        """
+        self.read += len(raw_items)
+        items = [item for item in (map_item(raw, self.category) for raw in raw_items) if item]
+        self.invalid += len(raw_items) - len(items)
+
+        # Fingerprinting every item once, for the duplicate checks and for storage
+        fingerprints = {id(item): fingerprint_fields(item) for item in items}
+        new_items = filter_new_items(items, near_duplicates=self.near_duplicates,
+                                     fingerprints=[fingerprints[id(item)] for item in items])
+        self.duplicates += len(items) - len(new_items)
+        if not new_items:
+            return
+
+        try:
+            with transaction.atomic():
+                articles = [build_article(item) for item in new_items]
+                link_sources(new_items, articles)
+                Article.objects.bulk_create(articles, batch_size=self.batch_size)
+
+                # time_published has auto_now_add, so the original publication times are written afterwards
+                self._restore_publication_times(new_items, articles)
+
+                ArticleFingerprint.objects.bulk_create(
+                    [ArticleFingerprint(article=article, **fingerprints[id(item)])
+                     for item, article in zip(new_items, articles)],
+                    batch_size=self.batch_size)
+        except DatabaseError:
+            logger.exception('Importing a batch of %s articles failed', len(new_items))
+            self.failed += len(new_items)
+            return
+
+        self.imported += len(articles)
+        # bulk_create sends no post_save signal, so the cached listings are invalidated here
+        invalidate_article_listings()
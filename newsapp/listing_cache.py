@@ -0,0 +1,146 @@
+import threading
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .routers import use_primary
+
+# Cache key of the article content version, replaced whenever an article is created, edited or deleted
+VERSION_KEY = 'newsapp:articles:version'
+
+
+class ListingCache:
+    """
+    Cache of rendered article listings, backed by Django's default cache.
+
+    Listings are keyed by name and by a content version shared by all listings. Replacing the version on every
+    article change invalidates them all at once without tracking individual keys: stale entries are never read
+    again and simply expire. Versions are random tokens rather than a counter, so a version evicted from the cache
+    is replaced by one that was never used and listings cached under an older version can never be served again.
+
+    Attributes:
+        hits (int): Number of listings served from the cache by this process.
+        misses (int): Number of listings that had to be queried and rendered.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'LISTING_CACHE_TIMEOUT', 24 * 3600)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def version(self):
+        """
+        Returns the current article content version, starting a fresh one when the cache holds none.
+        """
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # add() lets concurrent processes agree on one new version, the fresh token covers a cache dropping it
+            token = uuid4().hex
+            cache.add(VERSION_KEY, token, timeout=None)
+            version = cache.get(VERSION_KEY, token)
+        return version
+
+    async def aversion(self):
+        """
+        Asynchronous version, reading and writing the cache without blocking the event loop.
+        """
+        version = await cache.aget(VERSION_KEY)
+        if version is None:
+            token = uuid4().hex
+            await cache.aadd(VERSION_KEY, token, timeout=None)
+            version = await cache.aget(VERSION_KEY, token)
+        return version
+
+    def invalidate(self):
+        """
+        Replaces the content version with a new token, invalidating every cached listing.
+        """
+        cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+
+    def render(self, name, template_name, get_articles):
+        """
+        Returns the rendered markup of a listing, rendering and caching it on a miss.
+
+        Args:
+            name (str): Name of the listing, e.g. the category it shows.
+            template_name (str): Template rendering the listing, receiving the articles as 'articles'.
+            get_articles (callable): Returns the articles to list. Only called on a miss.
+
+        Returns:
+            SafeString: The rendered listing.
+        """
+        key = f'newsapp:listing:{name}:v{self.version()}'
+        markup = cache.get(key)
+        if markup is None:
+            self._count('misses')
+            # Cached markup is served to every client, so it is rendered from the primary rather than a replica
+            # that may lag behind the write which invalidated the listing
+            with use_primary():
+                articles = list(get_articles())
+            markup = str(render_to_string(template_name, {'articles': articles}))
+            cache.set(key, markup, timeout=self.timeout)
+        else:
+            self._count('hits')
+        return mark_safe(markup)
+
+    async def arender(self, name, template_name, get_articles):
+        """
+        Asynchronous render, reading and writing the cache without blocking the event loop.
+
+        Args:
+            name (str): Name of the listing, e.g. the category it shows.
+            template_name (str): Template rendering the listing, receiving the articles as 'articles'.
+            get_articles (callable): Returns an asynchronous iterable of the articles to list, e.g. a queryset
+                                     or cards.aiter_cards. Only called on a miss.
+
+        Returns:
+            SafeString: The rendered listing.
+        """
+        key = f'newsapp:listing:{name}:v{await self.aversion()}'
+        markup = await cache.aget(key)
+        if markup is None:
+            self._count('misses')
+            with use_primary():
+                articles = [article async for article in get_articles()]
+            # Rendering touches no database once the articles are loaded
+            markup = str(render_to_string(template_name, {'articles': articles}))
+            await cache.aset(key, markup, timeout=self.timeout)
+        else:
+            self._count('hits')
+        return mark_safe(markup)
+
+    def stats(self):
+        """
+        Returns the hit/miss counters of this process.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Cache instance shared by the views and the article signal receivers
+listing_cache = ListingCache()
+
+
+def invalidate_article_listings():
+    """
+    Invalidates every cached article listing.
+
+    Article save and delete signals call it automatically. Code changing articles without sending signals, like
+    bulk_create or queryset update, must call it explicitly.
+    """
+    listing_cache.invalidate()
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Default time to live in seconds per kind of call. OpenAI image URLs expire after an hour, while the images
+# downloaded from them and stored under media ('stored_image', see utils.generate_stored_image) do not.
+DEFAULT_TTLS = {
+    'chat': 30 * 24 * 3600,
+    'image': 3600,
+    'stored_image': 30 * 24 * 3600,
+}
+
+
+def normalize_prompt(prompt):
+    """
+    Normalizes a prompt so that near-identical prompts share a cache entry.
+
+    Case and runs of whitespace are ignored.
+    """
+    return WHITESPACE_RE.sub(' ', prompt or '').strip().lower()
+
+
+def make_key(model, prompt, **params):
+    """
+    Builds the cache key of an OpenAI call.
+
+    Args:
+        model (str): The model name.
+        prompt (str): The prompt sent to the model.
+        **params: Any other parameter influencing the response.
+
+    Returns:
+        str: The SHA-256 hex digest of the model, normalized prompt and parameters.
+    """
+    payload = json.dumps({'model': model, 'prompt': normalize_prompt(prompt), 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Database-backed cache of OpenAI responses with per-kind expiry and size-bounded LRU eviction.
+
+    Attributes:
+        hits (int): Number of lookups served from the cache by this process.
+        misses (int): Number of lookups that had to call the API.
+        evictions (int): Number of entries evicted to keep the cache within its size bound.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'LLM_CACHE_ENABLED', True)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10000)
+
+    def ttl(self, kind):
+        ttls = dict(DEFAULT_TTLS, **getattr(settings, 'LLM_CACHE_TTLS', {}))
+        return ttls.get(kind, DEFAULT_TTLS['chat'])
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, kind, key):
+        """
+        Returns the cached response for the key, or None when it is missing or expired.
+        """
+        now = timezone.now()
+        entry = LLMCacheEntry.objects.filter(key=key).values('id', 'response', 'created_at').first()
+        if entry is None or entry['created_at'] < now - timedelta(seconds=self.ttl(kind)):
+            if entry is not None:
+                LLMCacheEntry.objects.filter(id=entry['id']).delete()
+            self._count('misses')
+            return None
+
+        LLMCacheEntry.objects.filter(id=entry['id']).update(last_used_at=now, hits=F('hits') + 1)
+        self._count('hits')
+        return entry['response']
+
+    def set(self, kind, key, response):
+        """
+        Stores a response and evicts the least recently used entries beyond LLM_CACHE_MAX_ENTRIES.
+        """
+        now = timezone.now()
+        try:
+            LLMCacheEntry.objects.update_or_create(
+                key=key, defaults={'kind': kind, 'response': response, 'created_at': now, 'last_used_at': now})
+        except IntegrityError:
+            # Another worker stored the same response concurrently
+            return
+
+        overflow = LLMCacheEntry.objects.count() - self.max_entries
+        if overflow > 0:
+            stale_ids = list(LLMCacheEntry.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow])
+            LLMCacheEntry.objects.filter(id__in=stale_ids).delete()
+            with self._lock:
+                self.evictions += len(stale_ids)
+
+    def get_or_call(self, kind, key, call, use_cache=True):
+        """
+        Returns the cached response for the key, calling the API and caching its response on a miss.
+
+        Args:
+            kind (str): The kind of call, selecting the time to live.
+            key (str): The cache key, see make_key.
+            call (callable): Callable performing the API call and returning the response as a string.
+            use_cache (bool): Whether to use the cache at all. Passing False always calls the API.
+
+        Returns:
+            str: The response.
+        """
+        if not (use_cache and self.enabled):
+            return call()
+
+        # The cache is best effort: a locked or unavailable table must not fail the call itself
+        try:
+            response = self.get(kind, key)
+        except DatabaseError:
+            logger.warning('LLM cache lookup failed, calling the API', exc_info=True)
+            self._count('misses')
+            response = None
+        if response is None:
+            response = call()
+            try:
+                self.set(kind, key, response)
+            except DatabaseError:
+                logger.warning('LLM cache store failed', exc_info=True)
+        return response
+
+    async def aget_or_call(self, kind, key, call, use_cache=True):
+        """
+        Asynchronous get_or_call, for API calls made from an event loop.
+
+        The cache lookup and store run in the thread of the synchronous ORM, while the API call itself is awaited
+        on the event loop.
+
+        Args:
+            kind (str): The kind of call, selecting the time to live.
+            key (str): The cache key, see make_key.
+            call (callable): Coroutine function performing the API call and returning the response as a string.
+            use_cache (bool): Whether to use the cache at all. Passing False always calls the API.
+
+        Returns:
+            str: The response.
+        """
+        if not (use_cache and self.enabled):
+            return await call()
+
+        try:
+            response = await sync_to_async(self.get)(kind, key)
+        except DatabaseError:
+            logger.warning('LLM cache lookup failed, calling the API', exc_info=True)
+            self._count('misses')
+            response = None
+        if response is None:
+            response = await call()
+            try:
+                await sync_to_async(self.set)(kind, key, response)
+            except DatabaseError:
+                logger.warning('LLM cache store failed', exc_info=True)
+        return response
+
+    def clear(self):
+        LLMCacheEntry.objects.all().delete()
+
+    def stats(self):
+        """
+        Returns the hit/miss/eviction counters of this process along with the number of stored entries.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': LLMCacheEntry.objects.count(),
+        }
+
+
+# Cache instance shared by the OpenAI helpers in utils.py
+llm_cache = LLMCache()
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of sorted samples, interpolating between the two nearest ones.
+
+    Args:
+        samples (list): The samples, sorted in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The percentile, 0.0 when there is no sample.
+    """
+    if not samples:
+        return 0.0
+    position = (len(samples) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Summarizes a load test run.
+
+    Args:
+        latencies (list): Latency of every request, in seconds.
+        elapsed (float): Wall clock duration of the run, in seconds.
+        errors (int): Number of failed requests, included in latencies.
+
+    Returns:
+        dict: The number of requests, the throughput in requests per second, the median, p90 and p99 latencies
+              in milliseconds and the number of errors.
+    """
+    samples = sorted(latencies)
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else float('inf'),
+        'p50_ms': round(statistics.median(samples) * 1000, 1) if samples else 0.0,
+        'p90_ms': round(percentile(samples, 0.9) * 1000, 1),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+        'errors': errors,
+    }
+
+
+def run_threaded(call, total, concurrency):
+    """
+    Calls a blocking function 'total' times from 'concurrency' threads, like clients of a threaded WSGI server.
+
+    Args:
+        call (callable): Performs one request, receiving its index. Returns whether it succeeded, any exception
+                         counting as an error.
+        total (int): Number of requests.
+        concurrency (int): Number of requests in flight at any time.
+
+    Returns:
+        dict: The summary of the run, see summarize.
+    """
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def timed(index):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(index)
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - start
+        with lock:
+            latencies.append(latency)
+            errors += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(total)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_async(call, total, concurrency):
+    """
+    Awaits a coroutine function 'total' times with at most 'concurrency' calls in flight on one event loop.
+
+    Args:
+        call (callable): Coroutine function performing one request, receiving its index. Returns whether it
+                         succeeded, any exception counting as an error.
+        total (int): Number of requests.
+        concurrency (int): Number of requests in flight at any time.
+
+    Returns:
+        dict: The summary of the run, see summarize.
+    """
+    latencies, errors = [], 0
+    indexes = iter(range(total))
+
+    async def worker():
+        # Each worker takes the next request as soon as its previous one is answered
+        nonlocal errors
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                ok = await call(index)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_http_load(urls, total, concurrency, headers=None, timeout=30):
+    """
+    Sends GET requests to a running server, cycling through the URLs, and summarizes the responses.
+
+    Responses with a status of 400 or above count as errors. The connection pool is sized to the concurrency,
+    so every in-flight request has its own keep-alive connection.
+
+    Args:
+        urls (list): The absolute URLs to request.
+        total (int): Number of requests.
+        concurrency (int): Number of requests in flight at any time.
+        headers (dict): Headers sent with every request, e.g. a session cookie.
+        timeout (float): Timeout of every request, in seconds.
+
+    Returns:
+        dict: The summary of the run, see summarize.
+    """
+    cycle = itertools.cycle(urls)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async def call(index):
+            async with session.get(next(cycle), allow_redirects=False) as response:
+                await response.read()
+                return response.status < 400
+
+        return await run_async(call, total, concurrency)
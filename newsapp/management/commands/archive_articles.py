@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from newsapp.archive import ArticleArchiver, archive_cutoff
+
+
+class Command(BaseCommand):
+    """
+    Management command moving the old articles out of the article table into the archive, see newsapp.archive.
+
+    Articles published more than --days days ago (settings.ARCHIVE_AFTER_DAYS by default) are archived oldest
+    first, --batch-size articles per transaction, so the command can run while the site serves requests and can
+    be interrupted and run again. On SQLite, --vacuum then compacts the database file, which otherwise keeps the
+    freed pages for the articles to come.
+
+    Example Usage:
+        python manage.py archive_articles
+        python manage.py archive_articles --days 90 --batch-size 5000 --vacuum
+        python manage.py archive_articles --days 90 --dry-run
+    """
+    help = 'Moves the articles older than ARCHIVE_AFTER_DAYS days into the archive, with compressed bodies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Age in days of the oldest articles kept, settings.ARCHIVE_AFTER_DAYS by default.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Number of articles per transaction, settings.ARCHIVE_BATCH_SIZE by default.')
+        parser.add_argument('--dry-run', action='store_true', help='Only counts the articles to archive.')
+        parser.add_argument('--vacuum', action='store_true', help='Compacts the SQLite database file afterwards.')
+
+    def report(self, archiver):
+        self.stderr.write(f'{archiver.archived} archived ({archiver.rate} rows/s, bodies compressed to '
+                          f'{archiver.ratio:.0%})')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        archiver = ArticleArchiver(cutoff=archive_cutoff(options['days']), batch_size=options['batch_size'],
+                                   progress=self.report)
+        if options['dry_run']:
+            self.stdout.write(f'{archiver.pending()} articles published before {archiver.cutoff:%Y-%m-%d %H:%M} '
+                              f'would be archived.')
+            return
+
+        archiver.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archiver.archived} articles in {archiver.elapsed:.1f}s ({archiver.rate} rows/s), '
+            f'{archiver.body_bytes} body bytes compressed to {archiver.compressed_bytes} with {archiver.compression}.'))
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from newsapp.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """
+    Management command running one of the benchmarks registered in newsapp.benchmarks.
+
+    Example Usage:
+        python manage.py benchmark startup --repeat 10
+        python manage.py benchmark bulk_insert --rows 1000
+        python manage.py benchmark category_listing --rows 1000000
+        python manage.py benchmark search --rows 1000000
+        python manage.py benchmark bulk_api --rows 1000
+        python manage.py benchmark export --rows 100000
+        python manage.py benchmark import --rows 5000
+        python manage.py benchmark source_listing --rows 1000000
+        python manage.py benchmark asgi --rows 10000
+        python manage.py benchmark sqlite_concurrency --rows 100000
+        python manage.py benchmark stats --rows 1000000
+        python manage.py benchmark archive --rows 200000
+        python manage.py benchmark cards --rows 20000
+    """
+    help = 'Runs a performance benchmark and prints its results as a table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help='Name of the benchmark to run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of repetitions per measurement.')
+        parser.add_argument('--rows', type=int, default=None, help='Number of synthetic rows to work with.')
+
+    def handle(self, *args, **options):
+        benchmark = BENCHMARKS[options.pop('name')]
+        options['progress'] = self.stderr.write
+        rows = benchmark(**{key: value for key, value in options.items() if value is not None})
+        if not rows:
+            return
+
+        # Printing the rows as a left aligned table
+        columns = list(rows[0])
+        widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+        self.stdout.write('  '.join(column.ljust(widths[column]) for column in columns))
+        for row in rows:
+            self.stdout.write('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from newsapp import images
+from newsapp.listing_cache import invalidate_article_listings
+from newsapp.models import Article
+
+
+class Command(BaseCommand):
+    """
+    Management command encoding the image renditions of articles stored before renditions existed.
+
+    Example Usage:
+        python manage.py build_renditions
+        python manage.py build_renditions --all
+    """
+    help = 'Encodes card and detail image renditions for existing articles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild the renditions of every article, not only the missing ones.')
+
+    def handle(self, *args, **options):
+        articles = (Article.objects.exclude(image='').exclude(image__isnull=True)
+                    .only('id', 'image', 'image_renditions'))
+        built = 0
+        for article in articles.iterator(chunk_size=100):
+            if article.image_renditions and not options['all']:
+                continue
+
+            # Decoding the stored original once and encoding every rendition except the main image itself
+            with article.image.open('rb') as image_file:
+                renditions = images.render_renditions(image_file.read())
+            renditions['detail'].pop('jpeg', None)
+            stored = images.store_renditions(renditions)
+            stored['detail']['jpeg'] = article.image.name
+            # update() leaves auto_now alone, and the new renditions change the article pages and their ETags
+            Article.objects.filter(pk=article.pk).update(image_renditions=stored, updated_at=timezone.now())
+            built += 1
+
+        if built:
+            # update() sends no signals, so the cached listings are invalidated here
+            invalidate_article_listings()
+        self.stdout.write(self.style.SUCCESS(f'Built renditions for {built} articles.'))
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newsapp.export import FORMATS, export_articles
+from newsapp.models import Article
+
+
+class Command(BaseCommand):
+    """
+    Management command writing every article, archived ones included, to a file or to the standard output, as
+    NDJSON or CSV.
+
+    Rows are streamed from the database in chunks, so memory use stays constant whatever the size of the archive.
+
+    Example Usage:
+        python manage.py export_articles --output articles.ndjson
+        python manage.py export_articles --format csv --gzip --output articles.csv.gz
+        python manage.py export_articles --category health > health.ndjson
+    """
+    help = 'Exports the articles as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson', help='Output format.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--category', choices=[code for code, _ in Article.CATEGORIES],
+                            help='Export only the articles of this category.')
+        parser.add_argument('--output', help='File to write to, the standard output if omitted.')
+
+    def handle(self, *args, **options):
+        chunks = export_articles(options['format'], compress=options['gzip'], category=options['category'])
+        if not options['output']:
+            if options['gzip'] and sys.stdout.isatty():
+                raise CommandError('Refusing to write gzip data to a terminal, use --output or a redirection.')
+            # Writing bytes straight to the standard output rather than through self.stdout, which expects text
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {size} bytes to {options["output"]}.'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from newsapp.importer import FORMATS, ArticleImporter, read_items
+from newsapp.models import Article
+
+
+class Command(BaseCommand):
+    """
+    Management command importing articles from a GNews dump, without any OpenAI call.
+
+    The dump is a JSON array of GNews articles, a GNews response, or JSON lines holding either, optionally
+    gzipped. It is streamed, so memory use does not grow with its size, and written in batches of --batch-size
+    articles, each in its own transaction. Articles already stored are skipped, so an interrupted import can
+    simply be run again.
+
+    Example Usage:
+        python manage.py import_articles dump.jsonl.gz
+        python manage.py import_articles headlines.json --category health --batch-size 5000
+    """
+    help = 'Imports articles from a GNews JSON or JSON lines dump, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the dump.')
+        parser.add_argument('--format', choices=FORMATS, default='auto', help='Format of the dump.')
+        parser.add_argument('--category', default='general', choices=[code for code, _ in Article.CATEGORIES],
+                            help='Category of the articles without one.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Number of articles per transaction, settings.IMPORT_BATCH_SIZE by default.')
+        parser.add_argument('--near-duplicates', action='store_true',
+                            help='Also skip articles nearly identical to stored ones.')
+
+    def report(self, importer):
+        self.stderr.write(f'{importer.read} read, {importer.imported} imported, {importer.duplicates} duplicates, '
+                          f'{importer.invalid} invalid, {importer.failed} failed ({importer.rate} rows/s)')
+
+    def handle(self, *args, **options):
+        importer = ArticleImporter(batch_size=options['batch_size'], category=options['category'],
+                                   near_duplicates=options['near_duplicates'] or None, progress=self.report)
+        try:
+            importer.run(read_items(options['path'], options['format']))
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Import stopped after {importer.read} items: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} articles in {importer.elapsed:.1f}s ({importer.rate} rows/s), '
+            f'skipped {importer.duplicates} duplicates and {importer.invalid} invalid items.'))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from newsapp import http_client
+from newsapp.llm_cache import llm_cache
+from newsapp.models import Article
+from newsapp.scheduler import PeriodicScheduler
+from newsapp.utils import generate_articles
+
+
+class Command(BaseCommand):
+    """
+    Management command fetching news items and generating articles from them.
+
+    Without --every the command runs a single ingestion and exits, which makes it suitable for cron.
+    With --every it keeps running and ingests on a fixed interval using the in-process scheduler.
+
+    Example Usage:
+        python manage.py ingest --amount 10 --category health
+        python manage.py ingest --every 3600
+    """
+    help = 'Fetches news items and generates articles, once or periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--amount', type=int, default=2, help='Number of articles to generate per run.')
+        parser.add_argument('--category', default='business', choices=[key for key, _ in Article.CATEGORIES],
+                            help='News category to fetch.')
+        parser.add_argument('--every', type=float, default=None, metavar='SECONDS',
+                            help='Keep running and ingest every SECONDS seconds.')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Bypass the OpenAI response cache and always call the API.')
+        parser.add_argument('--max-runs', type=int, default=None,
+                            help='Stop after this many scheduled runs (only used with --every).')
+
+    def ingest(self, amount, category, use_cache=True):
+        # Running a single ingestion and reporting the outcome of every news item
+        results = generate_articles(amount=amount, category=category, use_cache=use_cache)
+        for result in results:
+            if result.ok:
+                self.stdout.write(self.style.SUCCESS(f'Created article "{result.article.title}"'))
+            else:
+                self.stderr.write(f'Failed to ingest "{result.item.get("title")}" '
+                                  f'at stage {result.stage}: {result.error}')
+        succeeded = sum(result.ok for result in results)
+        self.stdout.write(f'Ingested {succeeded}/{len(results)} articles.')
+
+        # Reporting how many requests reused an open connection of the shared pool
+        metrics = http_client.pool_metrics()
+        for pool in metrics['pools']:
+            self.stdout.write(f'{pool["host"]}: {pool["requests"]} requests over {pool["connections"]} '
+                              f'connections ({pool["reused"]} reused)')
+        self.stdout.write(f'Retries: {metrics["retries"]}')
+
+        cache_stats = llm_cache.stats()
+        self.stdout.write(f'OpenAI cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses, '
+                          f'{cache_stats["entries"]} entries')
+
+    def handle(self, *args, **options):
+        amount, category, use_cache = options['amount'], options['category'], not options['no_cache']
+        if options['every'] is None:
+            self.ingest(amount, category, use_cache)
+            return
+
+        scheduler = PeriodicScheduler(lambda: self.ingest(amount, category, use_cache), interval=options['every'])
+        self.stdout.write(f'Ingesting {amount} {category} articles every {options["every"]} seconds.')
+        try:
+            scheduler.run_forever(max_runs=options['max_runs'])
+        except KeyboardInterrupt:
+            scheduler.stop()
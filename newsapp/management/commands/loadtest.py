@@ -0,0 +1,56 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newsapp.loadtest import run_http_load
+
+
+class Command(BaseCommand):
+    """
+    Management command load testing running deployments and comparing their throughput and latency.
+
+    Every server is given as 'label=base URL' and receives the same paths, so a WSGI deployment of the
+    synchronous views can be compared with an ASGI deployment of their async variants, which live under /async/:
+
+        gunicorn news.wsgi:application --workers 4 --threads 8 --bind 127.0.0.1:8000
+        uvicorn news.asgi:application --workers 4 --port 8001
+
+    Pages behind a login need the session cookie of a logged in user.
+
+    Example Usage:
+        python manage.py loadtest /api/v1/article --server wsgi=http://127.0.0.1:8000 \\
+            --server asgi=http://127.0.0.1:8001/async --requests 5000 --concurrency 100
+        python manage.py loadtest /news/general /news/health --server asgi=http://127.0.0.1:8001/async \\
+            --cookie sessionid=...
+    """
+    help = 'Sends concurrent GET requests to running servers and prints req/s and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Paths requested in turn, appended to every base URL.')
+        parser.add_argument('--server', action='append', required=True, metavar='LABEL=URL',
+                            help='Label and base URL of a deployment, may be repeated.')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of requests per server.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of requests in flight.')
+        parser.add_argument('--cookie', default=None, help='Cookie header sent with every request.')
+
+    def handle(self, *args, **options):
+        servers = []
+        for server in options['server']:
+            label, separator, base_url = server.partition('=')
+            if not separator or not base_url.startswith(('http://', 'https://')):
+                raise CommandError(f'Expected LABEL=URL, got {server!r}')
+            servers.append((label, base_url.rstrip('/')))
+        headers = {'Cookie': options['cookie']} if options['cookie'] else None
+
+        rows = []
+        for label, base_url in servers:
+            urls = [base_url + '/' + path.lstrip('/') for path in options['paths']]
+            summary = asyncio.run(run_http_load(urls, options['requests'], options['concurrency'], headers=headers))
+            rows.append({'server': label, **summary})
+
+        # Printing the rows as a left aligned table
+        columns = list(rows[0])
+        widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+        self.stdout.write('  '.join(column.ljust(widths[column]) for column in columns))
+        for row in rows:
+            self.stdout.write('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
@@ -0,0 +1,53 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from newsapp.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    """
+    Management command copying a SQLite primary database into its SQLite read replicas, see DB_REPLICAS.
+
+    This stands in for the replication of a real database server, so read routing can be tried locally with
+    plain files. Each copy uses SQLite's online backup, which takes a consistent snapshot of the primary while it
+    keeps serving writes, and updates the replica in place so its open connections see the new content. With
+    --interval, replicas are refreshed periodically and lag behind the primary by up to that many seconds, like
+    real replicas do.
+
+    Example Usage:
+        DB_REPLICAS=replica.sqlite3 python manage.py sync_replicas
+        DB_REPLICAS=replica.sqlite3 python manage.py sync_replicas --interval 2
+    """
+    help = 'Copies the SQLite primary database into the SQLite read replicas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keeps copying every INTERVAL seconds instead of copying once.')
+
+    def sync(self, primary, replicas):
+        started = time.perf_counter()
+        with closing(sqlite3.connect(primary)) as source:
+            for name in replicas.values():
+                with closing(sqlite3.connect(name)) as target:
+                    source.backup(target)
+        self.stdout.write(f'Copied the primary into {", ".join(replicas)} in {time.perf_counter() - started:.2f}s')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replicas = {alias: connections[alias].settings_dict for alias in replica_aliases()}
+        if not replicas:
+            raise CommandError('No replica configured, set DB_REPLICAS to the paths of the replica files.')
+        if any(settings_dict['ENGINE'] != primary['ENGINE'] or connections[alias].vendor != 'sqlite'
+               for alias, settings_dict in replicas.items()):
+            raise CommandError('Only SQLite replicas of a SQLite primary can be copied, other databases replicate '
+                               'themselves.')
+
+        names = {alias: str(settings_dict['NAME']) for alias, settings_dict in replicas.items()}
+        self.sync(str(primary['NAME']), names)
+        while options['interval']:
+            time.sleep(options['interval'])
+            self.sync(str(primary['NAME']), names)
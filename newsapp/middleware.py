@@ -0,0 +1,125 @@
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import routers
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, responses are then compressed with gzip only
+    brotli = None
+
+BROTLI_RE = re.compile(r'\bbr\b')
+# Content types which are compressed already and gain nothing from another pass
+COMPRESSED_TYPES = ('application/gzip', 'application/zip')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses with Brotli when the client accepts it and the brotli package is installed, and with
+    gzip otherwise.
+
+    Brotli makes HTML and JSON responses noticeably smaller than gzip at a similar cost. The rules deciding what
+    gets compressed are the ones of Django's GZipMiddleware: streaming responses are compressed chunk by chunk,
+    responses under 200 bytes or already encoded are left alone, and strong ETags are weakened since the body no
+    longer matches them byte for byte. Files of a compressed type, like gzip exports, are left alone as well.
+
+    Attributes:
+        quality (int): Brotli quality level, from 0 to 11. 5 trades a little size for much faster compression than
+                       the default 11, which suits responses compressed on every request.
+    """
+    quality = 5
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith(COMPRESSED_TYPES):
+            return response
+        if (brotli is None or not BROTLI_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+                or getattr(response, 'is_async', False)):
+            # Asynchronous streaming responses are left to the gzip implementation as well
+            return super().process_response(request, response)
+
+        # Same exclusions as GZipMiddleware
+        if not response.streaming and len(response.content) < 200:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            response.streaming_content = self.compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=self.quality)
+            # Keeping the original body when compression would not make it smaller
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+    def compress_sequence(self, sequence):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in sequence:
+            data = compressor.process(chunk)
+            # Flushing after each chunk so that streamed data reaches the client without delay
+            data += compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes the reads of each request for newsapp.routers.PrimaryReplicaRouter, for read-your-writes consistency.
+
+    Requests that may write (any method but GET, HEAD and OPTIONS) read from the primary. So do the requests of a
+    client that wrote an article or a source less than settings.REPLICA_PIN_SECONDS ago, which a short-lived
+    cookie tells apart, so the page a form redirects to shows the change even while the replicas lag behind.
+    Other requests read articles and sources from one replica. Streaming responses, which read after the view
+    returned, read from the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = 'newsapp_primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pinned(self, request):
+        return request.method not in self.safe_methods or self.cookie_name in request.COOKIES
+
+    def _finish(self, routing, response):
+        if routing.wrote:
+            response.set_cookie(self.cookie_name, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                                httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing, token = routers.start_request(pinned=self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self._finish(routing, response)
+
+    async def __acall__(self, request):
+        routing, token = routers.start_request(pinned=self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self._finish(routing, response)
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fingerprint_existing_articles(apps, schema_editor):
+    # Fingerprinting the articles stored before the index existed, in batches
+    from newsapp.dedup import fingerprint_fields
+
+    Article = apps.get_model('newsapp', 'Article')
+    ArticleFingerprint = apps.get_model('newsapp', 'ArticleFingerprint')
+    batch = []
+    for article in Article.objects.only('id', 'title', 'body').iterator(chunk_size=500):
+        fields = fingerprint_fields({'title': article.title, 'content': article.body})
+        batch.append(ArticleFingerprint(article_id=article.id, **fields))
+        if len(batch) >= 500:
+            ArticleFingerprint.objects.bulk_create(batch)
+            batch = []
+    ArticleFingerprint.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0020_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('simhash', models.BigIntegerField()),
+                ('band0', models.IntegerField(db_index=True)),
+                ('band1', models.IntegerField(db_index=True)),
+                ('band2', models.IntegerField(db_index=True)),
+                ('band3', models.IntegerField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('article', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fingerprint', to='newsapp.article')),
+            ],
+        ),
+        migrations.RunPython(fingerprint_existing_articles, migrations.RunPython.noop),
+    ]
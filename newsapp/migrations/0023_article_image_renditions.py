@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0022_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
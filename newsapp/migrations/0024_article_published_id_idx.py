@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0023_article_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-time_published', '-id'], name='article_published_id_idx'),
+        ),
+    ]
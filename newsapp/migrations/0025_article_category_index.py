@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+# Category codes that the default value and the old per-category views used, mapped to Article.CATEGORIES
+LEGACY_CATEGORIES = {'gen': 'general', 'hel': 'health', 'eco': 'business'}
+
+
+def rename_legacy_categories(apps, schema_editor):
+    Article = apps.get_model('newsapp', 'Article')
+    for legacy, category in LEGACY_CATEGORIES.items():
+        Article.objects.filter(category=legacy).update(category=category)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0024_article_published_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='category',
+            field=models.CharField(choices=[('general', 'General'), ('world', 'World'), ('nation', 'Nation'), ('business', 'Business'), ('technology', 'Technology'), ('entertainment', 'Entertainment'), ('sports', 'Sports'), ('science', 'Science'), ('health', 'Health')], default='general', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['category', '-time_published'], name='article_category_published_idx'),
+        ),
+        migrations.RunPython(rename_legacy_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# External content FTS5 table over the searchable columns of newsapp_article, with the triggers keeping it in sync.
+# Triggers rather than model signals also cover bulk_create, queryset updates and deletes. Category and source are
+# indexed too, so that filtering on them narrows the match inside the index instead of after it.
+SQLITE_CREATE = [
+    """CREATE VIRTUAL TABLE newsapp_article_fts USING fts5(
+           title, description, body, category, source,
+           content='newsapp_article', content_rowid='id', tokenize='porter unicode61')""",
+    # Ranking with bm25, weighting title matches above description and body matches, see search.COLUMN_WEIGHTS
+    "INSERT INTO newsapp_article_fts(newsapp_article_fts, rank) VALUES('rank', 'bm25(10.0, 5.0, 1.0, 0.0, 0.0)')",
+    """CREATE TRIGGER newsapp_article_fts_insert AFTER INSERT ON newsapp_article BEGIN
+           INSERT INTO newsapp_article_fts(rowid, title, description, body, category, source)
+           VALUES (new.id, new.title, new.description, new.body, new.category, new.source);
+       END""",
+    """CREATE TRIGGER newsapp_article_fts_delete AFTER DELETE ON newsapp_article BEGIN
+           INSERT INTO newsapp_article_fts(newsapp_article_fts, rowid, title, description, body, category, source)
+           VALUES ('delete', old.id, old.title, old.description, old.body, old.category, old.source);
+       END""",
+    """CREATE TRIGGER newsapp_article_fts_update AFTER UPDATE OF title, description, body, category, source ON newsapp_article BEGIN
+           INSERT INTO newsapp_article_fts(newsapp_article_fts, rowid, title, description, body, category, source)
+           VALUES ('delete', old.id, old.title, old.description, old.body, old.category, old.source);
+           INSERT INTO newsapp_article_fts(rowid, title, description, body, category, source)
+           VALUES (new.id, new.title, new.description, new.body, new.category, new.source);
+       END""",
+    # Indexing the articles stored before the table existed
+    "INSERT INTO newsapp_article_fts(newsapp_article_fts) VALUES('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS newsapp_article_fts_insert',
+    'DROP TRIGGER IF EXISTS newsapp_article_fts_delete',
+    'DROP TRIGGER IF EXISTS newsapp_article_fts_update',
+    'DROP TABLE IF EXISTS newsapp_article_fts',
+]
+
+
+def _postgresql_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from newsapp.search import search_vector
+
+    return GinIndex(search_vector(), name='article_search_idx')
+
+
+def create_search_index(apps, schema_editor):
+    # Each database gets its own full-text index, others are searched without one
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('newsapp', 'Article'), _postgresql_index())
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('newsapp', 'Article'), _postgresql_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0025_article_category_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:57
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_from_publication_time(apps, schema_editor):
+    # Existing articles were last changed no later than now, their publication time is the best known value
+    Article = apps.get_model('newsapp', 'Article')
+    Article.objects.update(updated_at=F('time_published'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0026_article_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(start_from_publication_time, migrations.RunPython.noop),
+    ]
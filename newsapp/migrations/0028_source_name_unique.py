@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_sources(apps, schema_editor):
+    # Keeping the oldest source of every name and moving the articles of the others onto it
+    Article = apps.get_model('newsapp', 'Article')
+    Source = apps.get_model('newsapp', 'Source')
+    duplicates = (Source.objects.values('name').annotate(count=Count('id'), keep=Min('id'))
+                  .filter(count__gt=1).values_list('name', 'keep'))
+    for name, keep in duplicates:
+        others = Source.objects.filter(name=name).exclude(pk=keep)
+        Article.objects.filter(site__in=others).update(site_id=keep)
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0027_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sources, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='source',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['site', '-time_published'], name='article_site_published_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:30
+
+from django.db import migrations, transaction
+
+# Number of article ids covered by each backfill transaction
+BATCH_SIZE = 10000
+
+
+def link_articles_to_sources(apps, schema_editor):
+    # Pointing the articles without a site at the Source named by their source string, one id range at a time so
+    # that no transaction holds the article table for long
+    Article = apps.get_model('newsapp', 'Article')
+    Source = apps.get_model('newsapp', 'Source')
+    unlinked = Article.objects.filter(site__isnull=True).exclude(source='')
+    bounds = unlinked.order_by('id').values_list('id', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return
+
+    source_ids = dict(Source.objects.values_list('name', 'id'))
+    for start in range(first, last + 1, BATCH_SIZE):
+        batch = unlinked.filter(id__gte=start, id__lt=start + BATCH_SIZE)
+        with transaction.atomic():
+            names = set(batch.values_list('source', flat=True).distinct())
+            # Source names are limited to 100 characters
+            new = [Source(name=name, url='') for name in {name[:100] for name in names} if name not in source_ids]
+            Source.objects.bulk_create(new)
+            source_ids.update(Source.objects.filter(name__in=[source.name for source in new])
+                              .values_list('name', 'id'))
+            # updated_at is left alone, linking a source does not change the article
+            for name in names:
+                batch.filter(source=name).update(site_id=source_ids[name[:100]])
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('newsapp', '0028_source_name_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_articles_to_sources, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:54
+
+from django.db import migrations, models
+
+# Triggers keeping newsapp_articlestat in sync with newsapp_article, in the same transaction as the article changes.
+# Like the search index of migration 0026, triggers rather than model signals also cover bulk_create, queryset
+# updates and deletes. Articles are counted per UTC publication day, category and source name.
+_SQLITE_ADD = """
+        INSERT INTO newsapp_articlestat (day, category, source, count)
+        VALUES (date(new.time_published), new.category, new.source, 1)
+        ON CONFLICT (day, category, source) DO UPDATE SET count = count + 1;"""
+_SQLITE_REMOVE = """
+        UPDATE newsapp_articlestat SET count = count - 1
+        WHERE day = date(old.time_published) AND category = old.category AND source = old.source;
+        DELETE FROM newsapp_articlestat
+        WHERE day = date(old.time_published) AND category = old.category AND source = old.source AND count <= 0;"""
+
+SQLITE_CREATE = [
+    f"""CREATE TRIGGER newsapp_article_stats_insert AFTER INSERT ON newsapp_article BEGIN{_SQLITE_ADD}
+        END""",
+    f"""CREATE TRIGGER newsapp_article_stats_delete AFTER DELETE ON newsapp_article BEGIN{_SQLITE_REMOVE}
+        END""",
+    f"""CREATE TRIGGER newsapp_article_stats_update AFTER UPDATE OF category, source, time_published ON newsapp_article
+        WHEN old.category IS NOT new.category OR old.source IS NOT new.source
+             OR date(old.time_published) IS NOT date(new.time_published)
+        BEGIN{_SQLITE_REMOVE}{_SQLITE_ADD}
+        END""",
+    # Counting the articles stored before the table existed
+    """INSERT INTO newsapp_articlestat (day, category, source, count)
+       SELECT date(time_published), category, source, COUNT(*) FROM newsapp_article GROUP BY 1, 2, 3""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS newsapp_article_stats_insert',
+    'DROP TRIGGER IF EXISTS newsapp_article_stats_delete',
+    'DROP TRIGGER IF EXISTS newsapp_article_stats_update',
+]
+
+POSTGRESQL_CREATE = [
+    """CREATE FUNCTION newsapp_article_stats() RETURNS trigger AS $$
+       BEGIN
+           IF TG_OP IN ('UPDATE', 'DELETE') THEN
+               UPDATE newsapp_articlestat SET count = count - 1
+               WHERE day = (OLD.time_published AT TIME ZONE 'UTC')::date
+                     AND category = OLD.category AND source = OLD.source;
+               DELETE FROM newsapp_articlestat
+               WHERE day = (OLD.time_published AT TIME ZONE 'UTC')::date
+                     AND category = OLD.category AND source = OLD.source AND count <= 0;
+           END IF;
+           IF TG_OP IN ('INSERT', 'UPDATE') THEN
+               INSERT INTO newsapp_articlestat (day, category, source, count)
+               VALUES ((NEW.time_published AT TIME ZONE 'UTC')::date, NEW.category, NEW.source, 1)
+               ON CONFLICT (day, category, source) DO UPDATE SET count = newsapp_articlestat.count + 1;
+           END IF;
+           RETURN NULL;
+       END;
+       $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER newsapp_article_stats
+       AFTER INSERT OR DELETE OR UPDATE OF category, source, time_published ON newsapp_article
+       FOR EACH ROW EXECUTE FUNCTION newsapp_article_stats()""",
+    """INSERT INTO newsapp_articlestat (day, category, source, count)
+       SELECT (time_published AT TIME ZONE 'UTC')::date, category, source, COUNT(*) FROM newsapp_article
+       GROUP BY 1, 2, 3""",
+]
+
+POSTGRESQL_DROP = [
+    'DROP TRIGGER IF EXISTS newsapp_article_stats ON newsapp_article',
+    'DROP FUNCTION IF EXISTS newsapp_article_stats()',
+]
+
+
+def create_stats_triggers(apps, schema_editor):
+    # Other databases have no triggers, and newsapp.stats counts their articles on every read instead
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRESQL_CREATE}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_stats_triggers(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0029_article_site_backfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('general', 'General'), ('world', 'World'), ('nation', 'Nation'),
+                                                       ('business', 'Business'), ('technology', 'Technology'),
+                                                       ('entertainment', 'Entertainment'), ('sports', 'Sports'),
+                                                       ('science', 'Science'), ('health', 'Health')],
+                                              max_length=20)),
+                ('source', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='articlestat',
+            constraint=models.UniqueConstraint(fields=('day', 'category', 'source'),
+                                               name='articlestat_day_category_source'),
+        ),
+        migrations.RunPython(create_stats_triggers, drop_stats_triggers),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:17
+
+from django.db import migrations, models
+import django.utils.timezone
+import newsapp.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0030_article_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedArticle',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.CharField(max_length=250)),
+                ('image', models.ImageField(null=True, upload_to='images/')),
+                ('compressed_body', models.BinaryField()),
+                ('compression', models.CharField(max_length=10)),
+                ('source', models.CharField(max_length=100)),
+                ('category', models.CharField(choices=[('general', 'General'), ('world', 'World'), ('nation', 'Nation'),
+                                                       ('business', 'Business'), ('technology', 'Technology'),
+                                                       ('entertainment', 'Entertainment'), ('sports', 'Sports'),
+                                                       ('science', 'Science'), ('health', 'Health')],
+                                              max_length=20)),
+                ('time_published', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('site_id', models.BigIntegerField(null=True)),
+                ('image_renditions', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            bases=(newsapp.models.ArticlePageMixin, models.Model),
+        ),
+    ]
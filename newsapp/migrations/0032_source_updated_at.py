@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0031_archived_article'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,7 +1,11 @@
+from asgiref.sync import sync_to_async
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.urls import reverse
 from django.contrib.auth.models import User, Permission
+from .compression import decompress_body
+from .images import picture_sources
 
 
 class ContactMessage(models.Model):
@@ -26,15 +30,71 @@ class Source(models.Model):
     Model representing a news source.
 
     Attributes:
-        name (CharField): The name of the news source.
+        name (CharField): The unique name of the news source, as given by the news API.
         url (CharField): The URL of the news source's website.
+        updated_at (DateTimeField): The time of the last change to the source, which the article API responses
+                                    nest, see conditional.article_api_etag.
     """
     # Fields definition
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     url = models.CharField(max_length=500)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ArticlePageMixin:
+    """
+    Methods shared by the articles and the archived articles, which are displayed by the same page.
+
+    Methods:
+        get_absolute_url: Returns the URL for the article's detail view.
+        card_image: Returns the <picture> sources of the card sized image.
+        detail_image: Returns the <picture> sources of the detail sized image.
+    """
+
+    def get_absolute_url(self):
+        return reverse('article_view', args=[self.pk])
+
+    @property
+    def card_image(self):
+        return picture_sources(self.image_renditions, 'card', self.image.name)
+
+    @property
+    def detail_image(self):
+        return picture_sources(self.image_renditions, 'detail', self.image.name)
+
+
+class ArticleManager(models.Manager):
+    """
+    Manager of the Article model, which also finds the articles moved to the archive, see newsapp.archive.
+    """
+
+    def get_or_archived(self, pk):
+        """
+        Returns the article with the given primary key, or its ArchivedArticle once it was archived.
+
+        Args:
+            pk (int): The primary key of the article.
+
+        Returns:
+            Article or ArchivedArticle: The article, which the article page displays either way.
 
+        Raises:
+            Article.DoesNotExist: If there is no such article, archived or not.
+        """
+        try:
+            return self.get(pk=pk)
+        except self.model.DoesNotExist:
+            # Only articles missing from the hot table cost a second lookup
+            archived = ArchivedArticle.objects.filter(pk=pk).first()
+            if archived is None:
+                raise
+            return archived
 
-class Article(models.Model):
+    async def aget_or_archived(self, pk):
+        return await sync_to_async(self.get_or_archived)(pk)
+
+
+class Article(ArticlePageMixin, models.Model):
     """
     Model representing an article.
 
@@ -46,10 +106,17 @@ class Article(models.Model):
         source (CharField): The source of the article.
         category (CharField): The category of the article (e.g., General, World, etc.).
         time_published (DateTimeField): The publication time of the article.
-        site (ForeignKey): A foreign key linking to the Source model.
+        updated_at (DateTimeField): The time of the last change to the article, used to answer conditional
+                                    requests. Queryset update() calls must set it explicitly.
+        site (ForeignKey): A foreign key linking to the Source model named by 'source'. Filled in from the
+                           source name when an article is saved without one, see newsapp.sources.
+        image_renditions (JSONField): Stored file names of the resized image renditions, keyed by rendition
+                                      name and format (e.g. {'card': {'webp': 'images/renditions/...'}}).
 
     Methods:
         get_absolute_url: Returns the URL for the article's detail view.
+        card_image: Returns the <picture> sources of the card sized image.
+        detail_image: Returns the <picture> sources of the detail sized image.
     """
     # Fields definition and Meta class with custom permissions
     CATEGORIES = [
@@ -69,17 +136,138 @@ class Article(models.Model):
     image = models.ImageField(upload_to='images/', null=True)
     body = models.CharField(max_length=5000)
     source = models.CharField(max_length=100)
-    category = models.CharField(max_length=20, choices=CATEGORIES, default='gen')
+    category = models.CharField(max_length=20, choices=CATEGORIES, default='general')
     time_published = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     site = models.ForeignKey(to=Source, on_delete=models.CASCADE, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
-    def get_absolute_url(self):
-        return reverse('article_view', args=[self.pk])
+    objects = ArticleManager()
 
     class Meta:
         permissions = [
             ("edit_title", "Can edit article titles"),
         ]
+        indexes = [
+            # Backs the keyset pagination of the article API, newest first
+            models.Index(fields=['-time_published', '-id'], name='article_published_id_idx'),
+            # Turns "latest articles in a category" into an index range scan
+            models.Index(fields=['category', '-time_published'], name='article_category_published_idx'),
+            # Same for the latest articles of one source
+            models.Index(fields=['site', '-time_published'], name='article_site_published_idx'),
+        ]
+
+
+class ArticleStat(models.Model):
+    """
+    Model representing the number of articles published on one day in one category by one source.
+
+    Rows are maintained by database triggers on newsapp_article, in the same transaction as the articles they count,
+    see newsapp.stats. Archiving an article keeps it counted, see newsapp.archive.
+
+    Attributes:
+        day (DateField): The UTC day the articles were published on.
+        category (CharField): The category of the articles.
+        source (CharField): The source name of the articles.
+        count (IntegerField): The number of articles.
+    """
+    # Fields definition and Meta class with the key updated by the triggers
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=Article.CATEGORIES)
+    source = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category', 'source'], name='articlestat_day_category_source'),
+        ]
+
+
+class ArchivedArticle(ArticlePageMixin, models.Model):
+    """
+    Model representing an article moved out of the Article table by the archive_articles command.
+
+    Archived articles keep their primary key, so their page stays at the same URL, see
+    ArticleManager.get_or_archived, and their body is stored compressed. The table lives in
+    settings.ARCHIVE_DATABASE, the default database or a separate one, see newsapp.archive.
+
+    Attributes:
+        id (BigIntegerField): The primary key of the article.
+        title, description, image, source, category, time_published, updated_at, image_renditions: As on Article.
+        site_id (BigIntegerField): The primary key of the article's Source. A plain integer, since the sources may
+                                   live in another database.
+        compressed_body (BinaryField): The body, compressed with the 'compression' method.
+        compression (CharField): 'zlib' or 'zstd', see newsapp.compression.
+        archived_at (DateTimeField): The time the article was archived.
+        archived (bool): Always True, lets the article page leave out the edit and delete buttons.
+        body (str): The decompressed body.
+    """
+    # Fields definition
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    description = models.CharField(max_length=250)
+    image = models.ImageField(upload_to='images/', null=True)
+    compressed_body = models.BinaryField()
+    compression = models.CharField(max_length=10)
+    source = models.CharField(max_length=100)
+    category = models.CharField(max_length=20, choices=Article.CATEGORIES)
+    time_published = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    site_id = models.BigIntegerField(null=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    archived = True
+
+    @cached_property
+    def body(self):
+        return decompress_body(self.compressed_body, self.compression)
+
+
+class ArticleFingerprint(models.Model):
+    """
+    Model representing the fingerprint of an ingested news item, used to skip items that were already stored.
+
+    Attributes:
+        article (OneToOneField): The article created from the item. Kept as null if the article is removed,
+                                 so the story is still recognised.
+        url_hash (CharField): SHA-256 of the normalized item URL, empty when the item had no URL.
+        content_hash (CharField): SHA-256 of the normalized title and body.
+        simhash (BigIntegerField): 64-bit SimHash of the title and body shingles, for near-duplicate detection.
+        band0 - band3 (IntegerField): 16-bit bands of the SimHash, indexed to find near-duplicate candidates.
+        created_at (DateTimeField): The time the item was ingested.
+    """
+    # Fields definition
+    article = models.OneToOneField(to=Article, on_delete=models.SET_NULL, null=True, related_name='fingerprint')
+    url_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    simhash = models.BigIntegerField()
+    band0 = models.IntegerField(db_index=True)
+    band1 = models.IntegerField(db_index=True)
+    band2 = models.IntegerField(db_index=True)
+    band3 = models.IntegerField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class LLMCacheEntry(models.Model):
+    """
+    Model representing a cached response of an OpenAI call.
+
+    Attributes:
+        key (CharField): SHA-256 of the model, the normalized prompt and the call parameters.
+        kind (CharField): The kind of call, e.g. 'chat' or 'image'.
+        response (TextField): The cached response.
+        created_at (DateTimeField): The time the response was stored, used for expiry.
+        last_used_at (DateTimeField): The last time the response was served, used for LRU eviction.
+        hits (PositiveIntegerField): The number of times the response was served from the cache.
+    """
+    # Fields definition
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=20)
+    response = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hits = models.PositiveIntegerField(default=0)
 
 
 class PermissionRequest(models.Model):
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ArticleKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over (time_published, id), newest first.
+
+    Each page is fetched with a range condition on the last row of the previous page instead of an OFFSET,
+    so every page costs the same index range scan however deep the client pages. The id breaks ties between
+    articles published at the same time, which keeps the ordering stable.
+
+    Query parameters:
+        cursor: Opaque position returned as 'next_cursor' by the previous page.
+        page_size: Number of articles per page, capped at settings.API_MAX_PAGE_SIZE.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-time_published', '-id')
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'API_PAGE_SIZE', 20)
+        maximum = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+        try:
+            # Plain Django requests, as received by the async views, have no query_params
+            params = getattr(request, 'query_params', request.GET)
+            page_size = int(params.get(self.page_size_query_param, default))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'A positive integer is required.'})
+        if page_size < 1:
+            raise ValidationError({self.page_size_query_param: 'A positive integer is required.'})
+        return min(page_size, maximum)
+
+    @staticmethod
+    def encode_position(published, pk):
+        position = json.dumps([published.isoformat(), pk])
+        return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+    @classmethod
+    def encode_cursor(cls, article):
+        # Pages of values() rows, like the article cards, hold dicts rather than articles
+        if isinstance(article, dict):
+            return cls.encode_position(article['time_published'], article['id'])
+        return cls.encode_position(article.time_published, article.pk)
+
+    def decode_cursor(self, cursor):
+        try:
+            published, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            published = parse_datetime(published)
+            if published is None:
+                raise ValueError
+            return published, int(pk)
+        except (ValueError, TypeError, binascii.Error, UnicodeError):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            published, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(time_published__lt=published) | Q(time_published=published, pk__lt=pk))
+
+        # Fetching one extra row tells whether another page follows
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next_cursor', self.next_cursor),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
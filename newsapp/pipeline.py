@@ -0,0 +1,117 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    A single step of the ingestion pipeline.
+
+    Attributes:
+        name (str): The name of the stage, used in results and log messages.
+        func (callable): Callable receiving the per-article state dict. It may mutate the state in place.
+        limit (int): Maximum number of articles allowed to run this stage at the same time.
+    """
+
+    def __init__(self, name, func, limit=1):
+        self.name = name
+        self.func = func
+        self.limit = max(1, int(limit))
+        self.semaphore = threading.BoundedSemaphore(self.limit)
+
+    def run(self, state):
+        # Waiting for a free slot so that no more than 'limit' articles hit this stage concurrently
+        with self.semaphore:
+            self.func(state)
+
+
+class IngestionResult:
+    """
+    The outcome of running a single news item through the pipeline.
+
+    Attributes:
+        index (int): Position of the item in the input batch.
+        item (dict): The news item as returned by the news API.
+        state (dict): The state accumulated by the stages (prompt, image URL, article, ...).
+        error (Exception): The exception raised by the failing stage, or None on success.
+        stage (str): The name of the stage that failed, or None on success.
+    """
+
+    def __init__(self, index, item, state, error=None, stage=None):
+        self.index = index
+        self.item = item
+        self.state = state
+        self.error = error
+        self.stage = stage
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def article(self):
+        return self.state.get('article')
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'failed at {self.stage}: {self.error!r}'
+        return f'<IngestionResult #{self.index} {status}>'
+
+
+class IngestionPipeline:
+    """
+    Bounded-thread-pool engine that runs many news items through a sequence of stages at once.
+
+    Every item walks through the stages in order, while each stage has its own concurrency limit.
+    The thread pool is sized to the sum of the stage limits so that all stages can be saturated
+    simultaneously. A failure in one item is recorded on its result and does not abort the batch.
+
+    Attributes:
+        stages (list): The ordered list of Stage instances.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    @property
+    def max_workers(self):
+        return sum(stage.limit for stage in self.stages)
+
+    def _process(self, index, item, context):
+        # Running a single item through every stage, stopping at the first failure
+        state = dict(context, item=item)
+        try:
+            for stage in self.stages:
+                try:
+                    stage.run(state)
+                except Exception as error:
+                    logger.exception('Ingestion of item #%s failed at stage %s', index, stage.name)
+                    return IngestionResult(index, item, state, error=error, stage=stage.name)
+            return IngestionResult(index, item, state)
+        finally:
+            # Worker threads open their own database connections, which must not leak
+            connections.close_all()
+
+    def run(self, items, context=None):
+        """
+        Runs the given items through the pipeline.
+
+        Args:
+            items (iterable): The news items to process.
+            context (dict): Optional values copied into the state of every item, e.g. run-wide options.
+
+        Returns:
+            list: IngestionResult instances, in the same order as the input items.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingest') as executor:
+            futures = [executor.submit(self._process, index, item, context or {})
+                       for index, item in enumerate(items)]
+            # Collecting the results in submission order keeps the output aligned with the input
+            return [future.result() for future in futures]
@@ -0,0 +1,144 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica, as app_label.model_name
+REPLICATED_MODELS = {'newsapp.article', 'newsapp.source', 'newsapp.articlestat'}
+# Model stored in the archive database, see archive_database
+ARCHIVED_MODEL = 'newsapp.archivedarticle'
+
+
+class ReadRouting:
+    """
+    Where the reads of one request go.
+
+    Attributes:
+        replica (str): The replica alias serving the reads, or None to read from the primary.
+        wrote (bool): Whether a replicated model was written, which pins the rest of the request to the primary.
+    """
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+    def pin(self):
+        self.replica = None
+
+
+# Routing of the current request. Code running outside a request, like ingestion and management commands, has
+# none and always reads from the primary.
+_routing = contextvars.ContextVar('newsapp_read_routing', default=None)
+
+
+def replica_aliases():
+    """
+    Returns the database aliases of the read replicas, see settings.DATABASE_REPLICAS.
+    """
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def archive_database():
+    """
+    Returns the alias of the database holding the archived articles, see settings.ARCHIVE_DATABASE.
+    """
+    return getattr(settings, 'ARCHIVE_DATABASE', DEFAULT_DB_ALIAS)
+
+
+def start_request(pinned=False):
+    """
+    Starts routing the reads of a request, to one replica for the whole request unless it is pinned to the primary.
+
+    Sticking to one replica keeps consecutive reads consistent with each other, e.g. the pages of a listing.
+
+    Args:
+        pinned (bool): Whether every read should go to the primary.
+
+    Returns:
+        tuple: The ReadRouting of the request and the token passed to end_request.
+    """
+    replicas = replica_aliases()
+    routing = ReadRouting(None if pinned or not replicas else random.choice(replicas))
+    return routing, _routing.set(routing)
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends the reads of the enclosed block to the primary, e.g. when their results are cached for other requests.
+    """
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def reading_from_replica():
+    """
+    Returns the replica alias the reads of the current request go to, or None when they go to the primary.
+    """
+    routing = _routing.get()
+    return routing.replica if routing else None
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending the reads of articles, sources and article stats to a read replica, and every write to
+    the primary.
+
+    Only requests go to replicas, through newsapp.middleware.ReplicaRoutingMiddleware, which pins to the primary
+    the requests that may write, like POST, and the requests of a client that wrote a few seconds ago. A request
+    is also pinned as soon as it writes an article or a source, and reads inside a transaction of the primary
+    stay on the primary, so a request always reads its own writes. Other models are always read from the primary.
+
+    Replicas are kept in sync by the database itself (e.g. PostgreSQL streaming replication), or for local SQLite
+    files by the sync_replicas command. They are never migrated directly.
+
+    Archived articles are always read from and written to the archive database, which holds nothing else when it
+    is not the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower == ARCHIVED_MODEL:
+            return archive_database()
+        replica = reading_from_replica()
+        if replica is None or model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower == ARCHIVED_MODEL:
+            return archive_database()
+        routing = _routing.get()
+        if routing is not None and model._meta.label_lower in REPLICATED_MODELS:
+            # Reading one's own writes from a lagging replica would show stale data
+            routing.wrote = True
+            routing.pin()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, so objects of any of them may be related
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        archive = archive_database()
+        if archive != DEFAULT_DB_ALIAS and db == archive:
+            # Data migrations run without a model name and stay out of the archive as well
+            return f'{app_label}.{model_name}' == ARCHIVED_MODEL
+        if f'{app_label}.{model_name}' == ARCHIVED_MODEL:
+            return db == archive
+        return None
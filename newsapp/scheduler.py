@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicScheduler:
+    """
+    Lightweight in-process scheduler running a job at a fixed interval.
+
+    The job runs on a fixed-rate schedule: the next run is planned relative to the start of the previous one,
+    so a slow run does not push every later run back. Exceptions raised by the job are logged and do not stop
+    the scheduler.
+
+    Attributes:
+        job (callable): The callable to run. It takes no arguments.
+        interval (float): Number of seconds between two consecutive runs.
+        runs (int): Number of runs performed so far.
+    """
+
+    def __init__(self, job, interval):
+        if interval <= 0:
+            raise ValueError('The scheduler interval must be a positive number of seconds.')
+        self.job = job
+        self.interval = interval
+        self.runs = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def run_forever(self, max_runs=None):
+        """
+        Runs the job in the current thread until stop() is called or max_runs is reached.
+
+        Args:
+            max_runs (int): Optional number of runs after which the scheduler returns.
+        """
+        next_run = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.job()
+            except Exception:
+                logger.exception('Scheduled job %r failed', self.job)
+            self.runs += 1
+            if max_runs is not None and self.runs >= max_runs:
+                break
+
+            # Skipping missed runs instead of firing them back to back after a long job
+            next_run += self.interval
+            now = time.monotonic()
+            if next_run < now:
+                next_run = now
+            self._stop_event.wait(next_run - now)
+
+    def start(self):
+        """
+        Runs the scheduler in a background daemon thread.
+
+        Returns:
+            threading.Thread: The thread running the scheduler.
+        """
+        self._thread = threading.Thread(target=self.run_forever, name='newsapp-scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """
+        Stops the scheduler, waiting for the background thread if there is one.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait for the background thread.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,229 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Article
+
+# Full-text index table kept in sync with newsapp_article by triggers on SQLite, see migration 0026
+FTS_TABLE = 'newsapp_article_fts'
+# Relative weights of the title, description and body columns when ranking matches. The category and source
+# columns of the SQLite index only serve as filters and weigh nothing.
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+# Control characters marking the matched terms in snippets, replaced by <mark> tags once the snippet is escaped
+MATCH_START, MATCH_END = '\x02', '\x03'
+SNIPPET_WORDS = 16
+
+TERM_RE = re.compile(r'\w+')
+
+# Triggers keeping the SQLite index in sync with newsapp_article, as created by migration 0026
+SQLITE_TRIGGERS = {
+    'newsapp_article_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_fts_insert AFTER INSERT ON newsapp_article BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description, body, category, source)
+            VALUES (new.id, new.title, new.description, new.body, new.category, new.source);
+        END""",
+    'newsapp_article_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_fts_delete AFTER DELETE ON newsapp_article BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, body, category, source)
+            VALUES ('delete', old.id, old.title, old.description, old.body, old.category, old.source);
+        END""",
+    'newsapp_article_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_fts_update
+        AFTER UPDATE OF title, description, body, category, source ON newsapp_article BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, body, category, source)
+            VALUES ('delete', old.id, old.title, old.description, old.body, old.category, old.source);
+            INSERT INTO {FTS_TABLE}(rowid, title, description, body, category, source)
+            VALUES (new.id, new.title, new.description, new.body, new.category, new.source);
+        END""",
+}
+
+
+class SearchResults(list):
+    """
+    The articles found by search_articles, best matches first.
+
+    Attributes:
+        truncated (bool): True when the query matched more than settings.SEARCH_MAX_CANDIDATES articles on SQLite,
+                          so only the most recent matches were ranked and older ones are missing from the results.
+    """
+
+    def __init__(self, articles=(), truncated=False):
+        super().__init__(articles)
+        self.truncated = truncated
+
+
+def max_candidates():
+    """
+    Returns the number of most recent matches ranked by a SQLite search, see settings.SEARCH_MAX_CANDIDATES.
+    """
+    return getattr(settings, 'SEARCH_MAX_CANDIDATES', 500)
+
+
+def restore_sqlite_triggers(connection):
+    """
+    Recreates the triggers of the SQLite index when they are missing, and reindexes every article if so.
+
+    SQLite cannot alter most columns in place, so migrations touching newsapp_article copy it to a new table and
+    drop the old one, triggers included. This runs after every migrate to put them back.
+
+    Args:
+        connection: The SQLite database connection.
+
+    Returns:
+        bool: True if triggers had to be recreated.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            # Migration 0026 has not run yet
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'newsapp_article'")
+        missing = set(SQLITE_TRIGGERS) - {name for name, in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            # Articles may have changed while the triggers were missing
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+    return bool(missing)
+
+
+def search_terms(query):
+    """
+    Splits a user query into search terms, dropping punctuation and any search syntax.
+
+    Args:
+        query (str): The query as typed by the user.
+
+    Returns:
+        list: The lowercased terms. Every term must match for an article to be found.
+    """
+    return TERM_RE.findall((query or '').lower())
+
+
+def highlight(snippet):
+    """
+    Escapes a snippet and turns its match markers into <mark> tags, so it can be rendered as HTML.
+    """
+    return escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def search_vector():
+    """
+    Returns the weighted tsvector expression searched on PostgreSQL.
+
+    The GIN index created by migration 0026 is built on this exact expression, which lets PostgreSQL use it.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return (SearchVector('title', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+            + SearchVector('body', weight='C', config='english'))
+
+
+def _filters(category, source):
+    filters = Q()
+    if category:
+        filters &= Q(category=category)
+    if source:
+        filters &= Q(source=source)
+    return filters
+
+
+def _search_sqlite(terms, category, source, limit, offset):
+    # Quoting every term keeps user input from being read as FTS5 syntax. Filters become column phrases, so FTS5
+    # intersects them with the terms inside the index; the source is also compared exactly afterwards.
+    match = ' '.join(f'"{term}"' for term in terms)
+    if category:
+        match += ' category:"{}"'.format(' '.join(search_terms(category)))
+    if source:
+        match += ' source:"{}"'.format(' '.join(search_terms(source)))
+
+    # Ranking has to score every match, which gets slow for common terms on a large corpus. Only the most recent
+    # matches are ranked: FTS5 walks its index in rowid order and stops after max_candidates rows, and the rowid
+    # bound then limits the ranked scan to them. The hidden 'rank' column is configured to bm25 with
+    # COLUMN_WEIGHTS, which FTS5 sorts on efficiently.
+    sql = f'''
+        SELECT a.id, a.title, a.description, a.source, a.category, a.time_published, a.image,
+               a.image_renditions, -f.rank AS rank,
+               snippet({FTS_TABLE}, -1, %s, %s, '…', %s) AS snippet
+        FROM {FTS_TABLE} f JOIN newsapp_article a ON a.id = f.rowid
+        WHERE {FTS_TABLE} MATCH %s {'AND a.source = %s' if source else ''} AND f.rowid >= (
+            SELECT coalesce(min(rowid), 0) FROM (
+                SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s))
+        ORDER BY f.rank
+        LIMIT %s OFFSET %s
+    '''
+    params = [MATCH_START, MATCH_END, SNIPPET_WORDS, match, *([source] if source else []), match,
+              max_candidates(), limit, offset]
+    articles = list(Article.objects.raw(sql, params))
+
+    # Counting at most one match past the window tells whether older matches were left out, which the index
+    # answers without reading any article
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                       [match, max_candidates() + 1])
+        candidates, = cursor.fetchone()
+    return SearchResults(articles, truncated=candidates > max_candidates())
+
+
+def _search_postgresql(terms, category, source, limit, offset):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+    query = SearchQuery(' '.join(terms), search_type='plain', config='english')
+    weights = [weight / COLUMN_WEIGHTS[0] for weight in reversed(COLUMN_WEIGHTS)]
+    articles = (Article.objects.annotate(search=search_vector())
+                .filter(_filters(category, source), search=query)
+                .annotate(rank=SearchRank(search_vector(), query, weights=[0.0] + weights),
+                          snippet=SearchHeadline('body', query, config='english', start_sel=MATCH_START,
+                                                 stop_sel=MATCH_END, max_words=SNIPPET_WORDS,
+                                                 min_words=SNIPPET_WORDS // 2))
+                .defer('body')
+                .order_by('-rank', '-time_published'))
+    return SearchResults(articles[offset:offset + limit])
+
+
+def _search_fallback(terms, category, source, limit, offset):
+    # Unindexed substring search, for databases without a full-text backend here
+    filters = _filters(category, source)
+    for term in terms:
+        filters &= Q(title__icontains=term) | Q(description__icontains=term) | Q(body__icontains=term)
+    articles = list(Article.objects.filter(filters).order_by('-time_published')[offset:offset + limit])
+    for article in articles:
+        article.rank, article.snippet = 0.0, article.description
+    return SearchResults(articles)
+
+
+def search_articles(query, category=None, source=None, limit=20, offset=0):
+    """
+    Searches the title, description and body of the articles, best matches first.
+
+    SQLite uses the FTS5 index and PostgreSQL the GIN index on search_vector(), both created by migration 0026
+    and kept in sync by the database itself, bulk inserts and queryset updates included. Other databases fall
+    back to an unindexed substring search. On SQLite, only the settings.SEARCH_MAX_CANDIDATES most recently
+    added matches are ranked, which bounds the cost of queries for common terms, and the results tell when older
+    matches were left out.
+
+    Args:
+        query (str): The query as typed by the user. Every term must match, words sharing a stem match each
+                     other on SQLite (e.g. 'bank' and 'banking').
+        category (str): Restricts the results to one of Article.CATEGORIES.
+        source (str): Restricts the results to one source name.
+        limit (int): Maximum number of results.
+        offset (int): Number of results to skip, for pagination.
+
+    Returns:
+        SearchResults: Article instances, without their body, annotated with 'rank' (higher is better) and
+                       'snippet', an HTML-safe excerpt with the matched terms wrapped in <mark> tags.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return SearchResults()
+
+    backend = {'sqlite': _search_sqlite, 'postgresql': _search_postgresql}.get(connection.vendor, _search_fallback)
+    articles = backend(terms, category, source, limit, offset)
+    for article in articles:
+        article.snippet = highlight(article.snippet or '')
+    return articles
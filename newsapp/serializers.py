@@ -1,7 +1,86 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Article, Source, ContactMessage
 
 
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    A ListSerializer for batch writes, used by the bulk API endpoints through many=True.
+
+    Invalid items are reported one by one instead of failing the whole batch, and the valid ones are written with
+    a single bulk_create or bulk_update rather than one query per item. Like bulk_create and bulk_update
+    themselves, it sends no model signals.
+
+    Attributes:
+        item_errors (dict): Validation errors keyed by item index, filled by is_valid().
+        valid_indexes (list): Indexes of the valid items, in the order of validated_data.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+
+        self.item_errors, self.valid_indexes, validated = {}, [], []
+        for index, item in enumerate(data):
+            if isinstance(self.instance, list):
+                # Validating updates against their own instance, which unique validators need to exclude it
+                self.child.instance = self.instance[index]
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as error:
+                self.item_errors[index] = error.detail
+            else:
+                self.valid_indexes.append(index)
+        return validated
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data],
+                                         batch_size=getattr(settings, 'API_BULK_BATCH_SIZE', 500))
+
+    def update(self, instances, validated_data):
+        """
+        Applies the validated changes to the instances, given in the same order, and saves the changed fields.
+        """
+        model = self.child.Meta.model
+        fields = {field for attrs in validated_data for field in attrs}
+        for instance, attrs in zip(instances, validated_data):
+            for field, value in attrs.items():
+                setattr(instance, field, value)
+
+        # bulk_update skips pre_save, so auto_now fields are set here
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.add(field.attname)
+                for instance in instances:
+                    setattr(instance, field.attname, now)
+
+        if fields:
+            model.objects.bulk_update(instances, sorted(fields),
+                                      batch_size=getattr(settings, 'API_BULK_BATCH_SIZE', 500))
+        return instances
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer accepting an optional 'fields' argument that restricts the serialized fields.
+
+    This lets API clients request sparse fieldsets, e.g. leaving out large fields they do not need.
+    Unknown field names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Popping 'fields' before the superclass sees it
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
 class ArticleMiniSerializer(serializers.ModelSerializer):
     """
     A minimal serializer for the Article model, focusing on specific fields.
@@ -20,26 +99,27 @@ class ArticleMiniSerializer(serializers.ModelSerializer):
 
 class SourceMiniSerializer(serializers.ModelSerializer):
     """
-    A serializer for the Source model with nested ArticleMiniSerializer.
+    A minimal serializer for the Source model, nested in every serialized article.
 
-    This serializer includes related Article instances as nested data.
+    The source's articles are left out: a page of articles from one large source would otherwise repeat the
+    titles of all of that source's articles once per article.
 
     Meta:
         model: Specifies the Source model as the source of serialization.
-        fields: Includes 'name' and nested articles.
+        fields: Defines 'name' as the field to be serialized.
     """
-    article_set = ArticleMiniSerializer(many=True)
     # Meta class definition
     class Meta:
         model = Source
         fields = ('name',)
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(DynamicFieldsModelSerializer):
     """
     A comprehensive serializer for the Article model.
 
     This serializer handles all fields of the Article model and includes a nested SourceMiniSerializer.
+    A 'fields' argument restricts the output to a sparse fieldset.
 
     Meta:
         model: Specifies the Article model as the source of serialization.
@@ -51,21 +131,63 @@ class ArticleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Article
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None):
+        """
+        Loads the source serialized by the nested site along with the articles.
+
+        Without it, every serialized article costs one query for its source. The source is joined in instead.
+
+        Args:
+            queryset (QuerySet): The articles to serialize.
+            fields (list): The sparse fieldset requested, if any. Nothing is loaded when 'site' is left out.
+
+        Returns:
+            QuerySet: The queryset with the relations loaded eagerly.
+        """
+        if fields is not None and 'site' not in fields:
+            return queryset
+        return queryset.select_related('site')
+
+
+class ArticleSearchResultSerializer(serializers.ModelSerializer):
+    """
+    A serializer for the articles returned by a full-text search.
+
+    Leaves out the body and adds the relevance and the highlighted excerpt computed by search_articles.
+
+    Meta:
+        model: Specifies the Article model as the source of serialization.
+        fields: Includes the listing fields of the article, 'rank' and 'snippet'.
+    """
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+    # Meta class definition
+    class Meta:
+        model = Article
+        fields = ('id', 'title', 'description', 'source', 'category', 'time_published', 'rank', 'snippet')
 
 
 class SourceSerializer(serializers.ModelSerializer):
     """
       A basic serializer for the Source model.
 
+      Attributes:
+          article_count: Read-only number of articles of the source, when the queryset is annotated with it.
+
       Meta:
           model: Specifies the Source model as the source of serialization.
-          fields: Includes 'name' as the field to be serialized.
+          fields: Includes 'id', 'name' and 'article_count' as the fields to be serialized.
       """
+    article_count = serializers.IntegerField(read_only=True, default=None)
 
     # Meta class definition
     class Meta:
         model = Source
-        fields = ("name",)
+        fields = ("id", "name", "article_count")
+        list_serializer_class = BulkListSerializer
 
 
 class ContactMessageSerializer(serializers.ModelSerializer):
@@ -81,6 +203,7 @@ class ContactMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 
 class ContactMessageMiniSerializer(serializers.ModelSerializer):
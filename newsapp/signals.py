@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from .db import apply_sqlite_pragmas
+from .groups import invalidate_group_names
+from .listing_cache import invalidate_article_listings
+from .models import Article, Source
+from .search import restore_sqlite_triggers
+from .stats import restore_sqlite_triggers as restore_sqlite_stats_triggers
+from .sources import source_cache
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_group_names_on_change(sender, instance, **kwargs):
+    """
+    Drops the memoized group names of a user whose groups were changed through user.groups.
+
+    Changes made from the group side (group.user_set) cannot reach the user objects in memory, but those only live
+    for the duration of one request anyway.
+    """
+    if kwargs['action'] in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, get_user_model()):
+        invalidate_group_names(instance)
+
+
+@receiver(pre_save, sender=Article)
+def link_article_source(sender, instance, raw=False, **kwargs):
+    """
+    Points an article saved without a site at the Source named by its source string, creating it if needed.
+    """
+    if not raw and instance.site_id is None and instance.source:
+        instance.site_id = source_cache.get_id(instance.source)
+
+
+@receiver(post_delete, sender=Source)
+def forget_deleted_source(sender, instance, **kwargs):
+    """
+    Drops a deleted source from the source cache, so its primary key is never handed out again.
+    """
+    source_cache.forget(instance.name)
+
+
+@receiver(post_save, sender=Source)
+def forget_saved_source(sender, instance, created, **kwargs):
+    """
+    Drops the names cached for a source that was edited, since a rename leaves its old name pointing at the row.
+    """
+    if not created:
+        source_cache.forget_id(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_listings_on_article_change(sender, using, **kwargs):
+    """
+    Invalidates the cached article listings whenever an article is created, edited or deleted.
+
+    The invalidation waits for the transaction to commit, otherwise a listing rendered in between would cache the
+    old articles under the new version.
+    """
+    transaction.on_commit(invalidate_article_listings, using=using)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """
+    Puts back the triggers of the SQLite search index and article stats after migrations rebuilt the article table.
+
+    Flushing the database sends post_migrate as well, so the source cache is cleared here too.
+    """
+    if sender.name != 'newsapp':
+        return
+    source_cache.forget()
+    if connections[using].vendor == 'sqlite':
+        restore_sqlite_triggers(connections[using])
+        restore_sqlite_stats_triggers(connections[using])
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """
+    Applies the SQLite pragmas to every new SQLite connection, see newsapp.db.sqlite_pragmas.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_sqlite_pragmas(cursor)
@@ -0,0 +1,116 @@
+import threading
+
+from django.db import transaction
+
+from .models import Source
+
+# Largest number of names per IN clause, below the variable limit of older SQLite versions
+LOOKUP_BATCH_SIZE = 500
+
+
+class SourceCache:
+    """
+    In-process cache of Source primary keys by name, resolving news source names to Source rows.
+
+    Unknown names are looked up and the missing sources created in bulk, so resolving a whole batch of items costs
+    at most four queries, and a single one once every name is cached. Source names are unique, which lets
+    concurrent writers create the same source without duplicating it.
+
+    Names are only cached once the transaction that found or created them commits, so a rolled back transaction
+    never leaves the primary key of a vanished row behind. Sources deleted or renamed by this process are dropped
+    from the cache by the Source signal receivers, see newsapp.signals. Other processes cannot reach this cache, so
+    cached primary keys are also checked against the database on every resolve.
+
+    Attributes:
+        hits (int): Number of names resolved from the cache by this process.
+        misses (int): Number of names that had to be looked up.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, ids):
+        with self._lock:
+            self._ids.update(ids)
+
+    def forget(self, name=None):
+        """
+        Drops one name from the cache, or every name when none is given.
+        """
+        with self._lock:
+            if name is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(name, None)
+
+    def forget_id(self, source_id):
+        """
+        Drops every name cached for the Source with the given primary key, e.g. after it was renamed.
+        """
+        with self._lock:
+            for name in [name for name, cached_id in self._ids.items() if cached_id == source_id]:
+                del self._ids[name]
+
+    def _verify(self, ids):
+        # Keeping the cached names whose Source still exists under that name, since another process may have
+        # deleted or renamed it, which would break the foreign key of every article linked to it
+        current = {}
+        source_ids = list(set(ids.values()))
+        for start in range(0, len(source_ids), LOOKUP_BATCH_SIZE):
+            current.update(Source.objects.filter(pk__in=source_ids[start:start + LOOKUP_BATCH_SIZE])
+                           .values_list('id', 'name'))
+        stale = [name for name, source_id in ids.items() if current.get(source_id) != name]
+        for name in stale:
+            self.forget(name)
+            del ids[name]
+        return ids
+
+    def resolve(self, sources):
+        """
+        Returns the primary keys of the Source rows named after the given sources, creating the missing ones.
+
+        Args:
+            sources (dict): The URL of every source, keyed by source name. URLs are only used for new sources.
+
+        Returns:
+            dict: The Source primary key of every name.
+        """
+        with self._lock:
+            ids = {name: self._ids[name] for name in sources if name in self._ids}
+        if ids:
+            ids = self._verify(ids)
+        with self._lock:
+            self.hits += len(ids)
+            self.misses += len(sources) - len(ids)
+        missing = [name for name in sources if name not in ids]
+        if not missing:
+            return ids
+
+        found = {}
+        for start in range(0, len(missing), LOOKUP_BATCH_SIZE):
+            names = missing[start:start + LOOKUP_BATCH_SIZE]
+            found.update(Source.objects.filter(name__in=names).values_list('name', 'id'))
+            new = [Source(name=name, url=sources[name] or '') for name in names if name not in found]
+            if new:
+                # Another writer may create the same sources meanwhile, so conflicts are ignored and every new
+                # name is read back, which also provides the primary keys on databases that cannot return them
+                Source.objects.bulk_create(new, ignore_conflicts=True)
+                found.update(Source.objects.filter(name__in=[source.name for source in new])
+                             .values_list('name', 'id'))
+
+        transaction.on_commit(lambda: self._remember(found))
+        ids.update(found)
+        return ids
+
+    def get_id(self, name, url=''):
+        """
+        Returns the primary key of the Source named 'name', creating it with the given URL if it does not exist.
+        """
+        return self.resolve({name: url})[name]
+
+
+# Cache shared by the ingestion, the import and the article signal receivers
+source_cache = SourceCache()
@@ -0,0 +1,177 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection as default_connection, connections
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import ArchivedArticle, Article, ArticleStat
+from .routers import archive_database
+
+# Table of ArticleStat, kept in sync with newsapp_article by triggers on SQLite and PostgreSQL, see migration 0030
+STATS_TABLE = 'newsapp_articlestat'
+# Databases on which the triggers exist. Elsewhere the counts are computed from the articles on every read.
+TRIGGER_VENDORS = ('sqlite', 'postgresql')
+
+# Triggers keeping the SQLite stats in sync with newsapp_article, as created by migration 0030. Days are UTC days,
+# which is how SQLite stores the publication times.
+_SQLITE_ADD = f"""
+            INSERT INTO {STATS_TABLE} (day, category, source, count)
+            VALUES (date(new.time_published), new.category, new.source, 1)
+            ON CONFLICT (day, category, source) DO UPDATE SET count = count + 1;"""
+_SQLITE_REMOVE = f"""
+            UPDATE {STATS_TABLE} SET count = count - 1
+            WHERE day = date(old.time_published) AND category = old.category AND source = old.source;
+            DELETE FROM {STATS_TABLE}
+            WHERE day = date(old.time_published) AND category = old.category AND source = old.source AND count <= 0;"""
+SQLITE_TRIGGERS = {
+    'newsapp_article_stats_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_stats_insert AFTER INSERT ON newsapp_article BEGIN{_SQLITE_ADD}
+        END""",
+    'newsapp_article_stats_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_stats_delete AFTER DELETE ON newsapp_article BEGIN{_SQLITE_REMOVE}
+        END""",
+    'newsapp_article_stats_update': f"""
+        CREATE TRIGGER IF NOT EXISTS newsapp_article_stats_update
+        AFTER UPDATE OF category, source, time_published ON newsapp_article
+        WHEN old.category IS NOT new.category OR old.source IS NOT new.source
+             OR date(old.time_published) IS NOT date(new.time_published)
+        BEGIN{_SQLITE_REMOVE}{_SQLITE_ADD}
+        END""",
+}
+
+# Expression of the UTC publication day of an article, per database
+DAY_EXPRESSIONS = {
+    'sqlite': 'date(time_published)',
+    'postgresql': "(time_published AT TIME ZONE 'UTC')::date",
+}
+
+
+def add_article_counts(counts, connection=None):
+    """
+    Adds numbers of articles to the stats table, e.g. the archived articles the triggers took out of it.
+
+    Args:
+        counts (dict): The number of articles to add, keyed by (UTC day, category, source name).
+        connection: The database connection. Defaults to the default database.
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.executemany(f"""
+            INSERT INTO {STATS_TABLE} (day, category, source, count) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (day, category, source) DO UPDATE SET count = {STATS_TABLE}.count + excluded.count""",
+                           [(connection.ops.adapt_datefield_value(day), category, source, count)
+                            for (day, category, source), count in counts.items()])
+
+
+def article_day(published):
+    """
+    Returns the UTC day under which an article published at the given time is counted.
+    """
+    return published.astimezone(dt_timezone.utc).date()
+
+
+def rebuild_article_stats(connection=None):
+    """
+    Recounts every article, archived ones included, into the stats table, replacing its content.
+
+    Only needed when the triggers were missing while articles changed, e.g. after a SQLite table rebuild, since
+    the triggers otherwise keep the counts exact.
+
+    Args:
+        connection: The database connection. Defaults to the default database.
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {STATS_TABLE}')
+        cursor.execute(f"""
+            INSERT INTO {STATS_TABLE} (day, category, source, count)
+            SELECT {DAY_EXPRESSIONS[connection.vendor]}, category, source, COUNT(*) FROM newsapp_article
+            GROUP BY 1, 2, 3""")
+
+    # The archive may live in another database, its articles are counted in Python
+    archive = connections[archive_database()]
+    if ArchivedArticle._meta.db_table not in archive.introspection.table_names():
+        # The archive has not been migrated yet
+        return
+    archived = {}
+    rows = ArchivedArticle.objects.values_list('time_published', 'category', 'source').iterator(chunk_size=10000)
+    for published, category, source in rows:
+        key = (article_day(published), category, source)
+        archived[key] = archived.get(key, 0) + 1
+    add_article_counts(archived, connection)
+
+
+def restore_sqlite_triggers(connection):
+    """
+    Recreates the stats triggers of a SQLite database when they are missing, and recounts every article if so.
+
+    Like the triggers of the search index, they are dropped whenever a migration rebuilds newsapp_article, see
+    newsapp.search.restore_sqlite_triggers.
+
+    Args:
+        connection: The SQLite database connection.
+
+    Returns:
+        bool: True if triggers had to be recreated.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [STATS_TABLE])
+        if cursor.fetchone() is None:
+            # Migration 0030 has not run yet
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'newsapp_article'")
+        missing = set(SQLITE_TRIGGERS) - {name for name, in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(SQLITE_TRIGGERS[name])
+    if missing:
+        # Articles may have changed while the triggers were missing
+        rebuild_article_stats(connection)
+    return bool(missing)
+
+
+def article_counts(day=None, days=1):
+    """
+    Returns the number of articles published per category and per source over a range of UTC days.
+
+    The counts are read from the stats table, whose size depends on the number of days, categories and sources
+    but not on the number of articles. Databases without the triggers count the articles and archived articles
+    instead.
+
+    Args:
+        day (date): The last day of the range. Defaults to today.
+        days (int): The number of days in the range, ending with 'day'.
+
+    Returns:
+        dict: The first and last day of the range as 'from' and 'to', the number of articles as 'total', the
+              number per category as 'categories', every category included, and the number per source as
+              'sources', a list of {'source', 'count'} dicts with the most prolific source first.
+    """
+    day = day or timezone.now().date()
+    first_day = day - timedelta(days=days - 1)
+
+    if default_connection.vendor in TRIGGER_VENDORS:
+        tables = [(ArticleStat.objects.filter(day__range=(first_day, day)), Sum('count'))]
+    else:
+        # Filtering on time_published itself lets the database use its index
+        start = datetime.combine(first_day, time.min, tzinfo=dt_timezone.utc)
+        published = {'time_published__gte': start, 'time_published__lt': start + timedelta(days=days)}
+        tables = [(Article.objects.filter(**published), Count('id')),
+                  (ArchivedArticle.objects.filter(**published), Count('id'))]
+
+    # Aggregating the rows of the range per category, then per source
+    categories = dict.fromkeys((code for code, _ in Article.CATEGORIES), 0)
+    sources = {}
+    for rows, total in tables:
+        for category, count in rows.order_by().values_list('category').annotate(count=total):
+            categories[category] = categories.get(category, 0) + count
+        for source, count in rows.order_by().values_list('source').annotate(count=total):
+            sources[source] = sources.get(source, 0) + count
+    sources = [{'source': source, 'count': count}
+               for source, count in sorted(sources.items(), key=lambda item: (-item[1], item[0]))]
+    return {
+        'from': first_day.isoformat(),
+        'to': day.isoformat(),
+        'total': sum(categories.values()),
+        'categories': categories,
+        'sources': sources,
+    }
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """
+    Request handler standing in for the GNews and OpenAI APIs.
+
+    The behaviour is driven by the 'stub' attribute of the server, which holds the news items to serve,
+    the artificial latency and counters recording the requests received per endpoint.
+    """
+    # Keeping connections alive so clients can reuse them
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Keeping the test output clean
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _track(self, name):
+        # Counting requests and recording the highest number of concurrent requests per endpoint
+        stub = self.server.stub
+        with stub['lock']:
+            stub['active'][name] = stub['active'].get(name, 0) + 1
+            stub['peak'][name] = max(stub['peak'].get(name, 0), stub['active'][name])
+            stub['calls'][name] = stub['calls'].get(name, 0) + 1
+
+    def _untrack(self, name):
+        stub = self.server.stub
+        with stub['lock']:
+            stub['active'][name] -= 1
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path.startswith('/top-headlines'):
+            self._send_json({'totalArticles': len(stub['items']), 'articles': stub['items']})
+        elif self.path.startswith('/images/'):
+            self._track('download')
+            try:
+                image_io = BytesIO()
+                Image.new('RGB', (8, 8), color=(200, 30, 30)).save(image_io, format='PNG')
+                body = image_io.getvalue()
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                self._untrack('download')
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        stub = self.server.stub
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path.endswith('/chat/completions'):
+            self._track('prompt')
+            try:
+                content = payload['messages'][-1]['content']
+                index = next(i for i, item in enumerate(stub['items']) if item['title'] in content)
+                if stub['staggered']:
+                    # Later items answer faster so completion order differs from input order
+                    time.sleep(stub['latency'] * (len(stub['items']) - index))
+                else:
+                    time.sleep(stub['latency'])
+                if 'FAIL' in content:
+                    self._send_json({'error': {'message': 'boom', 'type': 'server_error'}}, status=500)
+                else:
+                    self._send_json({'choices': [{'message': {'role': 'assistant',
+                                                              'content': f'prompt for item {index}'}}]})
+            finally:
+                self._untrack('prompt')
+        elif self.path.endswith('/images/generations'):
+            self._track('image')
+            try:
+                time.sleep(stub['latency'])
+                host, port = self.server.server_address
+                self._send_json({'data': [{'url': f'http://{host}:{port}/images/{payload["prompt"]}.png'}]})
+            finally:
+                self._untrack('image')
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+
+def start_stub_server(items, latency=0.0, staggered=False):
+    """
+    Starts a local stub server standing in for the GNews and OpenAI APIs in a background thread.
+
+    Args:
+        items (list): The news items returned by the top headlines endpoint.
+        latency (float): Artificial delay in seconds added to every OpenAI call.
+        staggered (bool): Whether later items should get shorter prompt latencies than earlier ones.
+
+    Returns:
+        tuple: The running server and its base URL. The caller is responsible for calling
+               server.shutdown() and server.server_close().
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubAPIHandler)
+    server.daemon_threads = True
+    server.stub = {'items': items, 'latency': latency, 'staggered': staggered, 'lock': threading.Lock(),
+                   'active': {}, 'peak': {}, 'calls': {}}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, 'http://%s:%s' % server.server_address
+
+
+def make_news_item(index, title=None):
+    # Building a news item shaped like the GNews API response
+    return {
+        'title': title or f'Headline {index}',
+        'description': f'Description {index}',
+        'content': f'Content of article {index}',
+        'url': f'https://example.com/news/{index}',
+        'source': {'name': f'Source {index % 3}', 'url': f'https://source{index % 3}.example.com'},
+    }
@@ -1,5 +1,7 @@
 from django import template
 
+from ..groups import DELETING_GROUPS, EDITING_GROUPS, in_any_group, user_group_names
+
 # Create an instance of Library to register new template tags and filters
 register = template.Library()
 
@@ -25,7 +27,61 @@ def user_in_group(user, group_name):
         {% endif %}
 
     This filter is useful for controlling the visibility of certain parts of a template based on the user's group membership.
+    Membership is loaded once per request, so repeated checks make no further queries.
     """
 
-    # Checks if the given user is part of a group with the specified name and returns a boolean value.
-    return user.groups.filter(name=group_name).exists()
+    # Checks the group name against the user's memoized group names
+    return group_name in user_group_names(user)
+
+
+@register.filter
+def user_in_any_group(user, group_names):
+    """
+    Custom template filter 'user_in_any_group'.
+
+    Checks if a given user belongs to at least one of several groups, given as a comma separated string.
+
+    Args:
+        user (User): The User object representing the current user.
+        group_names (str): Comma separated names of the groups to check for membership.
+
+    Returns:
+        bool: True if the user is a member of any of the specified groups, False otherwise.
+
+    Example Usage in Template:
+        {% if request.user|user_in_any_group:'Editors,Senior editors' %}
+            <!-- HTML to render if user is in either group -->
+        {% endif %}
+    """
+    return in_any_group(user, (name.strip() for name in group_names.split(',')))
+
+
+@register.filter
+def can_edit_articles(user):
+    """
+    Custom template filter 'can_edit_articles'.
+
+    Checks if a given user belongs to one of the groups allowed to create and edit articles, see
+    groups.EDITING_GROUPS, so templates do not repeat the group names.
+
+    Example Usage in Template:
+        {% if request.user|can_edit_articles %}
+            <!-- HTML to render for writers and editors -->
+        {% endif %}
+    """
+    return in_any_group(user, EDITING_GROUPS)
+
+
+@register.filter
+def can_delete_articles(user):
+    """
+    Custom template filter 'can_delete_articles'.
+
+    Checks if a given user belongs to one of the groups allowed to delete articles, see groups.DELETING_GROUPS.
+
+    Example Usage in Template:
+        {% if request.user|can_delete_articles %}
+            <!-- HTML to render for editors -->
+        {% endif %}
+    """
+    return in_any_group(user, DELETING_GROUPS)
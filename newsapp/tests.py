@@ -1,3 +1,1693 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import aiohttp
+import openai
+import requests
+from PIL import Image
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archive, compression, db, dedup, export, http_client, images, importer, routers, search, stats, utils
+from .backends.sqlite3.base import DatabaseWrapper
+from .cards import load_cards
+from .listing_cache import VERSION_KEY, listing_cache
+from .middleware import ReplicaRoutingMiddleware, brotli
+from .llm_cache import LLMCache, llm_cache
+from .models import ArchivedArticle, Article, ArticleFingerprint, ArticleStat, LLMCacheEntry, Source
+from .pipeline import IngestionResult
+from .routers import PrimaryReplicaRouter
+from .sources import SourceCache, source_cache
+from .scheduler import PeriodicScheduler
+from .stubs import make_news_item, start_stub_server
+from .templatetags.group_validate import user_in_any_group, user_in_group
+
+
+class StubAPIServerMixin:
+    """
+    Mixin starting a local stub server and pointing GNews and OpenAI calls at it.
+    """
+
+    def start_stub_server(self, items, latency=0.0, staggered=False):
+        server, base_url = start_stub_server(items, latency=latency, staggered=staggered)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        for patcher in (mock.patch.object(utils, 'GNEWS_API_URL', f'{base_url}/top-headlines'),
+                        mock.patch.object(openai, 'api_base', f'{base_url}/v1'),
+                        mock.patch.object(openai, 'api_key', 'test-key')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return server.stub
+
+
+# Tests reading or clearing the cache use a private in-memory cache rather than the shared one of settings.CACHES,
+# which the running workers use
+local_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'newsapp-tests'},
+})
+
+
+def b64_png():
+    # A 1x1 transparent PNG
+    return base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+
+
+class MediaRootMixin:
+    """
+    Mixin redirecting uploaded media to a temporary directory for the duration of a test.
+    """
+
+    def use_temporary_media_root(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        return media_root
+
+
+class IngestionPipelineTests(StubAPIServerMixin, MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.use_temporary_media_root()
+
+    def test_articles_are_generated_concurrently_in_input_order(self):
+        items = [make_news_item(index) for index in range(6)]
+        stub = self.start_stub_server(items, latency=0.05, staggered=True)
+
+        results = utils.generate_articles(amount=6, category='business',
+                                          limits={'prompt': 3, 'image': 2, 'download': 2})
+
+        self.assertEqual([result.item['title'] for result in results], [item['title'] for item in items])
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([result.article.title for result in results], [item['title'] for item in items])
+        self.assertEqual(Article.objects.count(), 6)
+        self.assertTrue(all(article.image for article in Article.objects.all()))
+        self.assertTrue(all(article.image_renditions['card'] for article in Article.objects.all()))
+
+        # Stages ran in parallel but never above their configured limits
+        self.assertGreater(stub['peak']['prompt'], 1)
+        self.assertLessEqual(stub['peak']['prompt'], 3)
+        self.assertLessEqual(stub['peak']['image'], 2)
+        self.assertLessEqual(stub['peak']['download'], 2)
+
+    def test_articles_are_persisted_in_bulk(self):
+        items = [dict(make_news_item(index), category='business') for index in range(20)]
+        results = [IngestionResult(index, item, {}) for index, item in enumerate(items)]
+
+        # One transaction with one INSERT for the articles and one for the fingerprints, plus a lookup, an INSERT
+        # and a read back for the new sources
+        with self.assertNumQueries(7):
+            utils.persist_results(results)
+
+        self.assertEqual([result.article.title for result in results], [item['title'] for item in items])
+        self.assertTrue(all(result.article.pk for result in results))
+        self.assertEqual(ArticleFingerprint.objects.filter(article__isnull=False).count(), 20)
+        self.assertEqual({article.site.name for article in Article.objects.select_related('site')},
+                         {item['source']['name'] for item in items})
+
+        # Known sources are served by the source cache, which only checks that they still exist
+        more = [IngestionResult(index, dict(make_news_item(index + 20), category='business'), {})
+                for index in range(3)]
+        with self.assertNumQueries(5):
+            utils.persist_results(more)
+
+    def test_failed_item_does_not_abort_the_batch(self):
+        items = [make_news_item(0), make_news_item(1, title='FAIL headline'), make_news_item(2)]
+        self.start_stub_server(items)
+
+        results = utils.generate_articles(amount=3)
+
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual(results[1].stage, 'prompt')
+        self.assertIsInstance(results[1].error, openai.error.OpenAIError)
+        self.assertEqual(set(Article.objects.values_list('title', flat=True)), {'Headline 0', 'Headline 2'})
+
+
+@local_cache
+class ImageRenditionTests(StubAPIServerMixin, MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.use_temporary_media_root()
+
+    def test_renditions_are_resized_from_a_single_download(self):
+        image_io = BytesIO()
+        Image.new('RGB', (1600, 1200)).save(image_io, format='PNG')
+
+        renditions = images.render_renditions(image_io.getvalue(), formats=['jpeg', 'webp'])
+
+        self.assertEqual(Image.open(BytesIO(renditions['card']['jpeg'])).size, (500, 300))
+        self.assertEqual(Image.open(BytesIO(renditions['detail']['webp'])).size, (1024, 768))
+
+    def test_oversized_downloads_are_refused(self):
+        self.start_stub_server([])
+        with self.assertRaises(images.ImageTooLarge):
+            images.fetch_image(openai.api_base.replace('/v1', '/images/any.png'), max_bytes=10)
+
+    def test_card_image_prefers_smaller_formats(self):
+        self.start_stub_server([make_news_item(0)])
+        utils.generate_articles(amount=1)
+        card = Article.objects.get().card_image
+
+        self.assertRegex(card['src'], r'/media/images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertIn('image/webp', [source['type'] for source in card['sources']])
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.media_root = self.use_temporary_media_root()
+
+    def test_identical_images_are_stored_once_by_concurrent_writers(self):
+        data = b'same image content'
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            names = set(executor.map(lambda _: images.store_content_addressed(data, 'jpg'), range(16)))
+
+        name, = names
+        self.assertEqual(os.listdir(os.path.join(self.media_root, os.path.dirname(name))),
+                         [os.path.basename(name)])
+
+    def test_attaching_an_image_runs_no_queries(self):
+        article = Article(title='Title', description='Description', body='Body', source='Source')
+        renditions = images.render_renditions(b64_png(), formats=['jpeg'])
+
+        with self.assertNumQueries(0):
+            utils.attach_image(article, renditions, save=False)
+        self.assertTrue(article.image.name.startswith('images/'))
+
+    def test_building_renditions_marks_the_articles_changed(self):
+        article = Article.objects.create(title='Title', description='Description', body='Body', source='Source',
+                                         category='general')
+        Article.objects.filter(pk=article.pk).update(image=images.store_content_addressed(b64_png(), 'png'),
+                                                     updated_at=timezone.now() - timedelta(days=1))
+        version = listing_cache.version()
+
+        call_command('build_renditions', stdout=StringIO())
+
+        article.refresh_from_db()
+        self.assertIn('card', article.image_renditions)
+        self.assertGreater(article.updated_at, timezone.now() - timedelta(minutes=1))
+        self.assertNotEqual(listing_cache.version(), version)
+
+
+class DeduplicationTests(StubAPIServerMixin, MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.use_temporary_media_root()
+
+    def test_rerun_skips_known_items_before_llm_calls(self):
+        stub = self.start_stub_server([make_news_item(index) for index in range(3)])
+        utils.generate_articles(amount=3)
+        self.assertEqual(stub['calls']['prompt'], 3)
+
+        results = utils.generate_articles(amount=3)
+
+        self.assertEqual(results, [])
+        self.assertEqual(stub['calls']['prompt'], 3)
+        self.assertEqual(Article.objects.count(), 3)
+        self.assertEqual(ArticleFingerprint.objects.count(), 3)
+
+    def test_duplicates_inside_a_batch_are_skipped(self):
+        item = make_news_item(0)
+        same_url = dict(make_news_item(1), url=item['url'] + '/?utm_source=feed')
+        same_content = dict(item, url='https://other.example.com/story', title=item['title'].upper())
+
+        self.assertEqual(dedup.filter_new_items([item, same_url, same_content]), [item])
+
+    def test_near_duplicate_mode_catches_syndicated_stories(self):
+        body = ' '.join(f'word{index}' for index in range(200))
+        original = dict(make_news_item(0), content=body)
+        ArticleFingerprint.objects.create(**dedup.fingerprint_fields(original))
+        syndicated = dict(make_news_item(1), title=original['title'], content=body + ' Reporting by Reuters.')
+
+        self.assertEqual(dedup.filter_new_items([syndicated], near_duplicates=False), [syndicated])
+        self.assertEqual(dedup.filter_new_items([syndicated], near_duplicates=True), [])
+
+    def test_normalize_url(self):
+        self.assertEqual(dedup.normalize_url('HTTP://www.Example.com/a/b/?utm_medium=x&z=1&a=2#top'),
+                         'https://example.com/a/b?a=2&z=1')
+
+
+class LLMCacheTests(StubAPIServerMixin, MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.use_temporary_media_root()
+
+    def test_regenerating_an_image_reuses_cached_responses(self):
+        stub = self.start_stub_server([make_news_item(0)])
+        utils.generate_articles(amount=1)
+        article = Article.objects.get()
+
+        utils.regenerate_article_image(article)
+
+        self.assertEqual(stub['calls']['prompt'], 1)
+        self.assertEqual(stub['calls']['image'], 1)
+        self.assertEqual(LLMCacheEntry.objects.get(kind='chat').hits, 1)
+
+    @override_settings(LLM_CACHE_TTLS={'image': 0})
+    def test_regenerating_an_image_after_its_url_expired_reuses_the_stored_image(self):
+        stub = self.start_stub_server([make_news_item(0)])
+        utils.generate_articles(amount=1)
+        article = Article.objects.get()
+        image = article.image.name
+
+        utils.regenerate_article_image(article)
+
+        self.assertEqual((stub['calls']['image'], stub['calls']['download']), (1, 1))
+        self.assertEqual(article.image.name, image)
+
+        # Once the stored file is gone the image is generated again
+        os.remove(os.path.join(settings.MEDIA_ROOT, image))
+        utils.regenerate_article_image(article)
+        self.assertEqual((stub['calls']['image'], stub['calls']['download']), (2, 2))
+
+    def test_bypass_flag_always_calls_the_api(self):
+        stub = self.start_stub_server([make_news_item(0)])
+        utils.chat_with_gpt3('Headline 0', 'Content of article 0')
+        utils.chat_with_gpt3('Headline 0', 'Content of article 0', use_cache=False)
+
+        self.assertEqual(stub['calls']['prompt'], 2)
+
+    def test_near_identical_prompts_share_an_entry(self):
+        stub = self.start_stub_server([make_news_item(0)])
+        hits = llm_cache.hits
+        utils.generate_image('A  red square')
+        utils.generate_image('a red square ')
+
+        self.assertEqual(stub['calls']['image'], 1)
+        self.assertEqual(llm_cache.hits, hits + 1)
+
+    @override_settings(LLM_CACHE_TTLS={'chat': 0})
+    def test_expired_entries_are_refreshed(self):
+        cache = LLMCache()
+        cache.set('chat', 'key', 'old reply')
+
+        self.assertEqual(cache.get_or_call('chat', 'key', lambda: 'new reply'), 'new reply')
+        self.assertEqual(cache.misses, 1)
+
+    @override_settings(LLM_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = LLMCache()
+        cache.set('chat', 'first', '1')
+        cache.set('chat', 'second', '2')
+        cache.get('chat', 'first')
+        cache.set('chat', 'third', '3')
+
+        self.assertEqual(set(LLMCacheEntry.objects.values_list('key', flat=True)), {'first', 'third'})
+        self.assertEqual(cache.evictions, 1)
+
+
+class ArticleListAPITests(TestCase):
+
+    def setUp(self):
+        # The first five articles share one timestamp to exercise the id tie-breaker
+        published = timezone.now()
+        for index in range(12):
+            article = Article.objects.create(title=f'Title {index}', description='Description', body='Body' * 100,
+                                             source='Source', category='general')
+            Article.objects.filter(pk=article.pk).update(
+                time_published=published if index < 5 else published + timedelta(minutes=index))
+
+    def test_cursor_walks_every_article_once_newest_first(self):
+        expected = list(Article.objects.order_by('-time_published', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 5, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/v1/article', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [article['id'] for article in response.json()['results']]
+            cursor = response.json()['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
+
+    def test_sparse_fieldset_leaves_out_the_body(self):
+        response = self.client.get('/api/v1/article', {'fields': 'id,title', 'page_size': 2})
+
+        self.assertEqual([set(article) for article in response.json()['results']], [{'id', 'title'}] * 2)
+        self.assertIn('cursor=', response.json()['next'])
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/v1/article', {'page_size': 50})
+
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/article', {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ArticleAPIQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Articles spread over several sources, each source also owning a few other articles
+        sources = [Source.objects.create(name=f'Source {index}', url=f'https://source{index}.example.com')
+                   for index in range(4)]
+        Article.objects.bulk_create([
+            Article(title=f'Title {index}', description='Description', body='Body', source=sources[index % 4].name,
+                    site=sources[index % 4], category='general') for index in range(40)])
+
+    def list_articles(self, page_size):
+        response = self.client.get('/api/v1/article', {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_listing_costs_a_constant_number_of_queries(self):
+        # Two queries for the ETag, one for the page with its sources joined in
+        for page_size in (1, 10, 40):
+            with self.assertNumQueries(3):
+                results = self.list_articles(page_size)
+            self.assertEqual(len(results), page_size)
+
+        # The source is nested without its other articles, which would repeat on every article of the page
+        self.assertEqual(results[0]['site'], {'name': results[0]['source']})
+
+    def test_detail_costs_a_constant_number_of_queries(self):
+        article = Article.objects.first()
+
+        # One query for the ETag, one for the article and its source
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/article', {'id': article.id})
+
+        self.assertEqual(response.json()['site']['name'], article.site.name)
+
+    def test_sparse_fieldset_without_site_skips_the_relations(self):
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/article', {'page_size': 40, 'fields': 'id,title'})
+
+
+class GroupMembershipTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.editors = Group.objects.create(name='Editors')
+        cls.writers = Group.objects.create(name='Writers')
+        cls.user = User.objects.create_user(username='editor', password='secret')
+        cls.user.groups.add(cls.editors)
+        cls.article = Article.objects.create(title='Title', description='Description', body='Body', source='Source')
+
+    def test_membership_is_loaded_once_per_user_object(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            checks = [user_in_group(user, 'Editors'), user_in_group(user, 'Writers'),
+                      user_in_any_group(user, 'Writers,Senior editors'), user_in_any_group(user, 'Editors,Writers')]
+
+        self.assertEqual(checks, [True, False, False, True])
+
+    def test_anonymous_users_make_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(user_in_group(AnonymousUser(), 'Editors'))
+
+    def test_changing_groups_invalidates_the_memoized_names(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user_in_group(user, 'Writers'))
+
+        user.groups.add(self.writers)
+        self.assertTrue(user_in_group(user, 'Writers'))
+        user.groups.clear()
+        self.assertFalse(user_in_group(user, 'Editors'))
+
+    def test_article_page_makes_at_most_one_group_query(self):
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('article_view', args=[self.article.pk]))
+
+        self.assertContains(response, 'Delete Article')
+        self.assertEqual(sum('auth_user_groups' in query['sql'] for query in queries), 1)
+
+    def test_article_buttons_follow_the_group_constants(self):
+        writer = User.objects.create_user(username='writer', password='secret')
+        writer.groups.add(self.writers)
+        self.client.force_login(writer)
+
+        response = self.client.get(reverse('article_view', args=[self.article.pk]))
+
+        self.assertContains(response, 'Edit Article')
+        self.assertContains(response, 'Create Article')
+        self.assertNotContains(response, 'Delete Article')
+        with mock.patch('newsapp.templatetags.group_validate.DELETING_GROUPS', ('Writers',)):
+            self.assertContains(self.client.get(reverse('article_view', args=[self.article.pk])), 'Delete Article')
+
+
+@local_cache
+class ListingCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='secret')
+        self.client.force_login(self.user)
+        self.article = Article.objects.create(title='First title', description='Description', body='Body',
+                                              source='Source', category='general')
+
+    def article_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, sum('newsapp_article' in query['sql'] for query in queries)
+
+    def test_repeated_page_views_make_no_article_query(self):
+        for url in (reverse('home'), reverse('category_news', args=['general'])):
+            first_response, first_queries = self.article_queries(url)
+            second_response, second_queries = self.article_queries(url)
+
+            self.assertEqual((first_queries, second_queries), (1, 0))
+            self.assertContains(second_response, 'First title')
+            self.assertEqual(first_response.content, second_response.content)
+
+    def test_saving_and_deleting_articles_invalidates_listings(self):
+        self.client.get(reverse('home'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.title = 'Edited title'
+            self.article.save()
+            # Nothing is invalidated before the change is committed
+            self.assertNotContains(self.client.get(reverse('home')), 'Edited title')
+        self.assertContains(self.client.get(reverse('home')), 'Edited title')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.delete()
+        self.assertNotContains(self.client.get(reverse('home')), 'Edited title')
+
+    def test_evicted_versions_are_never_reused(self):
+        self.client.get(reverse('home'))
+        # A change the listings were not told about, served fresh only if the version evicted next is not reused
+        Article.objects.filter(pk=self.article.pk).update(title='Quiet title', updated_at=timezone.now())
+
+        cache.delete(VERSION_KEY)
+
+        self.assertContains(self.client.get(reverse('home')), 'Quiet title')
+
+    def test_bulk_persistence_invalidates_listings(self):
+        self.client.get(reverse('home'))
+
+        item = dict(make_news_item(0, title='Bulk title'), category='general')
+        utils.persist_results([IngestionResult(0, item, {})])
+
+        self.assertContains(self.client.get(reverse('home')), 'Bulk title')
+
+    def test_hits_and_misses_are_counted(self):
+        before = listing_cache.stats()
+        for _ in range(3):
+            self.client.get(reverse('home'))
+
+        stats = listing_cache.stats()
+        self.assertEqual((stats['hits'] - before['hits'], stats['misses'] - before['misses']), (2, 1))
+
+
+@local_cache
+class ArticleCardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.articles = [Article.objects.create(title=f'Title {index}', description=f'Description {index}',
+                                                body='Large body', source='AP', category='health',
+                                                image='images/photo.jpg' if index else None)
+                         for index in range(3)]
+        Article.objects.filter(pk=self.articles[2].pk).update(
+            image_renditions={'card': {'webp': 'images/renditions/card.webp', 'jpeg': 'images/renditions/card.jpg'}},
+            updated_at=timezone.now())
+
+    def test_cards_render_like_articles(self):
+        articles = Article.objects.order_by('-time_published', '-id')
+
+        self.assertEqual(render_to_string('article_cards.html', {'articles': load_cards(articles)}),
+                         render_to_string('article_cards.html', {'articles': list(articles)}))
+        self.assertFalse(hasattr(load_cards(articles)[0], '__dict__'))
+
+    def test_listings_load_only_the_card_columns(self):
+        self.client.force_login(User.objects.create_user(username='reader', password='secret'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('category_news', args=['health']))
+
+        article_sql = [query['sql'] for query in queries if 'newsapp_article' in query['sql']]
+        self.assertEqual(len(article_sql), 1)
+        self.assertNotIn('body', article_sql[0])
+        self.assertContains(response, 'Title 2')
+        self.assertContains(response, '/media/images/renditions/card.webp')
+
+    def test_cards_api_paginates_compact_cards(self):
+        response = self.client.get('/api/v1/article/cards', {'category': 'health', 'page_size': 2}).json()
+
+        self.assertEqual([card['title'] for card in response['results']], ['Title 2', 'Title 1'])
+        self.assertEqual(set(response['results'][0]),
+                         {'id', 'title', 'description', 'source', 'time_published', 'url', 'image'})
+        self.assertEqual(response['results'][0]['image']['src'], '/media/images/renditions/card.jpg')
+        self.assertEqual(response['results'][1]['image'], {'sources': [], 'src': '/media/images/photo.jpg'})
+        self.assertEqual(response['results'][1]['url'], reverse('article_view', args=[self.articles[1].pk]))
+
+        last = self.client.get(response['next']).json()
+        self.assertEqual([card['title'] for card in last['results']], ['Title 0'])
+        self.assertIsNone(last['results'][0]['image'])
+        self.assertIsNone(last['next'])
+
+    def test_cards_api_rejects_unknown_filters(self):
+        self.assertEqual(self.client.get('/api/v1/article/cards', {'category': 'gossip'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/article/cards', {'site': 'AP'}).status_code, 400)
+
+
+@local_cache
+class CategoryNewsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='reader', password='secret'))
+        for category in ('health', 'business'):
+            Article.objects.create(title=f'{category} title', description='Description', body='Body',
+                                   source='Source', category=category)
+
+    def test_every_category_has_a_page_listing_its_articles(self):
+        for category, label in Article.CATEGORIES:
+            response = self.client.get(reverse('category_news', args=[category]))
+            self.assertContains(response, f'{label} News')
+
+        response = self.client.get(reverse('category_news', args=['health']))
+        self.assertContains(response, 'health title')
+        self.assertNotContains(response, 'business title')
+
+    def test_unknown_category_is_not_found(self):
+        self.assertEqual(self.client.get('/news/gossip').status_code, 404)
+
+    def test_former_category_urls_redirect(self):
+        self.assertRedirects(self.client.get('/news/economic_news'), '/news/business', status_code=301)
+        self.assertRedirects(self.client.get('/news/health_news'), '/news/health', status_code=301)
+
+    def test_navigation_lists_every_category(self):
+        response = self.client.get(reverse('home'))
+
+        for category, _ in Article.CATEGORIES:
+            self.assertContains(response, f'href="/news/{category}"')
+
+    def test_latest_in_category_uses_the_composite_index(self):
+        plan = Article.objects.filter(category='health').order_by('-time_published')[:5].explain()
+
+        self.assertIn('article_category_published_idx', plan)
+
+
+class ArticleSearchTests(TestCase):
+
+    def setUp(self):
+        self.rates = Article.objects.create(title='Central bank raises rates', description='Inflation <fight>',
+                                            body='The central bank raised interest rates again.', source='Reuters',
+                                            category='business')
+        self.vaccine = Article.objects.create(title='Vaccine trial results', description='Health news',
+                                              body='Hospitals are banking on the new vaccine.', source='AP',
+                                              category='health')
+
+    def search(self, query, **filters):
+        return [article.id for article in search.search_articles(query, **filters)]
+
+    def test_title_matches_rank_above_body_matches(self):
+        self.assertEqual(self.search('bank'), [self.rates.id, self.vaccine.id])
+
+    def test_every_term_must_match_and_stems_match(self):
+        self.assertEqual(self.search('vaccines hospital'), [self.vaccine.id])
+        self.assertEqual(self.search('vaccine inflation'), [])
+
+    def test_search_syntax_is_ignored(self):
+        self.assertEqual(self.search('"bank" -(rates^'), [self.rates.id])
+        self.assertEqual(self.search('*'), [])
+
+    def test_category_and_source_filters(self):
+        self.assertEqual(self.search('bank', category='health'), [self.vaccine.id])
+        self.assertEqual(self.search('bank', source='Reuters'), [self.rates.id])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        result = search.search_articles('inflation')[0]
+
+        self.assertEqual(result.snippet, '<mark>Inflation</mark> &lt;fight&gt;')
+
+    def test_index_follows_updates_deletes_and_bulk_inserts(self):
+        Article.objects.filter(pk=self.rates.pk).update(description='A steady outlook')
+        self.assertEqual(self.search('steady'), [self.rates.id])
+        self.assertEqual(self.search('inflation'), [])
+
+        self.vaccine.delete()
+        self.assertEqual(self.search('vaccine'), [])
+
+        Article.objects.bulk_create([Article(title='Bulk inserted story', description='', body='', source='AP')])
+        self.assertEqual(len(self.search('inserted')), 1)
+
+    def test_search_api_paginates(self):
+        response = self.client.get('/api/v1/search', {'q': 'bank', 'page_size': 1})
+
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.rates.id])
+        self.assertIn('<mark>bank</mark>', response.json()['results'][0]['snippet'])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.vaccine.id])
+        self.assertIsNone(response.json()['next'])
+
+    @override_settings(SEARCH_MAX_CANDIDATES=1)
+    def test_results_tell_when_older_matches_were_left_out(self):
+        results = search.search_articles('bank')
+
+        self.assertEqual([article.id for article in results], [self.vaccine.id])
+        self.assertTrue(results.truncated)
+        self.assertFalse(search.search_articles('vaccine').truncated)
+        self.assertTrue(self.client.get('/api/v1/search', {'q': 'bank'}).json()['truncated'])
+
+        self.client.force_login(User.objects.create_user(username='reader', password='secret'))
+        self.assertContains(self.client.get(reverse('search'), {'q': 'bank'}), 'Only the 1 most recent')
+
+    def test_search_api_requires_a_query(self):
+        self.assertEqual(self.client.get('/api/v1/search').status_code, 400)
+
+    def test_search_page_lists_results(self):
+        self.client.force_login(User.objects.create_user(username='reader', password='secret'))
+
+        response = self.client.get(reverse('search'), {'q': 'vaccine'})
+
+        self.assertContains(response, 'Vaccine trial results')
+        self.assertNotContains(response, 'Central bank raises rates')
+
+
+class ConditionalRequestTests(TestCase):
+
+    def setUp(self):
+        self.article = Article.objects.create(title='Title', description='Description', body='Body ' * 200,
+                                              source='Source', category='general')
+        self.url = reverse('article_view', args=[self.article.pk])
+
+    def test_article_page_is_not_resent_while_unchanged(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.article.title = 'New title'
+        self.article.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_article_page_etag_depends_on_the_visitor_groups(self):
+        anonymous_etag = self.client.get(self.url)['ETag']
+        user = User.objects.create_user(username='editor', password='secret')
+        self.client.force_login(user)
+        reader_etag = self.client.get(self.url)['ETag']
+        user.groups.add(Group.objects.create(name='Editors'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=reader_etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len({anonymous_etag, reader_etag, response['ETag']}), 3)
+
+    def test_article_page_sets_no_cookie(self):
+        self.assertEqual(self.client.get(self.url).cookies, {})
+
+    def test_edit_returns_to_the_next_url_when_safe(self):
+        user = User.objects.create_user(username='senior', password='secret')
+        user.groups.add(Group.objects.create(name='Senior editors'))
+        self.client.force_login(user)
+        # The form requires an image, an existing one is kept when none is uploaded
+        Article.objects.filter(pk=self.article.pk).update(image='images/existing.png')
+        edit_url = reverse('article_edit', args=[self.article.pk])
+        data = {'title': 'Title', 'body': 'Body', 'source': 'Source', 'category': 'general'}
+
+        response = self.client.post(edit_url, data)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        response = self.client.post(f'{edit_url}?next=/news/general', data)
+        self.assertRedirects(response, '/news/general', fetch_redirect_response=False)
+        response = self.client.post(f'{edit_url}?next=https://evil.example.com/', data)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+
+    def test_api_detail_and_list_answer_not_modified(self):
+        for params in ({'id': self.article.pk}, {'page_size': 5}):
+            etag = self.client.get('/api/v1/article', params)['ETag']
+            response = self.client.get('/api/v1/article', params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        Article.objects.create(title='Other', description='Description', body='Body', source='Source')
+        response = self.client.get('/api/v1/article', {'page_size': 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_and_api_answer_not_modified_since_their_last_change(self):
+        for url, params in ((self.url, {}), ('/api/v1/article', {'id': self.article.pk}),
+                            ('/api/v1/article', {'page_size': 5})):
+            last_modified = self.client.get(url, params)['Last-Modified']
+            response = self.client.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 304)
+
+            # HTTP dates have a one second resolution, so the change is dated a minute later
+            Article.objects.filter(pk=self.article.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+            response = self.client.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+            Article.objects.filter(pk=self.article.pk).update(updated_at=timezone.now())
+
+    def test_conditional_headers_share_one_version_lookup(self):
+        # One query for the ETag and Last-Modified, one for the article and its source
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/article', {'id': self.article.pk})
+
+    def test_api_responses_change_with_their_nested_source(self):
+        etags = {key: self.client.get('/api/v1/article', params)['ETag']
+                 for key, params in (('detail', {'id': self.article.pk}), ('list', {'page_size': 5}))}
+
+        source = self.article.site
+        source.name = 'Renamed source'
+        source.save()
+
+        for key, params in (('detail', {'id': self.article.pk}), ('list', {'page_size': 5})):
+            response = self.client.get('/api/v1/article', params, HTTP_IF_NONE_MATCH=etags[key])
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['site']['name'], 'Renamed source')
+
+    def test_responses_are_compressed(self):
+        response = self.client.get('/api/v1/article', {'id': self.article.pk}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @unittest.skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_is_preferred_when_accepted(self):
+        plain = self.client.get(self.url).content
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain)
+
+
+class BulkAPITests(TestCase):
+
+    def setUp(self):
+        self.source = Source.objects.create(name='Reuters', url='https://reuters.com')
+
+    def article_item(self, index, **fields):
+        return dict({'title': f'Title {index}', 'description': 'Description', 'body': 'Body', 'source': 'Reuters',
+                     'category': 'business', 'site_id': self.source.pk}, **fields)
+
+    def test_create_reports_every_item_and_writes_the_valid_ones_in_bulk(self):
+        items = [self.article_item(0), self.article_item(1, category='gossip'), self.article_item(2)]
+
+        # Savepoint, one INSERT, release
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/v1/article/bulk', items, content_type='application/json')
+
+        body = response.json()
+        self.assertEqual(body['counts'], {'created': 2, 'invalid': 1})
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'invalid', 'created'])
+        self.assertIn('category', body['results'][1]['errors'])
+        self.assertEqual(list(Article.objects.order_by('id').values_list('title', flat=True)), ['Title 0', 'Title 2'])
+
+    def test_create_accepts_ndjson(self):
+        payload = '\n'.join(json.dumps(self.article_item(index)) for index in range(3)) + '\n\n'
+
+        response = self.client.post('/api/v1/article/bulk', payload, content_type='application/x-ndjson')
+
+        self.assertEqual(response.json()['counts'], {'created': 3})
+
+    def test_malformed_ndjson_reports_the_line(self):
+        payload = json.dumps(self.article_item(0)) + '\n{not json}\n'
+
+        response = self.client.post('/api/v1/article/bulk', payload, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.json()['detail'])
+
+    def test_update_changes_only_the_given_fields(self):
+        first, second = [Article.objects.create(**self.article_item(index)) for index in range(2)]
+        updated_at = first.updated_at
+        items = [{'id': first.pk, 'title': 'New title'}, {'id': second.pk, 'category': 'gossip'}, {'id': 999}]
+
+        response = self.client.patch('/api/v1/article/bulk', items, content_type='application/json')
+
+        self.assertEqual([result['status'] for result in response.json()['results']],
+                         ['updated', 'invalid', 'not_found'])
+        first.refresh_from_db()
+        self.assertEqual((first.title, first.body), ('New title', 'Body'))
+        self.assertGreater(first.updated_at, updated_at)
+        second.refresh_from_db()
+        self.assertEqual(second.category, 'business')
+
+    def test_delete_accepts_ids_and_objects(self):
+        first, second = [Article.objects.create(**self.article_item(index)) for index in range(2)]
+
+        response = self.client.delete('/api/v1/article/bulk', [first.pk, {'id': second.pk}, 999],
+                                      content_type='application/json')
+
+        self.assertEqual(response.json()['counts'], {'deleted': 2, 'not_found': 1})
+        self.assertFalse(Article.objects.exists())
+
+    def test_database_errors_roll_back_the_whole_batch(self):
+        source = Source.objects.create(name='AP')
+        items = [{'id': self.source.pk, 'name': 'Renamed'}, {'id': source.pk, 'name': 'AP'}]
+
+        with mock.patch.object(Source.objects, 'bulk_update', side_effect=IntegrityError('failed')):
+            response = self.client.patch('/api/v1/source/bulk', items, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rolled back', response.json()['info'])
+        self.assertEqual(Source.objects.get(pk=self.source.pk).name, 'Reuters')
+
+    @override_settings(API_BULK_MAX_ITEMS=2)
+    def test_batches_are_bounded(self):
+        response = self.client.post('/api/v1/source/bulk', [{'name': 'A'}] * 3, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_sources_and_messages(self):
+        response = self.client.post('/api/v1/source/bulk', [{'name': 'AP'}, {'name': 'BBC'}],
+                                    content_type='application/json')
+        self.assertEqual(response.json()['counts'], {'created': 2})
+
+        message = {'name': 'Ann', 'email': 'ann@example.com', 'title': 'Hello', 'content': 'Hi'}
+        response = self.client.post('/api/v1/message/bulk', [message, {'name': 'Bob'}],
+                                    content_type='application/json')
+        self.assertEqual(response.json()['counts'], {'created': 1, 'invalid': 1})
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.articles = [
+            Article.objects.create(title=f'Title {index}', description='Description', body='Body, "quoted"\nline',
+                                   source='Reuters', category=category)
+            for index, category in enumerate(['business', 'health', 'business'])
+        ]
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_export_streams_every_article_with_one_query_per_table(self):
+        with self.assertNumQueries(2):
+            lines = self.read(self.client.get('/api/v1/article/export')).decode().splitlines()
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], [article.pk for article in self.articles])
+        self.assertEqual(rows[0]['body'], 'Body, "quoted"\nline')
+        self.assertEqual(set(rows[0]), set(export.EXPORT_FIELDS))
+
+    def test_archived_articles_are_exported_first_with_their_body(self):
+        archive.ArticleArchiver(cutoff=timezone.now() + timedelta(minutes=1)).run()
+        recent = Article.objects.create(title='Recent', description='D', body='Recent body', source='AP',
+                                        category='business')
+
+        lines = self.read(self.client.get('/api/v1/article/export?category=business')).decode().splitlines()
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([(row['id'], row['archived']) for row in rows],
+                         [(self.articles[0].pk, True), (self.articles[2].pk, True), (recent.pk, False)])
+        self.assertEqual([row['body'] for row in rows], ['Body, "quoted"\nline'] * 2 + ['Recent body'])
+
+    def test_csv_export_by_category(self):
+        response = self.client.get('/api/v1/article/export?type=csv&category=business')
+
+        rows = list(csv.reader(StringIO(self.read(response).decode())))
+        self.assertEqual(rows[0], list(export.EXPORT_FIELDS))
+        self.assertEqual([row[1] for row in rows[1:]], ['Title 0', 'Title 2'])
+        self.assertEqual(rows[1][3], 'Body, "quoted"\nline')
+
+    def test_gzip_export_is_a_file_left_alone_by_the_compression_middleware(self):
+        response = self.client.get('/api/v1/article/export?gzip=1', HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('articles.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(self.read(response)).splitlines()), 3)
+
+    def test_unknown_type_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/article/export?type=xml').status_code, 400)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_command_writes_a_file(self):
+        output = os.path.join(tempfile.mkdtemp(), 'articles.csv.gz')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+
+        call_command('export_articles', format='csv', gzip=True, output=output, stderr=StringIO())
+
+        with gzip.open(output, 'rt', newline='') as export_file:
+            self.assertEqual(len(list(csv.reader(export_file))), 4)
+
+
+def gnews_item(index, **fields):
+    return dict({'title': f'Story {index}', 'description': 'Description', 'content': f'Content of story {index}',
+                 'url': f'https://example.com/story/{index}', 'publishedAt': '2024-03-01T10:00:00Z',
+                 'source': {'name': 'Reuters', 'url': 'https://reuters.com'}}, **fields)
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text, compress=False):
+        path = os.path.join(self.directory, name)
+        with (gzip.open(path, 'wt', encoding='utf-8') if compress else open(path, 'w', encoding='utf-8')) as file:
+            file.write(text)
+        return path
+
+    def test_json_arrays_are_streamed_across_reads(self):
+        items = [gnews_item(index, title=f'Story {index} ]}},"[') for index in range(5)]
+        path = self.write('headlines.json', json.dumps({'totalArticles': 5, 'articles': items}, indent=2))
+
+        with mock.patch.object(importer, 'READ_SIZE', 7):
+            self.assertEqual(list(importer.read_items(path)), items)
+
+    def test_json_lines_expand_responses_and_report_malformed_lines(self):
+        lines = [json.dumps(gnews_item(0)), '', '{broken', json.dumps({'articles': [gnews_item(1), gnews_item(2)]})]
+        path = self.write('dump.jsonl.gz', '\n'.join(lines), compress=True)
+
+        self.assertEqual(importer.detect_format(path), 'jsonl')
+        self.assertEqual(list(importer.read_items(path)), [gnews_item(0), None, gnews_item(1), gnews_item(2)])
+
+    def test_items_are_mapped_onto_articles_and_sources(self):
+        items = [gnews_item(0, category='health'), gnews_item(1, category='gossip', publishedAt='garbage'),
+                 gnews_item(2, content=''), gnews_item(3, source={'name': 'AP', 'url': 'https://apnews.com'})]
+        Source.objects.create(name='Reuters', url='https://reuters.com')
+
+        result = importer.ArticleImporter(category='world').run(items)
+
+        self.assertEqual((result.read, result.imported, result.invalid), (4, 3, 1))
+        articles = {article.title: article for article in Article.objects.select_related('site')}
+        self.assertEqual(articles['Story 0'].category, 'health')
+        self.assertEqual(articles['Story 1'].category, 'world')
+        self.assertEqual(articles['Story 0'].time_published.isoformat(), '2024-03-01T10:00:00+00:00')
+        self.assertEqual(articles['Story 0'].site.name, 'Reuters')
+        self.assertEqual(articles['Story 3'].site.url, 'https://apnews.com')
+        self.assertEqual(Source.objects.count(), 2)
+        self.assertEqual(ArticleFingerprint.objects.count(), 3)
+
+    def test_batches_are_deduplicated(self):
+        items = [gnews_item(index) for index in range(5)] + [gnews_item(0)]
+        progress = []
+
+        result = importer.ArticleImporter(batch_size=2, progress=lambda run: progress.append(run.imported)).run(items)
+
+        self.assertEqual((result.imported, result.duplicates), (5, 1))
+        self.assertEqual(progress, [2, 4, 5])
+
+        # Running the same import again skips everything, with a constant number of queries per batch
+        with self.assertNumQueries(2):
+            result = importer.ArticleImporter(batch_size=10).run(items)
+        self.assertEqual((result.imported, result.duplicates), (0, 6))
+
+    def test_failed_batches_are_rolled_back(self):
+        items = [gnews_item(index) for index in range(4)]
+
+        with mock.patch.object(ArticleFingerprint.objects, 'bulk_create', side_effect=IntegrityError('failed')):
+            result = importer.ArticleImporter(batch_size=2).run(items)
+
+        self.assertEqual((result.imported, result.failed), (0, 4))
+        self.assertFalse(Article.objects.exists())
+        self.assertFalse(Source.objects.exists())
+
+    def test_command_reports_progress(self):
+        path = self.write('headlines.json', json.dumps([gnews_item(index) for index in range(3)]))
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('import_articles', path, batch_size=2, stdout=stdout, stderr=stderr)
+
+        self.assertIn('Imported 3 articles', stdout.getvalue())
+        self.assertEqual(len(stderr.getvalue().splitlines()), 2)
+        self.assertIn('rows/s', stderr.getvalue())
+
+    def test_command_stops_on_malformed_json(self):
+        path = self.write('headlines.json', '[' + json.dumps(gnews_item(0)) + ', {"title": ')
+
+        with self.assertRaisesMessage(CommandError, 'Import stopped after'):
+            call_command('import_articles', path, stdout=StringIO(), stderr=StringIO())
+
+
+class SourceLinkTests(TestCase):
+
+    def test_saved_articles_are_linked_to_their_source(self):
+        existing = Source.objects.create(name='Reuters', url='https://reuters.com')
+
+        first = Article.objects.create(title='One', description='D', body='B', source='Reuters')
+        second = Article.objects.create(title='Two', description='D', body='B', source='AP')
+
+        self.assertEqual(first.site, existing)
+        self.assertEqual(second.site.name, 'AP')
+        self.assertEqual(Source.objects.count(), 2)
+
+    def test_cache_resolves_names_in_bulk_and_remembers_committed_ones(self):
+        cache = SourceCache()
+        Source.objects.create(name='Reuters')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(3):
+                ids = cache.resolve({'Reuters': '', 'AP': 'https://apnews.com', 'BBC': ''})
+        # Cached names only cost the query checking that their sources still exist
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.resolve({'AP': '', 'BBC': ''}), {'AP': ids['AP'], 'BBC': ids['BBC']})
+
+        self.assertEqual(Source.objects.get(pk=ids['AP']).url, 'https://apnews.com')
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_uncommitted_sources_are_not_cached(self):
+        cache = SourceCache()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            cache.get_id('AP')
+
+        with self.assertNumQueries(1):
+            cache.get_id('AP')
+
+    def test_deleted_sources_leave_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            source_id = source_cache.get_id('AP')
+        Source.objects.filter(pk=source_id).delete()
+
+        article = Article.objects.create(title='One', description='D', body='B', source='AP')
+
+        self.assertNotEqual(article.site_id, source_id)
+
+    def test_sources_changed_by_another_process_are_resolved_again(self):
+        # The signal receivers only reach the shared source_cache, like changes made by another process
+        cache = SourceCache()
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = cache.resolve({'AP': '', 'Reuters': ''})
+        Source.objects.filter(pk=ids['AP']).delete()
+        Source.objects.filter(pk=ids['Reuters']).update(name='Reuters UK')
+
+        resolved = cache.resolve({'AP': '', 'Reuters': ''})
+
+        self.assertEqual(resolved, dict(Source.objects.filter(name__in=['AP', 'Reuters']).values_list('name', 'id')))
+        self.assertNotIn(ids['AP'], resolved.values())
+        self.assertNotIn(ids['Reuters'], resolved.values())
+
+    def test_renamed_sources_leave_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            source_id = source_cache.get_id('AP')
+        source = Source.objects.get(pk=source_id)
+        source.name = 'Associated Press'
+        source.save()
+
+        self.assertNotIn('AP', source_cache._ids)
+        self.assertNotEqual(source_cache.get_id('AP'), source_id)
+
+    def test_editing_the_source_name_moves_the_article(self):
+        user = User.objects.create_user(username='writer', password='secret')
+        user.groups.add(Group.objects.create(name='Writers'))
+        self.client.force_login(user)
+        # The form requires an image, an existing one is kept when none is uploaded
+        article = Article.objects.create(title='One', description='D', body='B', source='Reuters',
+                                         image='images/existing.png')
+
+        self.client.post(reverse('article_edit', args=[article.pk]),
+                         {'body': 'B', 'source': 'AP', 'category': 'general'})
+
+        article.refresh_from_db()
+        self.assertEqual(article.site.name, 'AP')
+
+    def test_articles_are_listed_and_counted_per_source(self):
+        for index in range(3):
+            Article.objects.create(title=f'Title {index}', description='D', body='B', source='AP')
+        Article.objects.create(title='Other', description='D', body='B', source='Reuters')
+        ap = Source.objects.get(name='AP')
+
+        results = self.client.get('/api/v1/article', {'site': ap.pk}).json()['results']
+        sources = self.client.get('/api/v1/source').json()
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(sources[0], {'id': ap.pk, 'name': 'AP', 'article_count': 3})
+        self.assertEqual(self.client.get('/api/v1/article', {'site': 'AP'}).status_code, 400)
+
+
+class ArticleStatsTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.yesterday = timezone.now() - timedelta(days=1)
+
+    def counts(self):
+        return {(stat.day, stat.category, stat.source): stat.count for stat in ArticleStat.objects.all()}
+
+    def create(self, title, source='AP', category='general'):
+        return Article.objects.create(title=title, description='D', body='B', source=source, category=category)
+
+    def test_counts_follow_inserts_updates_and_deletes(self):
+        first = self.create('One')
+        self.create('Two')
+        self.create('Three', source='Reuters', category='health')
+        self.assertEqual(self.counts(), {(self.today, 'general', 'AP'): 2, (self.today, 'health', 'Reuters'): 1})
+
+        # Moving an article to another category and another day moves its count
+        Article.objects.filter(pk=first.pk).update(category='world', time_published=self.yesterday,
+                                                   updated_at=timezone.now())
+        Article.objects.filter(source='Reuters').delete()
+        Article.objects.bulk_create([Article(title='Bulk', description='D', body='B', source='BBC')])
+
+        self.assertEqual(self.counts(), {
+            (self.today, 'general', 'AP'): 1,
+            (self.yesterday.date(), 'world', 'AP'): 1,
+            (self.today, 'general', 'BBC'): 1,
+        })
+
+    def test_missing_triggers_are_restored_and_the_counts_rebuilt(self):
+        self.create('One')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER newsapp_article_stats_insert')
+        self.create('Two')
+
+        self.assertTrue(stats.restore_sqlite_triggers(connection))
+        self.assertFalse(stats.restore_sqlite_triggers(connection))
+        self.create('Three')
+        self.assertEqual(self.counts(), {(self.today, 'general', 'AP'): 3})
+
+    def test_stats_api_counts_per_category_and_source(self):
+        self.create('One')
+        self.create('Two', source='Reuters')
+        self.create('Three', source='Reuters', category='health')
+        Article.objects.filter(title='One').update(time_published=self.yesterday, updated_at=timezone.now())
+
+        with self.assertNumQueries(2):
+            today = self.client.get('/api/v1/stats').json()
+        week = self.client.get('/api/v1/stats', {'date': self.today.isoformat(), 'days': 7}).json()
+
+        self.assertEqual(today['total'], 2)
+        self.assertEqual(today['categories']['general'], 1)
+        self.assertEqual(today['categories']['health'], 1)
+        self.assertEqual(today['categories']['world'], 0)
+        self.assertEqual(today['sources'], [{'source': 'Reuters', 'count': 2}])
+        self.assertEqual(week['from'], (self.today - timedelta(days=6)).isoformat())
+        self.assertEqual(week['sources'], [{'source': 'Reuters', 'count': 2}, {'source': 'AP', 'count': 1}])
+        # Databases without the triggers count the articles themselves, to the same result
+        with mock.patch.object(stats, 'TRIGGER_VENDORS', ()):
+            self.assertEqual(stats.article_counts(self.today, 7), week)
+
+    def test_stats_api_rejects_invalid_ranges(self):
+        self.assertEqual(self.client.get('/api/v1/stats', {'date': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/stats', {'days': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/stats', {'days': 1000}).status_code, 400)
+
+    def test_admin_lists_the_stats_read_only(self):
+        self.create('One')
+        self.create('Two', source='Reuters')
+        self.client.force_login(User.objects.create_superuser(username='admin', password='secret'))
+
+        response = self.client.get(reverse('admin:newsapp_articlestat_changelist'))
+
+        self.assertContains(response, '(2 articles)')
+        self.assertContains(response, 'Reuters')
+        self.assertEqual(self.client.get(reverse('admin:newsapp_articlestat_add')).status_code, 403)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.old = timezone.now() - timedelta(days=400)
+        self.articles = [Article.objects.create(title=f'Story {index}', description='D', body=f'Body {index} ' * 50,
+                                                source='AP') for index in range(3)]
+        self.recent = Article.objects.create(title='Recent', description='D', body='Recent body', source='AP')
+        Article.objects.filter(pk__in=[article.pk for article in self.articles]).update(
+            time_published=self.old, updated_at=self.old)
+        ArticleFingerprint.objects.create(article=self.articles[0], content_hash='hash', simhash=0,
+                                          band0=0, band1=0, band2=0, band3=0)
+
+    def counts(self):
+        return {(stat.day, stat.category, stat.source): stat.count for stat in ArticleStat.objects.all()}
+
+    def test_old_articles_are_moved_with_compressed_bodies(self):
+        stats_before = self.counts()
+
+        archiver = archive.ArticleArchiver(batch_size=2).run()
+
+        self.assertEqual(archiver.archived, 3)
+        self.assertLess(archiver.compressed_bytes, archiver.body_bytes)
+        self.assertEqual(list(Article.objects.values_list('title', flat=True)), ['Recent'])
+        archived = ArchivedArticle.objects.get(pk=self.articles[1].pk)
+        self.assertEqual((archived.title, archived.body, archived.compression),
+                         ('Story 1', 'Body 1 ' * 50, 'zlib'))
+        self.assertEqual(archived.time_published, self.old)
+        self.assertIsNone(ArticleFingerprint.objects.get().article)
+        # Archived articles stay counted, but leave the search index
+        self.assertEqual(self.counts(), stats_before)
+        self.assertEqual(search.search_articles('story'), [])
+
+    def test_interrupted_batches_are_archived_again(self):
+        # A copy committed to a separate archive before its original was deleted
+        ArchivedArticle.objects.create(id=self.articles[0].pk, title='Story 0', description='D',
+                                       compressed_body=compression.compress_body('B', 'zlib'), compression='zlib',
+                                       source='AP', time_published=self.old, updated_at=self.old)
+
+        self.assertEqual(archive.ArticleArchiver().run().archived, 3)
+        self.assertFalse(Article.objects.filter(time_published__lt=archive.archive_cutoff()).exists())
+        self.assertEqual(ArchivedArticle.objects.count(), 3)
+
+    def test_archived_articles_keep_their_page(self):
+        archive.ArticleArchiver().run()
+        user = User.objects.create_user(username='writer', password='secret')
+        user.groups.add(Group.objects.create(name='Writers'))
+        self.client.force_login(user)
+        url = reverse('article_view', args=[self.articles[2].pk])
+
+        response = self.client.get(url)
+        async_response = self.client.get(f'/async{url}')
+
+        self.assertContains(response, 'Body 2 Body 2')
+        self.assertNotContains(response, 'Edit Article')
+        self.assertContains(async_response, 'Body 2 Body 2')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        self.assertEqual(self.client.get(reverse('article_view', args=[12345])).status_code, 404)
+
+    def test_stats_rebuild_counts_archived_articles(self):
+        archive.ArticleArchiver().run()
+        stats_before = self.counts()
+
+        stats.rebuild_article_stats()
+
+        self.assertEqual(self.counts(), stats_before)
+        self.assertEqual(sum(stats_before.values()), 4)
+
+    def test_command_reports_and_archives(self):
+        out = StringIO()
+        call_command('archive_articles', '--days', '30', '--dry-run', stdout=out)
+        self.assertIn('3 articles published before', out.getvalue())
+        self.assertEqual(ArchivedArticle.objects.count(), 0)
+
+        call_command('archive_articles', '--days', '30', stdout=out, stderr=StringIO())
+        self.assertIn('Archived 3 articles', out.getvalue())
+        self.assertEqual(Article.objects.count(), 1)
+
+    @override_settings(ARCHIVE_COMPRESSION='zstd')
+    def test_zstd_requires_the_zstandard_package(self):
+        with mock.patch.object(compression, 'zstandard', None):
+            with self.assertRaises(ImproperlyConfigured):
+                archive.ArticleArchiver()
+
+    @override_settings(ARCHIVE_DATABASE='archive')
+    def test_separate_archive_database_holds_only_the_archive(self):
+        router = PrimaryReplicaRouter()
+
+        self.assertEqual(router.db_for_read(ArchivedArticle), 'archive')
+        self.assertEqual(router.db_for_write(ArchivedArticle), 'archive')
+        self.assertTrue(router.allow_migrate('archive', 'newsapp', 'archivedarticle'))
+        self.assertFalse(router.allow_migrate('archive', 'newsapp', 'article'))
+        self.assertFalse(router.allow_migrate('archive', 'newsapp'))
+        self.assertFalse(router.allow_migrate('default', 'newsapp', 'archivedarticle'))
+        self.assertIsNone(router.allow_migrate('default', 'newsapp', 'article'))
+
+
+@local_cache
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.site = Source.objects.create(name='Source', url='https://source.example.com')
+        self.articles = [Article.objects.create(title=f'Title {index}', description='Description', body='Body',
+                                                source='Source', category='health' if index % 2 else 'general')
+                         for index in range(5)]
+
+    async def test_api_pages_through_every_article(self):
+        response = await self.async_client.get('/async/api/v1/article', {'page_size': 3, 'fields': 'id,title'})
+        first = response.json()
+        response = await self.async_client.get('/async/api/v1/article',
+                                               {'page_size': 3, 'fields': 'id,title', 'cursor': first['next_cursor']})
+        second = response.json()
+
+        self.assertEqual(first['results'][0], {'id': self.articles[-1].pk, 'title': 'Title 4'})
+        self.assertIn('cursor=', first['next'])
+        self.assertEqual([row['id'] for row in first['results'] + second['results']],
+                         [article.pk for article in reversed(self.articles)])
+        self.assertIsNone(second['next_cursor'])
+
+    async def test_api_filters_by_site(self):
+        await Article.objects.filter(pk=self.articles[0].pk).aupdate(site=None)
+
+        response = await self.async_client.get('/async/api/v1/article', {'site': self.site.pk})
+
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(response.json()['results'][0]['site_id'], self.site.pk)
+
+    async def test_api_rejects_bad_parameters(self):
+        for params in ({'cursor': 'garbage'}, {'page_size': '0'}, {'fields': 'id,password'}, {'site': 'x'},
+                       {'id': 'x'}):
+            response = await self.async_client.get('/async/api/v1/article', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    async def test_api_detail_answers_not_modified(self):
+        url = f'/async/api/v1/article?id={self.articles[0].pk}'
+        response = await self.async_client.get(url)
+
+        self.assertEqual(response.json()['title'], 'Title 0')
+        self.assertIsNone(response.json()['image'])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((await self.async_client.get('/async/api/v1/article?id=0')).status_code, 404)
+
+    async def test_listing_pages_require_login(self):
+        response = await self.async_client.get('/async/news/health')
+
+        self.assertRedirects(response, '/user/login?next=/async/news/health', fetch_redirect_response=False)
+
+    async def test_listing_pages_show_their_articles(self):
+        user = await User.objects.acreate(username='reader')
+        await sync_to_async(self.async_client.force_login)(user)
+
+        response = await self.async_client.get('/async/news/health')
+        self.assertContains(response, 'Title 3')
+        self.assertNotContains(response, 'Title 2')
+        response = await self.async_client.get('/async/')
+        self.assertContains(response, 'Title 4')
+        self.assertEqual((await self.async_client.get('/async/news/gossip')).status_code, 404)
+
+    async def test_article_page_answers_not_modified(self):
+        url = f'/async/article/{self.articles[0].pk}/'
+        response = await self.async_client.get(url)
+
+        self.assertContains(response, 'Title 0')
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((await self.async_client.get('/async/article/0/')).status_code, 404)
+
+
+class AsyncImageRegenerationTests(StubAPIServerMixin, MediaRootMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.use_temporary_media_root()
+        self.stub = self.start_stub_server([make_news_item(0)])
+        self.article = Article.objects.create(title='Headline 0', body='Content of article 0', source='Source',
+                                              category='general')
+        self.url = f'/async/article/{self.article.pk}/regenerate_image'
+        self.user = User.objects.create_user(username='writer')
+        self.client.force_login(self.user)
+
+    def test_editors_can_regenerate_an_image(self):
+        self.user.groups.add(Group.objects.create(name='Writers'))
+        updated_at = self.article.updated_at
+
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.article.refresh_from_db()
+        self.assertRegex(self.article.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertIn('card', self.article.image_renditions)
+        self.assertGreater(self.article.updated_at, updated_at)
+        self.assertEqual(self.stub['calls'], {'prompt': 1, 'image': 1, 'download': 1})
+
+    def test_regeneration_requires_an_editing_group(self):
+        self.assertEqual(self.client.post(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.stub['calls'], {})
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Request handler failing the first requests the way set by server.failure, then answering 200.
+
+    The failures are a 429 with a Retry-After header, a 503 without one, or a connection closed without response.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self):
+        self.server.hits += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.hits <= self.server.failures:
+            if self.server.failure == 'reset':
+                self.close_connection = True
+                return
+            self.send_response(self.server.failure)
+            if self.server.failure == 429:
+                self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    do_GET = do_POST = respond
+
+
+@override_settings(HTTP_MAX_RETRIES=2, HTTP_BACKOFF_FACTOR=0.01)
+class HttpClientTests(SimpleTestCase):
+
+    def setUp(self):
+        # Building the shared session from the overridden settings and dropping it afterwards
+        http_client.reset_session()
+        self.addCleanup(http_client.reset_session)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        self.server.hits = 0
+        self.server.failures = 0
+        self.server.failure = 429
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://%s:%s/' % self.server.server_address
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.failures = 2
+        response = http_client.get_session().get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(http_client.pool_metrics()['retries'], 2)
+
+    def test_retries_are_bounded(self):
+        self.server.failures = 10
+        response = http_client.get_session().get(self.url)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            http_client.get_session().get(self.url)
+
+        pool, = http_client.pool_metrics()['pools']
+        self.assertEqual(pool['requests'], 5)
+        self.assertEqual(pool['connections'], 1)
+        self.assertEqual(pool['reused'], 4)
+
+    async def test_async_requests_are_retried(self):
+        self.server.failures = 2
+        try:
+            async with await http_client.arequest('GET', self.url) as response:
+                body = await response.read()
+        finally:
+            await http_client.close_async_session()
+
+        self.assertEqual((response.status, body), (200, b'ok'))
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(http_client.pool_metrics()['retries'], 2)
+
+    def test_posts_are_only_retried_when_refused_with_retry_after(self):
+        self.server.failures = 2
+        self.assertEqual(http_client.get_session().post(self.url, data=b'{}').status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+
+        self.server.hits, self.server.failure = 0, 503
+        self.assertEqual(http_client.get_session().post(self.url, data=b'{}').status_code, 503)
+        self.assertEqual(self.server.hits, 1)
+
+        self.server.hits = 0
+        self.assertEqual(http_client.get_session().get(self.url).status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_posts_are_not_resent_after_the_connection_dropped(self):
+        self.server.failures, self.server.failure = 10, 'reset'
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get_session().post(self.url, data=b'{}')
+        self.assertEqual(self.server.hits, 1)
+
+        self.server.hits = 0
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get_session().get(self.url)
+        self.assertEqual(self.server.hits, 3)
+
+    async def test_async_posts_are_not_resent_after_the_connection_dropped(self):
+        self.server.failures, self.server.failure = 10, 'reset'
+        try:
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                await http_client.arequest('POST', self.url, data=b'{}')
+        finally:
+            await http_client.close_async_session()
+
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(http_client.pool_metrics()['retries'], 0)
+
+    def test_posts_are_retried_when_the_connection_was_refused(self):
+        with socket.socket() as unused:
+            unused.bind(('127.0.0.1', 0))
+            url = 'http://%s:%s/' % unused.getsockname()
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get_session().post(url, data=b'{}')
+        self.assertEqual(http_client.pool_metrics()['retries'], 2)
+
+    def test_retry_after_parsing(self):
+        self.assertEqual(http_client.parse_retry_after('7'), 7.0)
+        self.assertIsNone(http_client.parse_retry_after('soon'))
+        future = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))
+        self.assertAlmostEqual(http_client.parse_retry_after(future), 60, delta=2)
+
+
+class DatabaseTuningTests(TransactionTestCase):
+
+    def test_new_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            pragmas = db.read_sqlite_pragmas(cursor, ['synchronous', 'busy_timeout', 'cache_size'])
+
+        # The test database lives in memory, which has no WAL journal
+        self.assertEqual(pragmas, {'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64 * 1024})
+
+    def test_file_databases_switch_to_wal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        database = sqlite3.connect(os.path.join(directory, 'tuned.sqlite3'))
+        self.addCleanup(database.close)
+
+        db.apply_sqlite_pragmas(database.cursor(), db.DEFAULT_SQLITE_PRAGMAS)
+
+        self.assertEqual(db.read_sqlite_pragmas(database.cursor()), {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64 * 1024,
+            'mmap_size': 256 * 1024 * 1024})
+
+    def test_pragmas_are_configurable(self):
+        with override_settings(SQLITE_PRAGMAS={'mmap_size': None, 'busy_timeout': 100}):
+            self.assertNotIn('mmap_size', db.sqlite_pragmas())
+            self.assertEqual(db.sqlite_pragmas()['busy_timeout'], 100)
+        with override_settings(SQLITE_PRAGMAS=None):
+            self.assertEqual(db.sqlite_pragmas(), {})
+        with self.assertRaises(ValueError):
+            db.apply_sqlite_pragmas(connection.cursor(), {'journal_mode': 'wal; DROP TABLE newsapp_article'})
+
+    def test_transactions_take_the_write_lock_as_they_begin(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Article.objects.count()
+
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_unknown_transaction_modes_are_refused(self):
+        settings_dict = dict(connection.settings_dict, OPTIONS={'transaction_mode': 'eventually'})
+
+        with self.assertRaises(ImproperlyConfigured):
+            DatabaseWrapper(settings_dict).get_connection_params()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def start_request(self, pinned=False):
+        routing, token = routers.start_request(pinned=pinned)
+        self.addCleanup(routers.end_request, token)
+        return routing
+
+    def test_reads_outside_requests_go_to_the_primary(self):
+        self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_request_reads_of_articles_and_sources_stick_to_one_replica(self):
+        self.start_request()
+
+        replica = self.router.db_for_read(Article)
+        self.assertIn(replica, ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_read(Source), replica)
+        self.assertIsNone(self.router.db_for_read(User))
+        with routers.use_primary():
+            self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_writes_pin_the_request_to_the_primary(self):
+        routing = self.start_request()
+
+        self.assertEqual(self.router.db_for_write(Article), 'default')
+        self.assertTrue(routing.wrote)
+        self.assertIsNone(self.router.db_for_read(Article))
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'newsapp'))
+        self.assertIsNone(self.router.allow_migrate('default', 'newsapp'))
+
+    def test_middleware_pins_writing_clients_for_a_while(self):
+        seen = []
+
+        def view(request):
+            seen.append(routers.reading_from_replica())
+            if request.method == 'POST':
+                self.router.db_for_write(Article)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertEqual(middleware(self.factory.get('/')).cookies, {})
+        response = middleware(self.factory.post('/'))
+        pinned = self.factory.get('/')
+        pinned.COOKIES[ReplicaRoutingMiddleware.cookie_name] = '1'
+        middleware(pinned)
+
+        self.assertEqual(response.cookies[ReplicaRoutingMiddleware.cookie_name]['max-age'], 5)
+        self.assertIn(seen[0], ['replica1', 'replica2'])
+        self.assertEqual(seen[1:], [None, None])
+        self.assertIsNone(routers.reading_from_replica())
+
+    async def test_async_requests_are_routed_too(self):
+        async def view(request):
+            return HttpResponse(await sync_to_async(self.router.db_for_read)(Article))
+
+        response = await ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+
+        self.assertIn(response.content, [b'replica1', b'replica2'])
+
+    def test_cached_listings_are_rendered_from_the_primary(self):
+        seen = []
+        self.start_request()
+
+        listing_cache.render('replica-test', 'article_cards.html',
+                             lambda: seen.append(routers.reading_from_replica()) or [])
+
+        self.assertEqual(seen, [None])
+
+
+class PeriodicSchedulerTests(SimpleTestCase):
+
+    def test_failing_job_does_not_stop_the_scheduler(self):
+        calls = []
+
+        def job():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                raise RuntimeError('upstream unavailable')
+
+        scheduler = PeriodicScheduler(job, interval=0.01)
+        with self.assertLogs('newsapp.scheduler', level='ERROR'):
+            scheduler.run_forever(max_runs=3)
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(scheduler.runs, 3)
+
+    def test_stop_ends_background_thread(self):
+        scheduler = PeriodicScheduler(lambda: None, interval=60)
+        thread = scheduler.start()
+        scheduler.stop(timeout=5)
+        self.assertFalse(thread.is_alive())
@@ -3,6 +3,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 from django.contrib.auth.views import LoginView, LogoutView
+from django.views.generic import RedirectView
 
 # URL patterns for template-based views.
 urlpatterns = [
@@ -28,10 +29,20 @@ urlpatterns = [
     # URL for creating a new article, handled by CreateArticle view.
     path('article/create_article', views.CreateArticle.as_view(), name='create_article'),
 
-    # URLs for different news categories, handled by corresponding views.
-    path('news/general_news', views.general_news, name='general_news'),
-    path('news/health_news', views.health_news, name='health_news'),
-    path('news/economic_news', views.economic_news, name='economic_news'),
+    # Former per-category URLs, permanently redirected to the generic category page.
+    # They must come before the generic pattern, which would match them too.
+    path('news/general_news', RedirectView.as_view(pattern_name='category_news', permanent=True),
+         {'category': 'general'}),
+    path('news/health_news', RedirectView.as_view(pattern_name='category_news', permanent=True),
+         {'category': 'health'}),
+    path('news/economic_news', RedirectView.as_view(pattern_name='category_news', permanent=True),
+         {'category': 'business'}),
+
+    # News page of any category listed in Article.CATEGORIES, handled by the 'category_news' view.
+    path('news/<str:category>', views.category_news, name='category_news'),
+
+    # Full-text search page, handled by the 'search' view.
+    path('search', views.search, name='search'),
 
     # Article editing URL, managed by UpdateArticle view.
     path('article/<int:pk>/edit/', views.UpdateArticle.as_view(), name='article_edit'),
@@ -44,9 +55,6 @@ urlpatterns = [
 
     # URL for requesting additional permissions, managed by the 'request_permission' view.
     path('user/request_permission', views.request_permission, name='req_perm'),
-
-    # Test URL, handled by the 'test' view (presumably for development/testing purposes).
-    path('test', views.test, name='test'),
 ]
 
 # Including static file serving URLs for development purposes.
@@ -1,14 +1,32 @@
+import json
+import logging
 import openai
 import os
-import json
-import urllib.request
-import requests
-from .models import Article
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+from . import http_client, images
+from .dedup import fingerprint_fields, filter_new_items
+from .listing_cache import invalidate_article_listings
+from .llm_cache import llm_cache, make_key
+from .models import Article, ArticleFingerprint
+from .pipeline import IngestionPipeline, Stage
+from .sources import source_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
+# Routing OpenAI calls through the shared connection-pooled session
+openai.requestssession = http_client.get_session
+
+# Models and parameters of the OpenAI calls, also part of the response cache keys
+CHAT_MODEL = 'gpt-3.5-turbo'
+IMAGE_MODEL = 'dall-e-2'
+IMAGE_SIZE = '1024x1024'
+
+# Base URL of the GNews top headlines endpoint, overridable to point ingestion at a stub server
+GNEWS_API_URL = os.getenv('GNEWS_API_URL', 'https://gnews.io/api/v4/top-headlines')
 
 
 def get_news_items(category="general", lang="en", country="us", max_items="1"):
@@ -24,73 +42,257 @@ def get_news_items(category="general", lang="en", country="us", max_items="1"):
     Returns:
         list: A list of news items as dictionaries.
     """
-    # Constructing the API URL with query parameters for category, language, country, and item limit
-    apikey = os.getenv("NEWS_API_KEY")
-    url = f"https://gnews.io/api/v4/top-headlines?category={category}&lang={lang}&country={country}&max={max_items}&apikey={apikey}&expand=content"
+    # Building the query parameters for category, language, country, and item limit
+    params = {
+        'category': category,
+        'lang': lang,
+        'country': country,
+        'max': max_items,
+        'apikey': os.getenv("NEWS_API_KEY"),
+        'expand': 'content',
+    }
+
+    # Sending a request to the API through the pooled client and parsing the response
+    response = http_client.get_session().get(GNEWS_API_URL, params=params)
+    response.raise_for_status()
+    articles = response.json()["articles"]
+
+    # Looping through the fetched articles to add the category field
+    for i in range(len(articles)):
+        articles[i]['category'] = category
+    return articles
+
+
+def generate_image(prompt, use_cache=True):
+    """
+    Generates an image URL using OpenAI's image generation API.
+
+    Args:
+        prompt (str): The prompt for generating the image.
+        use_cache (bool): Whether an image URL cached for the same prompt may be reused.
+
+    Returns:
+        str: The URL of the generated image.
+    """
+    def call():
+        # Sending a request to OpenAI's image generation API with the provided prompt
+        response = openai.Image.create(
+            prompt=f"{prompt}",
+            n=1,
+            size=IMAGE_SIZE,
+            request_timeout=http_client.get_timeout()
+        )
+        # Extracting the image URL from the response
+        return response['data'][0]['url']
 
-    # Sending a request to the API and parsing the response
-    with urllib.request.urlopen(url) as response:
-        data = json.loads(response.read().decode("utf-8"))
-        articles = data["articles"]
+    key = make_key(IMAGE_MODEL, prompt, n=1, size=IMAGE_SIZE)
+    return llm_cache.get_or_call('image', key, call, use_cache=use_cache)
 
-        # Looping through the fetched articles to add the category field
-        for i in range(len(articles)):
-            articles[i]['category'] = category
-        return articles
 
+def _stored_image_key(prompt):
+    # The stored image of a prompt is cached apart from the URL OpenAI returned for it
+    return make_key(IMAGE_MODEL, prompt, n=1, size=IMAGE_SIZE, stored=True)
 
-def generate_image(prompt):
+
+def cached_stored_image(prompt, use_cache=True):
     """
-    Generates an image URL using OpenAI's image generation API.
+    Returns the renditions stored for an image generated earlier from the same prompt, or None.
+
+    OpenAI image URLs expire after about an hour, so the cached URL of generate_image cannot serve later
+    regenerations. The stored renditions can, as long as their files are still in the media storage.
+
+    Args:
+        prompt (str): The prompt the image was generated from.
+        use_cache (bool): Whether the cache may be used at all. None is returned when it is False.
+
+    Returns:
+        dict: The stored renditions, as returned by images.store_renditions, or None.
+    """
+    if not (use_cache and llm_cache.enabled):
+        return None
+    try:
+        response = llm_cache.get('stored_image', _stored_image_key(prompt))
+    except DatabaseError:
+        logger.warning('LLM cache lookup failed, generating the image', exc_info=True)
+        return None
+    if response is None:
+        return None
+    stored = json.loads(response)
+    return stored if default_storage.exists(stored['detail']['jpeg']) else None
+
+
+def remember_stored_image(prompt, stored, use_cache=True):
+    """
+    Caches the renditions stored for the image generated from a prompt, see cached_stored_image.
+    """
+    if not (use_cache and llm_cache.enabled):
+        return
+    try:
+        llm_cache.set('stored_image', _stored_image_key(prompt), json.dumps(stored))
+    except DatabaseError:
+        logger.warning('LLM cache store failed', exc_info=True)
+
+
+def generate_stored_image(prompt, use_cache=True):
+    """
+    Generates an image for a prompt, downloads it and stores its renditions, reusing the ones of an earlier call.
 
     Args:
         prompt (str): The prompt for generating the image.
+        use_cache (bool): Whether cached responses and images may be reused.
+
+    Returns:
+        dict: The stored renditions, as returned by images.store_renditions.
+    """
+    stored = cached_stored_image(prompt, use_cache=use_cache)
+    if stored is None:
+        stored = images.store_renditions(download_image(generate_image(prompt, use_cache=use_cache)))
+        remember_stored_image(prompt, stored, use_cache=use_cache)
+    return stored
+
+
+def _chat_messages(title, content):
+    # Messages asking the chat model for an image prompt, shared by the synchronous and asynchronous helpers
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant."
+        },
+        {
+            "role": "user",
+            "content": f"""Generate image prompt for DALL-E for the following article. Do not add the words 'Image Prompt:' before the prompt:
+               Title: {title}
+               Content = {content}
+               """
+        }
+    ]
+
+
+def chat_with_gpt3(title, content, use_cache=True):
+    """
+    Interacts with OpenAI's GPT-3 model to generate a prompt for image generation.
+
+    Args:
+        title (str): The title of the article.
+        content (str): The content of the article.
+        use_cache (bool): Whether a reply cached for the same title and content may be reused.
+
+    Returns:
+        str: The generated prompt from the assistant.
+    """
+    messages = _chat_messages(title, content)
+
+    def call():
+        # Creating a chat completion request to OpenAI with the title and content of the article
+        response = openai.ChatCompletion.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            request_timeout=http_client.get_timeout()
+        )
+        # Extracting the assistant's reply from the response
+        return response['choices'][0]['message']['content']
+
+    key = make_key(CHAT_MODEL, '\n'.join(message['content'] for message in messages))
+    return llm_cache.get_or_call('chat', key, call, use_cache=use_cache)
+
+
+async def agenerate_image(prompt, use_cache=True):
+    """
+    Asynchronous generate_image, awaiting OpenAI through the aiohttp session of the running event loop.
+
+    Args:
+        prompt (str): The prompt for generating the image.
+        use_cache (bool): Whether an image URL cached for the same prompt may be reused.
 
     Returns:
         str: The URL of the generated image.
     """
-    # Sending a request to OpenAI's image generation API with the provided prompt
-    response = openai.Image.create(
-        prompt=f"{prompt}",
-        n=1,
-        size="1024x1024"
-    )
-    # Extracting the image URL from the response
-    image_url = response['data'][0]['url']
-    return image_url
+    async def call():
+        # Sharing the connection pool of the event loop instead of opening a session per call
+        openai.aiosession.set(http_client.get_async_session())
+        response = await openai.Image.acreate(
+            prompt=f"{prompt}",
+            n=1,
+            size=IMAGE_SIZE,
+            request_timeout=http_client.get_timeout()
+        )
+        return response['data'][0]['url']
 
+    key = make_key(IMAGE_MODEL, prompt, n=1, size=IMAGE_SIZE)
+    return await llm_cache.aget_or_call('image', key, call, use_cache=use_cache)
 
-def chat_with_gpt3(title, content):
+
+async def achat_with_gpt3(title, content, use_cache=True):
     """
-    Interacts with OpenAI's GPT-3 model to generate a prompt for image generation.
+    Asynchronous chat_with_gpt3, awaiting OpenAI through the aiohttp session of the running event loop.
 
     Args:
         title (str): The title of the article.
         content (str): The content of the article.
+        use_cache (bool): Whether a reply cached for the same title and content may be reused.
 
     Returns:
         str: The generated prompt from the assistant.
     """
-    # Creating a chat completion request to OpenAI with the title and content of the article
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant."
-            },
-            {
-                "role": "user",
-                "content": f"""Generate image prompt for DALL-E for the following article. Do not add the words 'Image Prompt:' before the prompt:
-                   Title: {title}
-                   Content = {content}
-                   """
-            }
-        ]
-    )
-    # Extracting the assistant's reply from the response
-    assistant_reply = response['choices'][0]['message']['content']
-    return assistant_reply
+    messages = _chat_messages(title, content)
+
+    async def call():
+        openai.aiosession.set(http_client.get_async_session())
+        response = await openai.ChatCompletion.acreate(
+            model=CHAT_MODEL,
+            messages=messages,
+            request_timeout=http_client.get_timeout()
+        )
+        return response['choices'][0]['message']['content']
+
+    key = make_key(CHAT_MODEL, '\n'.join(message['content'] for message in messages))
+    return await llm_cache.aget_or_call('chat', key, call, use_cache=use_cache)
+
+
+def download_image(url):
+    """
+    Streams an image from a URL and encodes all of its renditions from a single decode.
+
+    Args:
+        url (str): The URL of the image to download.
+
+    Returns:
+        dict: Encoded renditions keyed by rendition name and format, see images.render_renditions.
+    """
+    # Requesting the image from the provided URL, refusing anything above settings.IMAGE_MAX_BYTES
+    return images.render_renditions(images.fetch_image(url))
+
+
+def attach_image(model_instance, renditions, save=True):
+    """
+    Stores already encoded image renditions and attaches them to a model instance.
+
+    Files are content addressed, so identical images are stored once and concurrent ingestion workers never
+    compete for a file name. No query is needed to name them.
+
+    Args:
+        model_instance: The model instance to attach the image to.
+        renditions (dict): Encoded renditions as returned by download_image.
+        save (bool): Whether to save the image fields of the instance right away.
+    """
+    attach_stored_image(model_instance, images.store_renditions(renditions), save=save)
+
+
+def attach_stored_image(model_instance, stored, save=True):
+    """
+    Attaches already stored image renditions to a model instance.
+
+    Args:
+        model_instance: The model instance to attach the image to.
+        stored (dict): The stored renditions, as returned by images.store_renditions.
+        save (bool): Whether to save the image fields of the instance right away.
+    """
+    # The detail JPEG is the main image, every other rendition is recorded next to it
+    model_instance.image.name = stored['detail']['jpeg']
+    model_instance.image_renditions = stored
+    if save:
+        # updated_at is listed so the new image also changes the ETag of the article
+        model_instance.save(update_fields=['image', 'image_renditions', 'updated_at'])
 
 
 def save_image_from_url(model_instance, url):
@@ -103,58 +305,193 @@ def save_image_from_url(model_instance, url):
 
     This function is typically used to download and attach images to Article instances.
     """
-    # Requesting the image from the provided URL
-    response = requests.get(url)
-    img = Image.open(BytesIO(response.content))
+    attach_image(model_instance, download_image(url))
 
-    # Preparing the image for saving
-    img_io = BytesIO()
-    img.save(img_io, format='JPEG')
 
-    # Retrieving the last article's ID for filename generation
-    last_article = Article.objects.order_by('-id').first()
-    if last_article is not None:
-        last_article_id = last_article.id
+def regenerate_article_image(article, use_cache=True):
+    """
+    Generates a new image for an existing article and attaches it.
 
-    # Defining the filename for the image
-    filename = f'{last_article_id}.jpg'
+    With the response cache enabled, articles whose title and body did not change reuse the cached prompt
+    and stored image, so regenerating costs no OpenAI calls and no download.
 
-    # Saving the image to the model instance
-    model_instance.image.save(filename, ContentFile(img_io.getvalue()), save=True)
+    Args:
+        article (Article): The article to regenerate the image for.
+        use_cache (bool): Whether cached OpenAI responses may be reused.
+    """
+    prompt = chat_with_gpt3(title=article.title, content=article.body, use_cache=use_cache)
+    attach_stored_image(article, generate_stored_image(prompt, use_cache=use_cache))
 
 
-def generate_articles(amount=2):
+async def aregenerate_article_image(article, use_cache=True):
     """
-    Generates a specified number of articles using external APIs and OpenAI.
+    Asynchronous regenerate_article_image, for async views.
+
+    The OpenAI calls and the image download are awaited on the event loop, so a single worker can regenerate
+    many images concurrently. Decoding, encoding and storing the renditions is CPU and file work, which runs in
+    a worker thread.
 
     Args:
-        amount (int): The number of articles to generate.
+        article (Article): The article to regenerate the image for.
+        use_cache (bool): Whether cached OpenAI responses may be reused.
+    """
+    prompt = await achat_with_gpt3(title=article.title, content=article.body, use_cache=use_cache)
+    stored = await sync_to_async(cached_stored_image)(prompt, use_cache=use_cache)
+    if stored is None:
+        image_url = await agenerate_image(prompt, use_cache=use_cache)
+        data = await images.afetch_image(image_url)
+        renditions = await sync_to_async(images.render_renditions, thread_sensitive=False)(data)
+        stored = await sync_to_async(images.store_renditions, thread_sensitive=False)(renditions)
+        await sync_to_async(remember_stored_image)(prompt, stored, use_cache=use_cache)
+    attach_stored_image(article, stored, save=False)
+    await article.asave(update_fields=['image', 'image_renditions', 'updated_at'])
+
+
+def _prompt_stage(state):
+    # Generating a prompt using GPT-3 for the article
+    item = state['item']
+    state['prompt'] = chat_with_gpt3(title=item['title'], content=item['content'],
+                                     use_cache=state.get('use_cache', True))
+
+
+def _image_stage(state):
+    # Reusing the image stored for the same prompt, otherwise generating an image URL based on the prompt
+    use_cache = state.get('use_cache', True)
+    stored = cached_stored_image(state['prompt'], use_cache=use_cache)
+    if stored is not None:
+        state['stored_image'] = stored
+    else:
+        state['image_url'] = generate_image(state['prompt'], use_cache=use_cache)
+
+
+def _download_stage(state):
+    # Downloading, resizing and storing the generated image before touching the database
+    if 'stored_image' in state:
+        return
+    state['stored_image'] = images.store_renditions(download_image(state['image_url']))
+    remember_stored_image(state['prompt'], state['stored_image'], use_cache=state.get('use_cache', True))
+
+
+def build_article(item, stored_image=None):
+    """
+    Builds an unsaved Article from a news item.
 
-    This function fetches news items, generates prompts, creates images, and saves articles to the database.
+    Args:
+        item (dict): A news item as returned by the news API.
+        stored_image (dict): Optional stored renditions, as returned by images.store_renditions.
+
+    Returns:
+        Article: The unsaved article.
     """
-    # Fetching a specified number of news articles from an external news API
-    articles = get_news_items(category='business', max_items=str(amount))
-    for i in range(amount):
-        # Generating a prompt using GPT-3 for each article
-        prompt = chat_with_gpt3(title=articles[i]['title'], content=articles[i]['content'])
-
-        # Generating an image URL based on the prompt
-        image_url = generate_image(prompt)
-
-        # Creating a new Article instance with the fetched data
-        article = Article.objects.create(
-            title=articles[i]['title'],
-            description=articles[i]['description'],
-            body=articles[i]['content'],
-            source=articles[i]['source']['name'],
-            category=articles[i]['category']
-        )
+    article = Article(
+        title=item['title'],
+        description=item['description'],
+        body=item['content'],
+        source=item['source']['name'],
+        category=item['category']
+    )
+    if stored_image:
+        article.image.name = stored_image['detail']['jpeg']
+        article.image_renditions = stored_image
+    return article
+
+
+def link_sources(items, articles):
+    """
+    Points unsaved articles at the Source rows named by their news items, creating the missing sources.
+
+    Args:
+        items (list): The news items, with a 'source' object holding 'name' and 'url'.
+        articles (list): The articles built from the items, in the same order.
+    """
+    sources = {item['source']['name']: item['source'].get('url', '') for item in items}
+    source_ids = source_cache.resolve(sources)
+    for item, article in zip(items, articles):
+        article.site_id = source_ids[item['source']['name']]
+
+
+def persist_results(results, batch_size=500):
+    """
+    Writes the articles of every successful ingestion result in a single transaction.
+
+    Articles and their fingerprints are inserted with bulk_create, images included, and linked to their Source
+    through the source cache, so a whole run costs a handful of queries instead of several per article. If the
+    transaction fails, every pending result is marked as failed at the 'persist' stage.
+
+    Args:
+        results (list): IngestionResult instances returned by the pipeline.
+        batch_size (int): Maximum number of rows per INSERT statement.
+    """
+    pending = [result for result in results if result.ok]
+    if not pending:
+        return
+
+    articles = [build_article(result.item, result.state.get('stored_image')) for result in pending]
+    try:
+        with transaction.atomic():
+            # bulk_create skips the pre_save receiver linking articles to their Source, so it is done here
+            link_sources([result.item for result in pending], articles)
+            Article.objects.bulk_create(articles, batch_size=batch_size)
+            ArticleFingerprint.objects.bulk_create(
+                [ArticleFingerprint(article=article, **fingerprint_fields(result.item))
+                 for result, article in zip(pending, articles)],
+                batch_size=batch_size)
+    except DatabaseError as error:
+        logger.exception('Persisting %s ingested articles failed', len(pending))
+        for result in pending:
+            result.error, result.stage = error, 'persist'
+        return
+
+    # bulk_create sends no post_save signal, so the cached listings are invalidated here
+    invalidate_article_listings()
+    for result, article in zip(pending, articles):
+        result.state['article'] = article
+
+
+def build_ingestion_pipeline(limits=None):
+    """
+    Builds the ingestion pipeline used by generate_articles.
+
+    Args:
+        limits (dict): Per-stage concurrency limits keyed by stage name. Missing stages fall back to
+                       settings.INGESTION_CONCURRENCY.
+
+    Returns:
+        IngestionPipeline: The pipeline running the prompt, image and download stages. Its results are
+                           persisted in bulk by persist_results.
+    """
+    stage_limits = dict(getattr(settings, 'INGESTION_CONCURRENCY', {}))
+    stage_limits.update(limits or {})
+    return IngestionPipeline([
+        Stage('prompt', _prompt_stage, stage_limits.get('prompt', 4)),
+        Stage('image', _image_stage, stage_limits.get('image', 2)),
+        Stage('download', _download_stage, stage_limits.get('download', 4)),
+    ])
 
-        # Saving the generated image to the article
-        save_image_from_url(article, image_url)
 
-        # Refreshing the instance to reflect the newly saved image
-        article.refresh_from_db()
+def generate_articles(amount=2, category='business', limits=None, near_duplicates=None, use_cache=True):
+    """
+    Generates a specified number of articles using external APIs and OpenAI.
 
+    Args:
+        amount (int): The number of articles to generate.
+        category (str): The news category to fetch.
+        limits (dict): Optional per-stage concurrency limits, see build_ingestion_pipeline.
+        near_duplicates (bool): Whether to also skip near duplicates, see dedup.filter_new_items.
+        use_cache (bool): Whether cached OpenAI responses may be reused. False bypasses the cache.
+
+    Returns:
+        list: IngestionResult instances for the new items, in the order they were fetched.
+
+    This function fetches news items, drops the ones already stored, then generates prompts and creates images
+    for many items at once, and finally saves all the articles in one transaction. A failing item is reported
+    on its result without aborting the batch.
+    """
+    # Fetching a specified number of news articles from an external news API
+    articles = get_news_items(category=category, max_items=str(amount))
 
-generate_articles()
+    # Skipping known items before paying for any LLM call
+    articles = filter_new_items(articles[:amount], near_duplicates=near_duplicates)
+    results = build_ingestion_pipeline(limits).run(articles, context={'use_cache': use_cache})
+    persist_results(results)
+    return results
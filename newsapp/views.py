@@ -1,6 +1,7 @@
+from django.http import Http404
 from django.shortcuts import render, redirect
 from .forms import *
-from .utils import *
+from .models import Article, PermissionRequest
 from django.contrib import messages
 from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import login_required
@@ -9,16 +10,24 @@ from django.contrib.auth.models import Permission
 from django.views import generic
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.generic import DetailView
-from .templatetags.group_validate import user_in_group
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition
+from .cards import load_cards
+from .conditional import article_page_etag, article_page_last_modified
+from .groups import user_group_names
+from .listing_cache import listing_cache
+from .search import max_candidates, search_articles
 
 
 @login_required()
 def home(request):
-    # Fetching the latest 5 articles ordered by publication time
-    articles = Article.objects.order_by('-time_published')[:5]
+    # Rendering the cards of the latest 5 articles, or taking them from the listing cache
+    cards = listing_cache.render('home', 'article_cards.html',
+                                 lambda: load_cards(Article.objects.order_by('-time_published')[:5]))
 
-    # Rendering the home template with the articles and a title context
-    return render(request, template_name='home.html', context={'title': 'Home', 'articles': articles})
+    # Rendering the home template with the article cards and a title context
+    return render(request, template_name='home.html', context={'title': 'Home', 'cards': cards})
 
 
 class SignUpView(generic.CreateView):
@@ -71,29 +80,38 @@ class UpdateArticle(UpdateView):
         # Method to dynamically choose the form class based on user group
         base_form_class = ArticleForm  # Base form class for articles
 
-        if user_in_group(user=self.request.user, group_name='Senior editors'):
+        if 'Senior editors' in user_group_names(self.request.user):
             # If user belongs to 'Senior editors' group, use form with 'title' field
             class ArticleFormWithTitle(base_form_class):
                 class Meta(base_form_class.Meta):
-                    fields = ['title', 'body', 'image', 'writer', 'category']
+                    fields = ['title', 'body', 'image', 'source', 'category']
 
             return ArticleFormWithTitle
         else:
             # Otherwise, use form without 'title' field
             class ArticleFormWithoutTitle(base_form_class):
                 class Meta(base_form_class.Meta):
-                    fields = ['body', 'image', 'writer', 'category']
+                    fields = ['body', 'image', 'source', 'category']
 
             return ArticleFormWithoutTitle
 
     def form_valid(self, form):
         # Method called when valid form data has been POSTed
+        if 'source' in form.changed_data:
+            # Letting the pre_save receiver link the article to the Source of its new name
+            form.instance.site = None
         response = super().form_valid(form)  # Call the parent class's form_valid method
         messages.success(self.request, f'Article "{self.object.title}" edited successfully!')  # Display success message
-        edit_url = self.request.COOKIES.get('edit_url', reverse('general_news'))  # Retrieve or set the success URL
-        self.success_url = edit_url
         return response
 
+    def get_success_url(self):
+        # Returning to the page the edit started from when it is given and safe, otherwise to the article
+        next_url = self.request.GET.get('next')
+        if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={self.request.get_host()},
+                                                        require_https=self.request.is_secure()):
+            return next_url
+        return self.object.get_absolute_url()
+
     def get_context_data(self, **kwargs):
         # Method to insert additional context into the template
         context = super().get_context_data(**kwargs)  # Get existing context from the superclass
@@ -105,45 +123,57 @@ class UpdateArticle(UpdateView):
 
 
 @login_required()
-def general_news(request):
-    # Fetching general news articles ordered by publication time
-    articles = Article.objects.filter(category='gen').order_by('-time_published')[:5]
-
-    # Rendering the newspage template with the articles and title context
+def category_news(request, category):
+    # Looking up the display name of the category, any category missing from Article.CATEGORIES is a 404
+    label = dict(Article.CATEGORIES).get(category)
+    if label is None:
+        raise Http404(f'Unknown news category "{category}"')
+
+    # Rendering the cards of the latest 5 articles in the category, or taking them from the listing cache.
+    # The (category, -time_published) index turns the query into an index range scan.
+    cards = listing_cache.render(
+        f'category:{category}', 'article_cards.html',
+        lambda: load_cards(Article.objects.filter(category=category).order_by('-time_published')[:5]))
+
+    # Rendering the newspage template with the article cards and title context
     return render(request, template_name='newspage.html',
-                  context={'title': 'General News', 'articles': articles, 'header': 'General News'})
-
-
-# Similarly, health_news and economic_news views are defined with respective category filters
-@login_required()
-def health_news(request):
-    articles = Article.objects.filter(category='hel').order_by('-time_published')[:5]
+                  context={'title': f'{label} News', 'cards': cards, 'header': f'{label} News'})
 
-    return render(request, template_name='newspage.html', context={'title': 'General News',
-                                                                   'articles': articles,
-                                                                   'header': 'Health News'})
 
-
-# Similarly, health_news and economic_news views are defined with respective category filters
 @login_required()
-def economic_news(request):
-    articles = Article.objects.filter(category='eco').order_by('-time_published')[:5]
-
-    return render(request, template_name='newspage.html', context={'title': 'General News',
-                                                                   'articles': articles,
-                                                                   'header': 'Economics News'})
-
-
+def search(request):
+    # Searching the articles for the 'q' parameter, optionally within one category, 20 results per page
+    query = request.GET.get('q', '').strip()
+    category = request.GET.get('category') or None
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results = search_articles(query, category=category, limit=21, offset=(page - 1) * 20)
+
+    # Rendering the search template with the results and the paging context
+    return render(request, template_name='search.html',
+                  context={'title': 'Search', 'header': f'Results for "{query}"' if query else 'Search',
+                           'query': query, 'category': category, 'results': results[:20], 'page': page,
+                           'has_next': len(results) > 20, 'truncated': results.truncated,
+                           'max_candidates': max_candidates()})
+
+
+@method_decorator(condition(etag_func=article_page_etag, last_modified_func=article_page_last_modified),
+                  name='dispatch')
 class ArticleDetailView(DetailView):
-    # Django generic DetailView for displaying an article
+    # Django generic DetailView for displaying an article.
+    # Answers 304 Not Modified when the client already has the current version of the page.
     model = Article  # Model that the detail view is linked to
     template_name = 'newsapp/article.html'  # Template for rendering the article detail
+    context_object_name = 'article'  # Same name for archived articles
 
-    def render_to_response(self, context, **response_kwargs):
-        # Method called to render the response
-        response = super().render_to_response(context, **response_kwargs)  # Call the parent class's method
-        response.set_cookie('edit_url', self.request.build_absolute_uri())  # Set a cookie with the current URL
-        return response
+    def get_object(self, queryset=None):
+        # Articles moved to the archive are displayed by the same page, see newsapp.archive
+        try:
+            return Article.objects.get_or_archived(self.kwargs['pk'])
+        except Article.DoesNotExist:
+            raise Http404('No article found matching the query')
 
 
 @login_required()
@@ -153,7 +183,7 @@ def article_delete(request, pk):
     if article:  # Check if the article exists
         article.delete()  # Delete the article
         messages.success(request, f'Article "{article.title}" deleted successfully!')  # Display success message
-        return redirect('general_news')  # Redirect to the general news page
+        return redirect('category_news', category='general')  # Redirect to the general news page
 
 
 def add_permissions(user, permission_list):